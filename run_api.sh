@@ -4,5 +4,5 @@
 # Make sure we're in the project root
 cd "$(dirname "$0")"
 
-# Run the FastAPI server with uvicorn
-uvicorn src.api.main:app --reload --host 0.0.0.0 --port 8000
+# Run the FastAPI server with uvicorn (AGENT_LOOP: auto|uvloop|asyncio)
+uvicorn src.api.main:app --reload --host 0.0.0.0 --port 8000 --loop "${AGENT_LOOP:-auto}"
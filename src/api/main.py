@@ -1,8 +1,15 @@
 """FastAPI application for the agent."""
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from pydantic import BaseModel
+
+try:
+    import orjson  # noqa: F401 - optional, enables the faster response class
+    from fastapi.responses import ORJSONResponse as ChatJSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as ChatJSONResponse
 from src.core.llm_client import LLMClient
 from src.core.config import config
 
@@ -19,7 +26,12 @@ llm_client = LLMClient(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events."""
-    # Startup: nothing to do here
+    # Startup: run new tasks eagerly until their first suspension point
+    # (asyncio.eager_task_factory is only available on Python 3.12+)
+    if hasattr(asyncio, "eager_task_factory"):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+    # Pre-warm the connection pool so the first /chat skips the handshake
+    await llm_client.health_check()
     yield
     # Shutdown: cleanup
     await llm_client.close()
@@ -57,7 +69,11 @@ async def health():
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
-    """Chat endpoint."""
+    """Chat endpoint.
+
+    Returns a ready-made JSON response so FastAPI skips re-validating it
+    against ChatResponse, which is still used for the OpenAPI schema.
+    """
     messages = [{"role": "user", "content": request.message}]
 
     response = await llm_client.chat(
@@ -66,4 +82,4 @@ async def chat(request: ChatRequest):
         max_tokens=request.max_tokens,
     )
 
-    return ChatResponse(response=response)
+    return ChatJSONResponse({"response": response})
@@ -1,15 +1,63 @@
 """Command executor with interactive approval flow."""
 
 import asyncio
+import codecs
+import os
 import subprocess
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
-from rich.console import Console
-from rich.panel import Panel
-from rich.prompt import Prompt, Confirm
-from rich.syntax import Syntax
+from typing import TYPE_CHECKING, Optional, Deque, Dict, Any, Tuple
 
-console = Console()
+if TYPE_CHECKING:
+    from pygments.lexer import Lexer
+    from rich.console import Console
+
+# Streamed output is shown live up to this many characters per stream
+MAX_DISPLAY_OUTPUT = 1024 * 1024
+# Pipe read size and number of chunks kept per stream for the tool result
+READ_CHUNK_SIZE = 64 * 1024
+OUTPUT_TAIL_CHUNKS = 1024
+# Number of shell runs remembered in CommandExecutor.execution_history
+MAX_HISTORY_ENTRIES = 256
+# Tab width used when highlighting files (rich's Syntax default)
+SYNTAX_TAB_SIZE = 4
+
+
+@lru_cache(maxsize=None)
+def _console() -> "Console":
+    """Create the shared console on first use (rich is imported lazily)."""
+    from rich.console import Console
+    return Console()
+
+
+@lru_cache(maxsize=64)
+def _lexer_for(suffix: str) -> Optional["Lexer"]:
+    """Resolve the pygments lexer for a file suffix once per suffix."""
+    if not suffix:
+        return None
+
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+
+    try:
+        # Same options rich's Syntax uses for a lexer given by name, so
+        # leading blank lines are kept and line numbers stay aligned
+        return get_lexer_by_name(suffix, stripnl=False, ensurenl=True, tabsize=SYNTAX_TAB_SIZE)
+    except ClassNotFound:
+        return None
+
+
+@dataclass
+class ShellRun:
+    """A shell command run recorded in the execution history."""
+    __slots__ = ("command", "exit_code", "stdout", "stderr")
+
+    command: str
+    exit_code: int
+    stdout: str
+    stderr: str
 
 
 class CommandExecutor:
@@ -18,7 +66,7 @@ class CommandExecutor:
     def __init__(self, working_directory: Optional[str] = None):
         """Initialize the command executor."""
         self.working_directory = Path(working_directory or Path.cwd())
-        self.execution_history = []
+        self.execution_history: Deque[ShellRun] = deque(maxlen=MAX_HISTORY_ENTRIES)
 
     async def execute_with_approval(
         self,
@@ -37,9 +85,12 @@ class CommandExecutor:
         Returns:
             Tuple of (success: bool, result: Optional[str])
         """
+        from rich.panel import Panel
+        from rich.prompt import Prompt
+
         # Display what we're about to do
-        console.print()
-        console.print(Panel(
+        _console().print()
+        _console().print(Panel(
             self._format_tool_display(tool_name, arguments),
             title=f"[bold]Tool: {tool_name}[/bold]",
             border_style="cyan"
@@ -61,7 +112,7 @@ class CommandExecutor:
                 if arguments is None:
                     return False, "Modification cancelled"
             elif choice in ["s", "skip"]:
-                console.print("[yellow]Skipped[/yellow]")
+                _console().print("[yellow]Skipped[/yellow]")
                 return False, "Skipped by user"
 
         # Execute the tool
@@ -84,7 +135,7 @@ class CommandExecutor:
                 return False, f"Unknown tool: {tool_name}"
 
         except Exception as e:
-            console.print(f"[red]Error executing {tool_name}:[/red] {str(e)}")
+            _console().print(f"[red]Error executing {tool_name}:[/red] {str(e)}")
             return False, str(e)
 
     async def _execute_shell_command(
@@ -95,8 +146,8 @@ class CommandExecutor:
         command = arguments.get("command", "")
         working_dir = arguments.get("working_directory", self.working_directory)
 
-        console.print(f"\n[dim]Executing in: {working_dir}[/dim]")
-        console.print("[bold cyan]Running...[/bold cyan]")
+        _console().print(f"\n[dim]Executing in: {working_dir}[/dim]")
+        _console().print("[bold cyan]Running...[/bold cyan]")
 
         try:
             # Execute the command
@@ -107,73 +158,130 @@ class CommandExecutor:
                 cwd=str(working_dir)
             )
 
-            stdout, stderr = await process.communicate()
-
-            # Decode output
-            stdout_text = stdout.decode() if stdout else ""
-            stderr_text = stderr.decode() if stderr else ""
-
-            # Display results
-            if stdout_text:
-                console.print("\n[bold]Output:[/bold]")
-                console.print(stdout_text)
+            # Stream both pipes live while waiting for the process to exit
+            stdout_tail: deque = deque(maxlen=OUTPUT_TAIL_CHUNKS)
+            stderr_tail: deque = deque(maxlen=OUTPUT_TAIL_CHUNKS)
+            stdout_dropped, stderr_dropped, _ = await asyncio.gather(
+                self._pump_output(process.stdout, stdout_tail, "Output", "bold"),
+                self._pump_output(process.stderr, stderr_tail, "Stderr", "bold yellow"),
+                process.wait()
+            )
 
-            if stderr_text:
-                console.print("\n[bold yellow]Stderr:[/bold yellow]")
-                console.print(stderr_text)
+            stdout_text = self._join_tail(stdout_tail, stdout_dropped)
+            stderr_text = self._join_tail(stderr_tail, stderr_dropped)
 
             success = process.returncode == 0
 
             if success:
-                console.print("[green]✓ Command executed successfully[/green]")
+                _console().print("[green]✓ Command executed successfully[/green]")
             else:
-                console.print(f"[red]✗ Command failed with exit code {process.returncode}[/red]")
+                _console().print(f"[red]✗ Command failed with exit code {process.returncode}[/red]")
 
             # Save to history
-            self.execution_history.append({
-                "type": "shell_command",
-                "command": command,
-                "exit_code": process.returncode,
-                "stdout": stdout_text,
-                "stderr": stderr_text
-            })
-
-            result = f"Exit code: {process.returncode}\nStdout:\n{stdout_text}\nStderr:\n{stderr_text}"
+            self.execution_history.append(ShellRun(
+                command=command,
+                exit_code=process.returncode,
+                stdout=stdout_text,
+                stderr=stderr_text
+            ))
+
+            result = "".join((
+                "Exit code: ", str(process.returncode),
+                "\nStdout:\n", stdout_text,
+                "\nStderr:\n", stderr_text,
+            ))
             return success, result
 
         except Exception as e:
-            console.print(f"[red]Error:[/red] {str(e)}")
+            _console().print(f"[red]Error:[/red] {str(e)}")
             return False, str(e)
 
+    async def _pump_output(
+        self,
+        stream: asyncio.StreamReader,
+        tail: deque,
+        label: str,
+        style: str
+    ) -> int:
+        """
+        Copy a subprocess pipe to the console as it arrives.
+
+        Args:
+            stream: Subprocess stdout or stderr reader
+            tail: Bounded buffer receiving the decoded chunks
+            label: Header printed before the first chunk
+            style: Rich style for the header
+
+        Returns:
+            Number of chunks that fell out of the bounded buffer
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        displayed = 0
+        dropped = 0
+
+        while True:
+            data = await stream.read(READ_CHUNK_SIZE)
+            text = decoder.decode(data, final=not data)
+            if text:
+                if not displayed:
+                    _console().print(f"\n[{style}]{label}:[/{style}]")
+                remaining = MAX_DISPLAY_OUTPUT - displayed
+                if remaining > 0:
+                    _console().print(text[:remaining], end="", markup=False, highlight=False)
+                if 0 <= remaining < len(text):
+                    _console().print(f"\n[dim]... {label.lower()} truncated on screen[/dim]")
+                displayed += len(text)
+
+                if len(tail) == tail.maxlen:
+                    dropped += 1
+                tail.append(text)
+            if not data:
+                break
+
+        if displayed:
+            _console().print()
+        return dropped
+
+    def _join_tail(self, tail: deque, dropped: int) -> str:
+        """Join buffered output chunks, marking any dropped head."""
+        text = "".join(tail)
+        if dropped:
+            return f"[... {dropped} earlier output chunks omitted]\n{text}"
+        return text
+
     async def _read_file(self, arguments: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
         """Read a file."""
         filepath = arguments.get("filepath", "")
         path = Path(filepath)
 
+        from rich.syntax import Syntax
+
         try:
-            if not path.exists():
-                console.print(f"[red]File not found:[/red] {filepath}")
+            # Read in a worker thread so large files don't stall the event loop
+            try:
+                content = await asyncio.to_thread(path.read_text)
+            except FileNotFoundError:
+                _console().print(f"[red]File not found:[/red] {filepath}")
                 return False, f"File not found: {filepath}"
 
-            content = path.read_text()
-
             # Display the file with syntax highlighting
-            console.print(f"\n[bold]File: {filepath}[/bold] ({len(content)} chars)")
+            _console().print(f"\n[bold]File: {filepath}[/bold] ({len(content)} chars)")
 
             # Try to detect language for syntax highlighting
-            suffix = path.suffix.lstrip('.')
-            if suffix:
-                syntax = Syntax(content, suffix, theme="monokai", line_numbers=True)
-                console.print(syntax)
+            lexer = _lexer_for(path.suffix.lstrip('.'))
+            if lexer is not None:
+                syntax = Syntax(content, lexer, theme="monokai", line_numbers=True, tab_size=SYNTAX_TAB_SIZE)
+                _console().print(syntax)
             else:
-                console.print(content)
+                # Plain text: brackets in the file are not rich markup
+                _console().print(content, markup=False, highlight=False)
 
-            console.print(f"\n[green]✓ File read successfully[/green]")
+            _console().print(f"\n[green]✓ File read successfully[/green]")
 
             return True, content
 
         except Exception as e:
-            console.print(f"[red]Error reading file:[/red] {str(e)}")
+            _console().print(f"[red]Error reading file:[/red] {str(e)}")
             return False, str(e)
 
     async def _write_file(self, arguments: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
@@ -182,36 +290,56 @@ class CommandExecutor:
         content = arguments.get("content", "")
         path = Path(filepath)
 
+        from rich.prompt import Confirm
+
         try:
-            # Check if file exists
             exists = path.exists()
+
+            # Ask before touching the filesystem at all
             if exists:
-                console.print(f"[yellow]⚠ File exists:[/yellow] {filepath}")
+                _console().print(f"[yellow]⚠ File exists:[/yellow] {filepath}")
                 if not Confirm.ask("Overwrite?", default=False):
                     return False, "User cancelled overwrite"
 
-            # Create parent directories if needed
-            path.parent.mkdir(parents=True, exist_ok=True)
-
-            # Write the file
-            path.write_text(content)
+            # Write the file (off the event loop)
+            if exists:
+                await asyncio.to_thread(path.write_text, content)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # O_EXCL refuses to clobber a file created since the check
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+                await asyncio.to_thread(self._write_new_file, path, fd, content)
 
             action = "Updated" if exists else "Created"
-            console.print(f"[green]✓ {action} file:[/green] {filepath}")
+            _console().print(f"[green]✓ {action} file:[/green] {filepath}")
 
             return True, f"{action} {filepath}"
 
         except Exception as e:
-            console.print(f"[red]Error writing file:[/red] {str(e)}")
+            _console().print(f"[red]Error writing file:[/red] {str(e)}")
             return False, str(e)
 
+    @staticmethod
+    def _write_new_file(path: Path, fd: int, content: str):
+        """Write text to a freshly created file, removing it if the write fails."""
+        try:
+            with open(fd, "w", closefd=False) as f:
+                f.write(content)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        finally:
+            os.close(fd)
+
     async def _modify_arguments(
         self,
         tool_name: str,
         arguments: Dict[str, Any]
     ) -> Optional[Dict[str, Any]]:
         """Allow user to modify tool arguments."""
-        console.print("\n[bold]Modify arguments:[/bold]")
+        from rich.prompt import Prompt
+
+        _console().print("\n[bold]Modify arguments:[/bold]")
 
         new_args = arguments.copy()
 
@@ -232,7 +360,7 @@ class CommandExecutor:
                 new_args["filepath"] = new_filepath
 
         elif tool_name == "write_file":
-            console.print("[yellow]Use your editor to modify file content[/yellow]")
+            _console().print("[yellow]Use your editor to modify file content[/yellow]")
             new_filepath = Prompt.ask(
                 "File path",
                 default=arguments.get("filepath", "")
@@ -1,10 +1,32 @@
 """Parser for extracting shell commands from LLM responses."""
 
+import bisect
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 
 
+# Commands usually start with common utilities
+_COMMON_COMMANDS = frozenset({
+    'ls', 'cd', 'pwd', 'cat', 'grep', 'find', 'sed', 'awk',
+    'git', 'docker', 'kubectl', 'npm', 'pip', 'python',
+    'echo', 'mkdir', 'rm', 'mv', 'cp', 'chmod', 'chown',
+    'sudo', 'apt', 'yum', 'brew', 'curl', 'wget', 'ssh',
+    'ps', 'kill', 'top', 'df', 'du', 'tar', 'gzip'
+})
+
+
+# Number of recent responses whose parse results are kept
+PARSE_CACHE_ENTRIES = 8
+
+
+# Words that mark English prose inside code blocks
+_ENGLISH_MARKERS = (" of ", " the ", " and ", " or ", " is ", " are ", " will ", " can ")
+_EXPLANATION_WORDS = frozenset({
+    'explanation', 'note', 'example', 'usage', 'description', 'find', 'xargs', 'replace'
+})
+
+
 @dataclass
 class CommandOption:
     """Represents a parsed command option."""
@@ -25,11 +47,32 @@ class CommandParser:
             re.DOTALL | re.IGNORECASE
         )
         self.backtick_pattern = re.compile(r'`([^`]+)`')
+        self._fence_pattern = re.compile(r'```')
         self.command_prefix_pattern = re.compile(
             r'(?:run|execute|try|use):\s*`?([^`\n]+)`?',
             re.IGNORECASE
         )
 
+        # Patterns for cleaning code block lines
+        self._prompt_strip = re.compile(r'^[\$#>]\s*')
+        # Single alternation of the output-like line shapes:
+        # just a path, leading digit, ls total/permissions
+        self._skip_re = re.compile(r'^(?:/[\w/.-]+$|[0-9]|total\s+\d+|[drwx-]{10})')
+        self._lang_markers = frozenset({
+            'bash', 'sh', 'shell', 'python', 'javascript', 'java', 'ruby', 'go', 'rust'
+        })
+
+        # Patterns for finding explanations near a command
+        self._explanation_patterns = (
+            re.compile(r'[-→•]\s*([^.\n]+)'),  # Bullet points
+            re.compile(r':\s*([^.\n]+)'),       # After colon
+            re.compile(r'//\s*([^\n]+)'),       # Comments
+            re.compile(r'#\s*([^\n]+)'),        # Hash comments
+        )
+
+        # Recent parse results, keyed by (text, max_options)
+        self._parse_cache: Dict[Tuple[str, int], List[CommandOption]] = {}
+
     def parse(self, text: str, max_options: int = 3) -> List[CommandOption]:
         """
         Parse text and extract command options.
@@ -41,29 +84,62 @@ class CommandParser:
         Returns:
             List of CommandOption objects, sorted by confidence
         """
+        key = (text, max_options)
+        cached = self._parse_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        result = self._parse_uncached(text, max_options)
+
+        if len(self._parse_cache) >= PARSE_CACHE_ENTRIES:
+            # Evict the oldest entry (dicts keep insertion order)
+            del self._parse_cache[next(iter(self._parse_cache))]
+        self._parse_cache[key] = result
+
+        return list(result)
+
+    def _parse_uncached(self, text: str, max_options: int) -> List[CommandOption]:
+        """Run the extraction passes for parse()."""
         commands: List[CommandOption] = []
 
         # 1. Extract from bash code blocks (highest confidence)
         commands.extend(self._extract_from_code_blocks(text))
 
+        # Later passes only produce lower-confidence options, so skip them
+        # once enough better options are already known
         # 2. Extract from backticks (medium confidence)
-        commands.extend(self._extract_from_backticks(text))
+        if not self._has_enough_above(commands, max_options, 0.7):
+            # Fence end offsets are computed once and shared by every backtick check
+            fences = [match.end() for match in self._fence_pattern.finditer(text)]
+            commands.extend(self._extract_from_backticks(text, fences))
 
-        # 3. Extract from command prefixes (lower confidence)
-        commands.extend(self._extract_from_patterns(text))
+            # 3. Extract from command prefixes (lower confidence)
+            if not self._has_enough_above(commands, max_options, 0.6):
+                commands.extend(self._extract_from_patterns(text))
 
-        # Remove duplicates (keep highest confidence)
+        # Remove duplicates (keep highest confidence), sorted by confidence
         commands = self._deduplicate(commands)
 
-        # Sort by confidence
-        commands.sort(key=lambda x: x.confidence, reverse=True)
-
         # Filter out non-command looking strings
         commands = [cmd for cmd in commands if self._is_likely_command(cmd.command)]
 
         # Limit to max_options
         return commands[:max_options]
 
+    def _has_enough_above(
+        self,
+        commands: List[CommandOption],
+        max_options: int,
+        threshold: float
+    ) -> bool:
+        """Check if at least max_options distinct usable commands beat threshold."""
+        distinct = {
+            cmd.command.strip().lower()
+            for cmd in commands
+            if cmd.confidence > threshold and self._is_likely_command(cmd.command)
+        }
+        return len(distinct) >= max_options
+
     def _extract_from_code_blocks(self, text: str) -> List[CommandOption]:
         """Extract commands from bash code blocks."""
         commands = []
@@ -81,7 +157,7 @@ class CommandParser:
             clean_lines = []
             for line in lines:
                 # Remove common shell prompts: $, #, >, etc.
-                cleaned = re.sub(r'^[\$#>]\s*', '', line)
+                cleaned = self._prompt_strip.sub('', line)
 
                 # Skip empty lines
                 if not cleaned:
@@ -94,13 +170,9 @@ class CommandParser:
                 # - Lines that look like English sentences/explanations
                 # - Code block language markers (bash, sh, shell, python, etc.)
                 if (
-                    re.match(r'^/[\w/.-]+$', cleaned) or  # Just a path
-                    re.match(r'^[0-9]', cleaned) or       # Starts with number
-                    re.match(r'^total\s+\d+', cleaned) or # ls output
-                    re.match(r'^[drwx-]{10}', cleaned) or # ls -la permissions
-                    re.match(r'^[A-Z][a-z]+.*(?:of|the|and|or|is|are|will|can)\b', cleaned) or  # English sentences
-                    re.match(r'^[A-Z](?:explanation|note|example|usage|description|find|xargs|replace)\b', cleaned, re.IGNORECASE) or  # Capitalized explanation words
-                    cleaned in ['bash', 'sh', 'shell', 'python', 'javascript', 'java', 'ruby', 'go', 'rust']  # Code block markers
+                    self._skip_re.match(cleaned) or
+                    cleaned in self._lang_markers or
+                    self._looks_like_sentence(cleaned)
                 ):
                     continue
 
@@ -132,7 +204,18 @@ class CommandParser:
 
         return commands
 
-    def _extract_from_backticks(self, text: str) -> List[CommandOption]:
+    def _looks_like_sentence(self, line: str) -> bool:
+        """Cheap check for English sentences/explanations (no regex)."""
+        if not line[:1].isupper():
+            return False
+
+        first_word = line.split(' ', 1)[0]
+        return (
+            first_word.rstrip(':').lower() in _EXPLANATION_WORDS or
+            (first_word.isalpha() and any(marker in line for marker in _ENGLISH_MARKERS))
+        )
+
+    def _extract_from_backticks(self, text: str, fences: List[int]) -> List[CommandOption]:
         """Extract commands from backtick-wrapped text."""
         commands = []
 
@@ -140,7 +223,7 @@ class CommandParser:
             command = match.group(1).strip()
 
             # Skip if it's inside a code block (already extracted)
-            if self._is_inside_code_block(text, match.start()):
+            if self._is_inside_code_block(fences, match.start()):
                 continue
 
             # Skip if it looks like inline code (not a command)
@@ -188,15 +271,8 @@ class CommandParser:
         context = text[before_start:start] + " " + text[end:after_end]
 
         # Look for explanation patterns
-        explanation_patterns = [
-            r'[-→•]\s*([^.\n]+)',  # Bullet points
-            r':\s*([^.\n]+)',       # After colon
-            r'//\s*([^\n]+)',       # Comments
-            r'#\s*([^\n]+)',        # Hash comments
-        ]
-
-        for pattern in explanation_patterns:
-            match = re.search(pattern, context)
+        for pattern in self._explanation_patterns:
+            match = pattern.search(context)
             if match:
                 explanation = match.group(1).strip()
                 if len(explanation) > 10:  # Avoid too short explanations
@@ -204,34 +280,29 @@ class CommandParser:
 
         return None
 
-    def _is_inside_code_block(self, text: str, position: int) -> bool:
-        """Check if position is inside a code block."""
-        # Count code block markers before this position
-        before_text = text[:position]
-        block_starts = len(re.findall(r'```', before_text))
+    def _is_inside_code_block(self, fences: List[int], position: int) -> bool:
+        """Check if position is inside a code block.
+
+        Args:
+            fences: Sorted end offsets of the ``` markers in the text
+            position: Offset to check
+        """
+        # Count code block markers that end before this position
+        block_starts = bisect.bisect_right(fences, position)
 
         # Odd number means we're inside a block
         return block_starts % 2 == 1
 
     def _looks_like_command(self, text: str) -> bool:
         """Check if text looks like a shell command (not just inline code)."""
-        # Commands usually start with common utilities
-        common_commands = [
-            'ls', 'cd', 'pwd', 'cat', 'grep', 'find', 'sed', 'awk',
-            'git', 'docker', 'kubectl', 'npm', 'pip', 'python',
-            'echo', 'mkdir', 'rm', 'mv', 'cp', 'chmod', 'chown',
-            'sudo', 'apt', 'yum', 'brew', 'curl', 'wget', 'ssh',
-            'ps', 'kill', 'top', 'df', 'du', 'tar', 'gzip'
-        ]
-
-        # Check if starts with a common command
-        first_word = text.split()[0] if text.split() else ""
+        parts = text.split()
+        if not parts:
+            return False
 
-        # Remove sudo if present
-        if first_word == 'sudo' and len(text.split()) > 1:
-            first_word = text.split()[1]
+        # Check if starts with a common command (skipping sudo if present)
+        first_word = parts[1] if parts[0] == 'sudo' and len(parts) > 1 else parts[0]
 
-        return first_word in common_commands or '|' in text or '>' in text
+        return first_word in _COMMON_COMMANDS or '|' in text or '>' in text
 
     def _is_likely_command(self, command: str) -> bool:
         """Filter out strings that don't look like commands."""
@@ -255,17 +326,24 @@ class CommandParser:
         return True
 
     def _deduplicate(self, commands: List[CommandOption]) -> List[CommandOption]:
-        """Remove duplicate commands, keeping highest confidence."""
-        seen = {}
+        """Remove duplicate commands, keeping highest confidence.
+
+        Returns:
+            Unique commands sorted by confidence (highest first)
+        """
+        seen = set()
+        unique = []
 
-        for cmd in commands:
+        # After a stable sort the first occurrence is the one to keep
+        for cmd in sorted(commands, key=lambda x: x.confidence, reverse=True):
             # Normalize command for comparison
             normalized = cmd.command.strip().lower()
 
-            if normalized not in seen or cmd.confidence > seen[normalized].confidence:
-                seen[normalized] = cmd
+            if normalized not in seen:
+                seen.add(normalized)
+                unique.append(cmd)
 
-        return list(seen.values())
+        return unique
 
 
 def format_command_menu(commands: List[CommandOption]) -> str:
@@ -281,17 +359,18 @@ def format_command_menu(commands: List[CommandOption]) -> str:
     if not commands:
         return ""
 
-    menu_lines = ["\n[bold cyan]📋 Suggested Commands:[/bold cyan]\n"]
+    # Every piece carries its own line ending, so a single "".join suffices
+    menu_lines = ["\n[bold cyan]📋 Suggested Commands:[/bold cyan]\n\n"]
 
     for idx, cmd in enumerate(commands, 1):
         # Truncate long commands
         display_cmd = cmd.command if len(cmd.command) <= 80 else cmd.command[:77] + "..."
 
-        menu_lines.append(f"[bold]{idx}.[/bold] [cyan]{display_cmd}[/cyan]")
-        menu_lines.append(f"   [dim]→ {cmd.explanation}[/dim]\n")
+        menu_lines.append(f"[bold]{idx}.[/bold] [cyan]{display_cmd}[/cyan]\n")
+        menu_lines.append(f"   [dim]→ {cmd.explanation}[/dim]\n\n")
 
     # Always add "do nothing" option
-    menu_lines.append(f"[bold]0.[/bold] [yellow]Do nothing[/yellow]")
-    menu_lines.append(f"   [dim]→ Skip execution[/dim]")
+    menu_lines.append("[bold]0.[/bold] [yellow]Do nothing[/yellow]\n")
+    menu_lines.append("   [dim]→ Skip execution[/dim]")
 
-    return "\n".join(menu_lines)
+    return "".join(menu_lines)
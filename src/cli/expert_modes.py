@@ -1,6 +1,8 @@
 """Expert mode definitions with specialized system prompts."""
 
-from typing import Dict, Any
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Tuple
 from enum import Enum
 
 
@@ -64,26 +66,8 @@ EXPERT_CONFIGS: Dict[ExpertMode, Dict[str, Any]] = {
 }
 
 
-def get_system_prompt(expert_mode: ExpertMode, response_mode: ResponseMode) -> str:
-    """
-    Generate system prompt based on expert and response mode.
-
-    Args:
-        expert_mode: The expert specialization
-        response_mode: Quick or full response mode
-
-    Returns:
-        System prompt string
-    """
-    # Response mode instructions - CONCISE!
-    response_instruction = ""
-    if response_mode == ResponseMode.QUICK:
-        response_instruction = "STYLE: Quick and concise. Get to the point. No long explanations."
-    else:  # FULL
-        response_instruction = "STYLE: Detailed with examples and context when helpful."
-
-    # Base instructions for all modes - KEEP IT SHORT!
-    base_instructions = """
+# Base instructions for all modes - KEEP IT SHORT!
+_BASE_INSTRUCTIONS = """
 When suggesting commands:
 - Wrap in backticks: `command`
 - Use code blocks for multi-line
@@ -91,95 +75,122 @@ When suggesting commands:
 - Mention risks if critical
 """
 
-    # Expert-specific prompts
-    expert_prompts = {
-        ExpertMode.LINUX: """
+# Expert-specific prompts
+_EXPERT_PROMPTS: Dict[ExpertMode, str] = {
+    ExpertMode.LINUX: """
 Linux system expert. Answer with Linux/bash commands ONLY.
 NO Python/Java/PowerShell unless asked.
 Focus: shell scripting, system utilities, file operations.
 """,
 
-        ExpertMode.PYTHON: """
+    ExpertMode.PYTHON: """
 Python expert. Answer with Python code ONLY.
 NO bash/shell unless needed.
 Focus: Python 3.x, clean code, best practices.
 """,
 
-        ExpertMode.DEVOPS: """
+    ExpertMode.DEVOPS: """
 DevOps expert. Focus on Docker, K8s, CI/CD, infrastructure.
 Prefer containers and automation over app code.
 """,
 
-        ExpertMode.DATABASE: """
+    ExpertMode.DATABASE: """
 Database expert. Provide SQL queries and DB solutions.
 Focus: queries, schema, optimization, indexes.
 """,
 
-        ExpertMode.GENERAL: """
+    ExpertMode.GENERAL: """
 General AI assistant. Adapt to questions.
 Provide clear, accurate info.
 """
-    }
+}
+
+# Expert-specific reminders (to reinforce the role)
+_EXPERT_REMINDERS: Dict[ExpertMode, str] = {
+    ExpertMode.LINUX: "⚠️ LINUX MODE: Use bash/shell commands only.",
+    ExpertMode.PYTHON: "⚠️ PYTHON MODE: Use Python code only.",
+    ExpertMode.DEVOPS: "⚠️ DEVOPS MODE: Focus on containers & infrastructure.",
+    ExpertMode.DATABASE: "⚠️ DATABASE MODE: Use SQL queries.",
+    ExpertMode.GENERAL: "GENERAL MODE: Adapt to context."
+}
 
-    # Expert-specific reminders (to reinforce the role)
-    expert_reminders = {
-        ExpertMode.LINUX: "⚠️ LINUX MODE: Use bash/shell commands only.",
-        ExpertMode.PYTHON: "⚠️ PYTHON MODE: Use Python code only.",
-        ExpertMode.DEVOPS: "⚠️ DEVOPS MODE: Focus on containers & infrastructure.",
-        ExpertMode.DATABASE: "⚠️ DATABASE MODE: Use SQL queries.",
-        ExpertMode.GENERAL: "GENERAL MODE: Adapt to context."
-    }
+
+@lru_cache(maxsize=16)
+def get_system_prompt(expert_mode: ExpertMode, response_mode: ResponseMode) -> str:
+    """
+    Generate system prompt based on expert and response mode.
+
+    Args:
+        expert_mode: The expert specialization
+        response_mode: Quick or full response mode
+
+    Returns:
+        System prompt string
+    """
+    # Response mode instructions - CONCISE!
+    response_instruction = ""
+    if response_mode == ResponseMode.QUICK:
+        response_instruction = "STYLE: Quick and concise. Get to the point. No long explanations."
+    else:  # FULL
+        response_instruction = "STYLE: Detailed with examples and context when helpful."
 
     # Combine all parts - MUCH SHORTER NOW!
-    system_prompt = f"""{expert_prompts[expert_mode]}
+    system_prompt = f"""{_EXPERT_PROMPTS[expert_mode]}
 {response_instruction}
-{base_instructions}
-{expert_reminders[expert_mode]}
+{_BASE_INSTRUCTIONS}
+{_EXPERT_REMINDERS[expert_mode]}
 """.strip()
 
     return system_prompt
 
 
-def get_expert_display_info() -> list[tuple[int, str, str]]:
+# Selection menu rows, built once at import
+_EXPERT_DISPLAY: Tuple[Tuple[int, str, str], ...] = tuple(
+    (i + 1, config["name"], config["description"])
+    for i, config in enumerate(EXPERT_CONFIGS.values())
+)
+
+_RESPONSE_DISPLAY: Tuple[Tuple[int, str, str], ...] = (
+    (1, "⚡ Quick", "Concise answers (faster)"),
+    (2, "📖 Full", "Detailed explanations (complete)"),
+)
+
+
+def get_expert_display_info() -> Tuple[Tuple[int, str, str], ...]:
     """
     Get expert modes for display in selection menu.
 
     Returns:
-        List of (index, icon+name, description) tuples
+        Tuple of (index, icon+name, description) tuples
     """
-    return [
-        (i + 1, config["name"], config["description"])
-        for i, (mode, config) in enumerate(EXPERT_CONFIGS.items())
-    ]
+    return _EXPERT_DISPLAY
 
 
-def get_response_mode_display_info() -> list[tuple[int, str, str]]:
+def get_response_mode_display_info() -> Tuple[Tuple[int, str, str], ...]:
     """
     Get response modes for display in selection menu.
 
     Returns:
-        List of (index, name, description) tuples
+        Tuple of (index, name, description) tuples
     """
-    return [
-        (1, "⚡ Quick", "Concise answers (faster)"),
-        (2, "📖 Full", "Detailed explanations (complete)")
-    ]
+    return _RESPONSE_DISPLAY
 
 
-def get_expert_config(expert_mode: ExpertMode, response_mode: ResponseMode) -> Dict[str, Any]:
+@lru_cache(maxsize=16)
+def get_expert_config(expert_mode: ExpertMode, response_mode: ResponseMode) -> Mapping[str, Any]:
     """
     Get configuration for given expert and response mode.
 
     Returns:
-        Dictionary with temperature and max_tokens
+        Read-only mapping with temperature and max_tokens (cached and shared)
     """
     config = EXPERT_CONFIGS[expert_mode]
 
     max_tokens_key = "max_tokens_quick" if response_mode == ResponseMode.QUICK else "max_tokens_full"
 
-    return {
+    return MappingProxyType({
         "temperature": config["temperature"],
         "max_tokens": config[max_tokens_key],
         "name": config["name"],
         "icon": config["icon"]
-    }
+    })
@@ -1,23 +1,154 @@
 """Enhanced input handler with multi-line support and file ingestion."""
 
+import asyncio
 import os
-import re
+import stat
+import string
+import sys
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from prompt_toolkit import PromptSession
 from prompt_toolkit.history import InMemoryHistory
+from prompt_toolkit.key_binding import KeyBindings
 from rich.console import Console
 
 console = Console()
 
+# Characters allowed in an @filename reference (plus any other str.isalnum()
+# character, matching what \w accepts)
+_REF_CHARS = frozenset(string.ascii_letters + string.digits + "_./~-")
+
+# Info strings that mark a ```bash command ``` block
+_SHELL_FENCE_TAGS = frozenset(("bash", "sh", "shell"))
+
+# How long a resolved (or missing) @filename lookup is reused, in seconds
+RESOLVE_CACHE_TTL = 2.0
+# File contents kept between prompts, keyed by real path, mtime and size
+CONTENT_CACHE_ENTRIES = 16
+MAX_CACHED_FILE_SIZE = 1024 * 1024
+
+# Directories "Did you mean" may visit per prompt
+SUGGEST_DIR_BUDGET = 200
+
+
+def _multiline_key_bindings() -> KeyBindings:
+    """Key bindings that submit the whole multi-line buffer on Ctrl+D."""
+    bindings = KeyBindings()
+    finish_keys = ("c-d", "c-z") if sys.platform == "win32" else ("c-d",)
+
+    for key in finish_keys:
+        @bindings.add(key)
+        def _finish(event):
+            event.current_buffer.validate_and_handle()
+
+    return bindings
+
+
+def _scan_file_references(text: str) -> list[tuple[int, int]]:
+    """
+    Find @filename references without going through the regex engine.
+
+    Returns:
+        List of (start, end) spans, each covering the '@' and the path
+    """
+    spans = []
+    length = len(text)
+    start = text.find('@')
+
+    while start != -1:
+        end = start + 1
+        while end < length and (text[end] in _REF_CHARS or text[end].isalnum()):
+            end += 1
+
+        if end > start + 1:
+            spans.append((start, end))
+            start = text.find('@', end)
+        else:
+            start = text.find('@', start + 1)
+
+    return spans
+
+
+def _read_text_file(path: Path) -> str:
+    """
+    Read a UTF-8 text file, sizing the first read with fstat.
+
+    Newlines are normalized the same way as Path.read_text().
+
+    Raises:
+        OSError: If the file cannot be opened or read
+        UnicodeDecodeError: If the file is not valid UTF-8
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        chunks = []
+        # Reads may return fewer bytes than asked for (or the file may have
+        # grown since fstat), so only an empty read marks EOF
+        chunk = os.read(fd, size + 1)
+        while chunk:
+            chunks.append(chunk)
+            chunk = os.read(fd, 65536)
+    finally:
+        os.close(fd)
+
+    content = b"".join(chunks).decode("utf-8")
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
+
 
 class InputHandler:
     """Handles user input with support for multi-line input and file references."""
 
+    __slots__ = (
+        "multiline_delimiters",
+        "_delimiter_prefixes",
+        "_session",
+        "_multiline_session_obj",
+        "_choice_session",
+        "_resolve_cache",
+        "_content_cache",
+        "_suggest_budget",
+    )
+
     def __init__(self):
         """Initialize the input handler."""
-        self.session = PromptSession(history=InMemoryHistory())
+        # Prompt sessions probe the terminal when built, so they are created
+        # on first use (see the session properties below)
+        self._session: Optional[PromptSession] = None
+        self._multiline_session_obj: Optional[PromptSession] = None
+        self._choice_session: Optional[PromptSession] = None
         self.multiline_delimiters = ['"""', "'''", "```"]
+        self._delimiter_prefixes = tuple(self.multiline_delimiters)
+        self._resolve_cache: Dict[str, Tuple[float, Optional[Path], Optional[os.stat_result]]] = {}
+        self._content_cache: Dict[Tuple[str, int, int], str] = {}
+        self._suggest_budget = 0
+
+    @property
+    def session(self) -> PromptSession:
+        """Prompt session for single-line input, created on first use."""
+        if self._session is None:
+            self._session = PromptSession(history=InMemoryHistory())
+        return self._session
+
+    @property
+    def _multiline_session(self) -> PromptSession:
+        """
+        Editor session for !multiline, created on first use.
+
+        Kept separate so a large paste lands in one buffer, instead of one
+        prompt round trip per line.
+        """
+        if self._multiline_session_obj is None:
+            self._multiline_session_obj = PromptSession(
+                history=InMemoryHistory(),
+                multiline=True,
+                prompt_continuation="... ",
+                key_bindings=_multiline_key_bindings(),
+            )
+        return self._multiline_session_obj
 
     async def get_input(self, prompt: str = "> ") -> Optional[str]:
         """
@@ -35,17 +166,39 @@ class InputHandler:
         """
         user_input = await self.session.prompt_async(prompt)
 
-        if not user_input.strip():
+        stripped = user_input.strip()
+        if not stripped:
             return None
 
-        # Check for multi-line delimiter at the start
-        for delimiter in self.multiline_delimiters:
-            if user_input.strip().startswith(delimiter):
-                return await self._handle_multiline(user_input, delimiter)
+        # Check for multi-line delimiter at the start (one C-level prefix
+        # test; the loop only runs when a delimiter is present)
+        if stripped.startswith(self._delimiter_prefixes):
+            for delimiter in self._delimiter_prefixes:
+                if stripped.startswith(delimiter):
+                    return await self._handle_multiline(user_input, delimiter)
 
         # Process file references
         return await self._process_file_references(user_input)
 
+    async def get_choice(self, prompt: str) -> str:
+        """
+        Ask for a short menu answer without blocking the event loop.
+
+        Answers go to their own history, so they don't show up when the
+        user scrolls back through previous prompts.
+
+        Returns:
+            The stripped answer
+
+        Raises:
+            KeyboardInterrupt: If user presses Ctrl+C
+            EOFError: If user presses Ctrl+D
+        """
+        if self._choice_session is None:
+            self._choice_session = PromptSession(history=InMemoryHistory())
+        answer = await self._choice_session.prompt_async(prompt)
+        return answer.strip()
+
     async def get_multiline_input(self) -> Optional[str]:
         """
         Get multi-line input using a dedicated editor mode.
@@ -62,28 +215,23 @@ class InputHandler:
         console.print("[dim]Press Ctrl+C to cancel.[/dim]")
         console.print()
 
-        lines = []
-
         try:
-            while True:
-                try:
-                    line = await self.session.prompt_async("... ")
-                    lines.append(line)
-                except EOFError:
-                    # Ctrl+D pressed - finish input
-                    break
-
+            result = await self._multiline_session.prompt_async("... ")
         except KeyboardInterrupt:
             console.print("\n[yellow]Multi-line input cancelled[/yellow]")
             return None
-
-        if not lines:
+        except EOFError:
             return None
 
-        result = "\n".join(lines)
+        # Ctrl+D on a fresh line leaves the final newline in the buffer
+        if result.endswith("\n"):
+            result = result[:-1]
+
+        if not result:
+            return None
 
         # Show preview of what was captured
-        line_count = len(lines)
+        line_count = result.count("\n") + 1
         char_count = len(result)
         console.print(f"\n[green]✓[/green] Captured {line_count} lines ({char_count} characters)")
 
@@ -92,26 +240,24 @@ class InputHandler:
 
     async def _handle_multiline(self, first_line: str, delimiter: str) -> str:
         """Handle multi-line input with a delimiter."""
-        lines = [first_line]
-
         console.print("[dim]Multi-line mode (end with same delimiter)...[/dim]")
 
-        # Remove delimiter from first line if it's only the delimiter
-        if first_line.strip() == delimiter:
-            lines = []
-        else:
-            lines[0] = first_line.replace(delimiter, "", 1)
+        # Remove the opening delimiter; drop the first line if nothing else is on it
+        head, _, rest = first_line.partition(delimiter)
+        first = head + rest
+        lines = [first] if first.strip() else []
+        width = len(delimiter)
 
         try:
             while True:
                 line = await self.session.prompt_async("... ")
 
-                if delimiter in line:
-                    # Found closing delimiter
-                    lines.append(line.replace(delimiter, ""))
+                # One scan finds the closing delimiter and where to cut
+                idx = line.find(delimiter)
+                if idx >= 0:
+                    lines.append(line[:idx] + line[idx + width:])
                     break
-                else:
-                    lines.append(line)
+                lines.append(line)
 
         except (KeyboardInterrupt, EOFError):
             console.print("\n[yellow]Multi-line input cancelled[/yellow]")
@@ -131,46 +277,62 @@ class InputHandler:
         - Absolute paths: @/home/user/file.txt
         - Home expansion: @~/file.txt
         """
-        # Find all @filename patterns (improved to catch more cases)
-        pattern = r'@([\w\./\-~]+(?:\.\w+)?)'
-        matches = list(re.finditer(pattern, text))
-
-        processed_text = text
+        # Most prompts contain no reference: skip the regex scan entirely
+        if '@' not in text:
+            return text
+
+        # Strip every @filename reference in one pass, collecting the paths
+        references = []
+        pieces = []
+        last = 0
+        for start, end in _scan_file_references(text):
+            pieces.append(text[last:start])
+            references.append(text[start + 1:end])
+            last = end
+        pieces.append(text[last:])
+        processed_text = "".join(pieces)
         file_contents = []
-
-        for match in matches:
-            filepath = match.group(1)
-
-            # Try to resolve the file path
-            resolved_path = self._resolve_file_path(filepath)
-
-            if resolved_path and resolved_path.exists() and resolved_path.is_file():
-                try:
-                    content = resolved_path.read_text()
-
-                    # Build a formatted file block
-                    file_block = f"\n\n--- File: {filepath} ---\n{content}\n--- End of {filepath} ---\n"
-                    file_contents.append(file_block)
-
-                    console.print(f"[green]✓[/green] Loaded file: [cyan]{filepath}[/cyan] ({len(content)} chars)")
-
-                except Exception as e:
-                    console.print(f"[red]✗[/red] Error reading {filepath}: {str(e)}")
+        suggested = False
+        self._suggest_budget = 0
+
+        # Resolve every reference, then read the files concurrently
+        lookups = [self._lookup_file(filepath) for filepath in references]
+        reads = await asyncio.gather(
+            *(self._read_file(path) for path, _ in lookups if path),
+            return_exceptions=True,
+        )
+        results = iter(reads)
+
+        for filepath, (resolved_path, _) in zip(references, lookups):
+            if resolved_path:
+                content = next(results)
+                if isinstance(content, Exception):
+                    console.print(f"[red]✗[/red] Error reading {filepath}: {str(content)}")
+                    continue
+
+                # Add a formatted file block (joined once at the end,
+                # so the content is never copied into an intermediate string)
+                file_contents.extend((
+                    "\n\n--- File: ", filepath, " ---\n",
+                    content,
+                    "\n--- End of ", filepath, " ---\n"
+                ))
+
+                console.print(f"[green]✓[/green] Loaded file: [cyan]{filepath}[/cyan] ({len(content)} chars)")
             else:
                 # Show helpful error message with current directory
                 cwd = os.getcwd()
                 console.print(f"[yellow]⚠[/yellow] File not found: [cyan]{filepath}[/cyan]")
                 console.print(f"[dim]   Current directory: {cwd}[/dim]")
 
-                # Suggest possible paths
+                # Suggest possible paths (only for the first missing file)
+                if suggested:
+                    continue
+                suggested = True
                 suggestions = self._suggest_file_paths(filepath)
                 if suggestions:
                     console.print(f"[dim]   Did you mean: {', '.join(suggestions)}[/dim]")
 
-        # Replace @filename references with the actual content
-        for match in matches:
-            processed_text = processed_text.replace(match.group(0), "", 1)
-
         # Append all file contents at the end
         if file_contents:
             processed_text = processed_text.strip() + "\n" + "".join(file_contents)
@@ -179,33 +341,79 @@ class InputHandler:
 
     def _resolve_file_path(self, filepath: str) -> Optional[Path]:
         """
-        Resolve a file path trying multiple strategies.
+        Resolve a file reference to a regular file.
+
+        Home-relative paths are expanded; absolute paths are used as-is and
+        relative paths resolve against the current directory.
 
         Returns:
-            Resolved Path object, or None if not found
+            Resolved Path object, or None if not found or not a regular file
         """
-        # Strategy 1: Expand home directory
-        if filepath.startswith('~'):
-            path = Path(filepath).expanduser()
-            if path.exists():
-                return path
+        return self._lookup_file(filepath)[0]
+
+    def _lookup_file(self, filepath: str) -> Tuple[Optional[Path], Optional[os.stat_result]]:
+        """
+        Resolve a file reference with a single stat, reusing recent lookups.
+
+        Both hits and misses are cached for RESOLVE_CACHE_TTL seconds, so a
+        file referenced on consecutive prompts is not resolved again
+        (_read_file still re-stats it before using cached contents).
+
+        Returns:
+            Tuple of (resolved path, stat result), or (None, None)
+        """
+        now = time.monotonic()
+        cached = self._resolve_cache.get(filepath)
+        if cached and now - cached[0] < RESOLVE_CACHE_TTL:
+            return cached[1], cached[2]
 
-        # Strategy 2: Try as absolute path
         path = Path(filepath)
-        if path.is_absolute() and path.exists():
-            return path
+        if filepath.startswith('~'):
+            try:
+                path = path.expanduser()
+            except RuntimeError:
+                # Unknown user in ~user: treat as a literal relative path
+                pass
 
-        # Strategy 3: Try as relative to current directory
-        if path.exists():
-            return path
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
 
-        # Strategy 4: Try relative to working directory
-        cwd = Path.cwd()
-        path = cwd / filepath
-        if path.exists():
-            return path
+        result = (path, st) if st and stat.S_ISREG(st.st_mode) else (None, None)
+        self._resolve_cache[filepath] = (now, *result)
+        return result
 
-        return None
+    async def _read_file(self, path: Path) -> str:
+        """
+        Read a referenced file, reusing the contents if it is unchanged.
+
+        The file is stat-ed again here (the lookup may be up to
+        RESOLVE_CACHE_TTL seconds old), and cached contents are keyed by the
+        real path, so a change of directory cannot serve another file.
+
+        Args:
+            path: Resolved file path
+
+        Returns:
+            File contents
+        """
+        st = os.stat(path)
+        key = (os.path.realpath(path), st.st_mtime_ns, st.st_size)
+        content = self._content_cache.get(key)
+        if content is not None:
+            return content
+
+        # Read in a worker thread so large files don't block the prompt loop
+        content = await asyncio.to_thread(_read_text_file, path)
+
+        if st.st_size <= MAX_CACHED_FILE_SIZE:
+            if len(self._content_cache) >= CONTENT_CACHE_ENTRIES:
+                # Evict the oldest entry (dicts keep insertion order)
+                del self._content_cache[next(iter(self._content_cache))]
+            self._content_cache[key] = content
+
+        return content
 
     def _suggest_file_paths(self, filepath: str) -> list[str]:
         """
@@ -215,24 +423,40 @@ class InputHandler:
             List of suggested paths
         """
         suggestions = []
-        cwd = Path.cwd()
 
-        # Get filename without path
-        filename = Path(filepath).name
+        # An explicit path means the user knows where the file is, and very
+        # short names match too much to be useful
+        if '/' in filepath or len(filepath) < 3:
+            return suggestions
+        filename = filepath
 
-        # Search in current directory and immediate subdirectories
+        # Search in current directory and immediate subdirectories.
+        # DirEntry caches the type from readdir, so no extra stat per entry.
         try:
-            # Current directory
-            for file in cwd.glob(filename):
-                if file.is_file():
-                    suggestions.append(str(file.relative_to(cwd)))
+            if self._suggest_budget >= SUGGEST_DIR_BUDGET:
+                return suggestions
+            self._suggest_budget += 1
+
+            subdirs = []
+            with os.scandir() as entries:
+                for entry in entries:
+                    if entry.name == filename and entry.is_file():
+                        suggestions.append(filename)
+                    elif entry.is_dir():
+                        subdirs.append(entry.name)
 
             # One level deep
-            for file in cwd.glob(f"*/{filename}"):
-                if file.is_file():
-                    suggestions.append(str(file.relative_to(cwd)))
+            for subdir in subdirs:
+                if len(suggestions) >= 3 or self._suggest_budget >= SUGGEST_DIR_BUDGET:
+                    break
+                self._suggest_budget += 1
+                try:
+                    if os.path.isfile(os.path.join(subdir, filename)):
+                        suggestions.append(f"{subdir}/{filename}")
+                except OSError:
+                    continue
 
-        except Exception:
+        except OSError:
             pass
 
         return suggestions[:3]  # Limit to 3 suggestions
@@ -242,11 +466,19 @@ class InputHandler:
         Extract shell command from text if present.
         Looks for code blocks with bash/sh/shell markers.
         """
-        # Pattern for ```bash command ```
-        bash_pattern = r'```(?:bash|sh|shell)\s*\n(.*?)\n```'
-        match = re.search(bash_pattern, text, re.DOTALL)
-
-        if match:
-            return match.group(1).strip()
+        # Scan the fences literally instead of running a DOTALL regex
+        start = text.find('```')
+        while start != -1:
+            tag_end = text.find('\n', start + 3)
+            if tag_end == -1:
+                break
+
+            if text[start + 3:tag_end].rstrip() in _SHELL_FENCE_TAGS:
+                # The closing fence must start its own line
+                close = text.find('\n```', tag_end + 1)
+                if close != -1:
+                    return text[tag_end + 1:close].strip()
+
+            start = text.find('```', start + 1)
 
         return None
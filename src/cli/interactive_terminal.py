@@ -1,14 +1,23 @@
 """Interactive terminal for the agent CLI."""
 
 import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from functools import lru_cache
+from itertools import groupby
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Tuple
 
 from rich.console import Console
 from rich.panel import Panel
-from rich.markdown import Markdown
 from rich.table import Table
-from rich.prompt import IntPrompt, Prompt
+from rich.prompt import IntPrompt
 
-from src.core.config import config
+from src.core.config import ServerConfig, get_config
+from src.core.event_loop import install_event_loop_policy
 from src.core.logger import get_logger, log_command_execution
 from src.cli.input_handler import InputHandler
 from src.cli.command_executor import CommandExecutor
@@ -22,9 +31,225 @@ from src.cli.expert_modes import (
 )
 from src.core.tools import TOOLS
 
+if TYPE_CHECKING:
+    from rich.markdown import Markdown
+
 console = Console()
 logger = get_logger(__name__)
 
+# Longest a streamed reply may sit unflushed in the terminal buffer, in seconds
+STREAM_FLUSH_INTERVAL = 0.05
+
+# Time limit for !<command> shell commands, in seconds
+SHELL_COMMAND_TIMEOUT = 30
+
+# !expert <name> lookup, built once from the enum
+_EXPERT_MAP: Mapping[str, ExpertMode] = MappingProxyType({m.value: m for m in ExpertMode})
+_EXPERT_NAMES = ", ".join(_EXPERT_MAP)
+
+_WELCOME_TEMPLATE = (
+    "[bold cyan]🚀 FastAPI Agent CLI[/bold cyan]\n\n"
+    "[bold]Configuration:[/bold]\n"
+    "• Server: {server_url}\n"
+    "• Model: {model_name}\n"
+    "• Expert: {expert_icon} {expert_name}\n"
+    "• Response: {response_label}\n\n"
+    "[bold]Special Commands:[/bold]\n"
+    "• !mode quick|full - Switch response mode\n"
+    "• !expert linux|python|devops|database|general - Switch expert\n"
+    "• !status - Show current configuration\n"
+    "• !clear - Clear conversation history\n"
+    "• !multiline - Enter multi-line input mode\n"
+    "• !help - Show help\n"
+    "• !quit, !exit, !q - Exit\n\n"
+    "[bold]Input Features:[/bold]\n"
+    "• Multi-line mode: !multiline (finish with Ctrl+D)\n"
+    "• Quick multi-line: Use ''' or ``` or \"\"\"\n"
+    "• File ingestion: @filename.txt\n"
+    "• Shell commands: !ls, !pwd, !git status\n"
+    "• Interrupt: Press Ctrl+C during response\n\n"
+    "[dim]Note: Command suggestions only in Linux Expert mode[/dim]"
+)
+
+_STATUS_TEMPLATE = (
+    "[bold]Current Configuration:[/bold]\n\n"
+    "Expert Mode: {expert_icon} [cyan]{expert_name}[/cyan]\n"
+    "Response Mode: [cyan]{response_mode}[/cyan]\n"
+    "Temperature: [cyan]{temperature}[/cyan]\n"
+    "Max Tokens: [cyan]{max_tokens}[/cyan]\n"
+    "Messages in history: [cyan]{history_len}[/cyan]"
+)
+
+_HELP_TEXT = """
+# FastAPI Agent CLI Help
+
+## Special Commands
+
+All special commands start with `!`:
+
+- `!quit`, `!exit`, `!q` - Exit the CLI
+- `!clear` - Clear conversation history
+- `!status` - Show current configuration
+- `!mode quick|full` - Switch between quick/full response modes
+- `!expert linux|python|devops|database|general` - Switch expert mode
+- `!auto-approve on|off` - Toggle automatic command approval
+- `!multiline` - Enter dedicated multi-line input mode
+- `!help` - Show this help
+
+## Direct Shell Commands
+
+Execute shell commands directly with `!` prefix:
+
+- `!ls` - List files
+- `!pwd` - Print working directory
+- `!cat file.txt` - Read file
+- `!git status` - Git commands
+- Any shell command: `!<command>`
+
+## Input Features
+
+### Multi-line Input
+
+**Dedicated Mode (Recommended):**
+Type `!multiline` to enter a clean multi-line editor:
+```
+You > !multiline
+📝 Multi-line input mode
+Type or paste your text. Press Ctrl+D (Unix) or Ctrl+Z (Windows) on a new line to finish.
+... def hello():
+...     print("world")
+... [Ctrl+D]
+✓ Captured 2 lines (35 characters)
+```
+
+**Quick Mode:**
+Use triple quotes or backticks:
+```
+You > '''
+def hello():
+    print("world")
+'''
+```
+
+### File Ingestion
+Use @ to include file contents:
+```
+You > Review this code @main.py
+You > Compare @file1.py and @file2.py
+```
+
+Supports:
+- Relative paths: `@file.txt`, `@cli/file.py`
+- Absolute paths: `@/home/user/file.txt`
+- Home expansion: `@~/file.txt`
+
+## Command Suggestions
+
+**Available ONLY in Linux Expert mode** (`!expert linux`)
+
+When the agent suggests shell commands, you'll see a numbered menu:
+
+```
+1. ls *.py
+   → List Python files
+
+2. find . -name "*.py"
+   → Find Python files recursively
+
+0. Do nothing
+   → Skip execution
+
+Select command [0-2, or 'm' to modify]:
+```
+
+Options:
+- Enter a number (1, 2, etc.) to execute that command
+- Enter `0` to skip
+- Enter `m` to modify the command before executing
+
+## Expert Modes
+
+Each expert mode has specialized knowledge:
+
+- **Linux** 🐧 - Shell commands, system administration
+- **Python** 🐍 - Python coding, debugging
+- **DevOps** 🚀 - Docker, K8s, CI/CD
+- **Database** 🗄️ - SQL, query optimization
+- **General** 💬 - Mixed capabilities
+
+## Response Modes
+
+- **Quick** ⚡ - Concise, fast answers
+- **Full** 📖 - Detailed explanations
+
+## Keyboard Shortcuts
+
+- `Ctrl+C` during response - Interrupt LLM response
+- `Ctrl+C` at prompt - Show reminder to use !quit
+- `Ctrl+D` - Exit (alternative to !quit)
+
+## Tips
+
+1. **Start with expert mode** - Choose the right expert for your task
+2. **Use quick mode** for simple questions
+3. **Use full mode** when you need explanations
+4. **Interrupt bad responses** with Ctrl+C
+5. **Review commands** before executing (unless auto-approve is on)
+"""
+
+
+@lru_cache(maxsize=1)
+def _help_markdown() -> "Markdown":
+    """Parse the !help Markdown once and reuse it."""
+    # rich.markdown pulls in markdown-it; only !help needs it
+    from rich.markdown import Markdown
+
+    return Markdown(_HELP_TEXT)
+
+
+def _selection_table(label: str, rows) -> Table:
+    """Build a numbered selection table from (index, name, description) rows."""
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("#", style="dim", width=3)
+    table.add_column(label, style="bold")
+    table.add_column("Description")
+
+    for idx, name, desc in rows:
+        table.add_row(str(idx), name, desc)
+
+    return table
+
+
+@lru_cache(maxsize=1)
+def _expert_table() -> Table:
+    """Expert mode menu; the rows are static, so it is built once."""
+    return _selection_table("Expert", get_expert_display_info())
+
+
+@lru_cache(maxsize=1)
+def _response_table() -> Table:
+    """Response mode menu; the rows are static, so it is built once."""
+    return _selection_table("Mode", get_response_mode_display_info())
+
+
+def _split_special_command(command: str) -> Tuple[str, List[str]]:
+    """
+    Split "!name arg ..." into its case-folded name and arguments.
+
+    The command is case-folded and split once; handlers use the parts as-is.
+    """
+    parts = command.casefold().split()
+    if not parts:
+        return "", []
+    return parts[0][1:], parts[1:]
+
+
+def _tool_call_key(tool_call: Dict[str, Any]) -> str:
+    """Identity of a tool call for de-duplication: tool name plus arguments."""
+    return json.dumps(
+        [tool_call["name"], tool_call["arguments"]], sort_keys=True, default=str
+    )
+
 
 class InteractiveCLI:
     """Interactive CLI with command execution and file ingestion support."""
@@ -39,37 +264,40 @@ class InteractiveCLI:
         self.llm_client = None
         self.base_url = base_url
         self.model = model
+
+        # !<name> handlers; _commands only match when no arguments follow
+        self._commands = {
+            "quit": self._cmd_quit,
+            "exit": self._cmd_quit,
+            "q": self._cmd_quit,
+            "clear": self._cmd_clear,
+            "status": self._cmd_status,
+            "help": self._cmd_help,
+            "multiline": self._cmd_multiline,
+        }
+        self._arg_commands = {
+            "mode": self._cmd_mode,
+            "expert": self._cmd_expert,
+            "auto-approve": self._cmd_auto_approve,
+        }
         logger.debug(f"CLI initialized with base_url={base_url}, model={model}")
 
     def _select_server_and_model(self):
         """Interactive selection of server and model."""
-        console.print("\n[bold cyan]🖥️  Select LLM Server[/bold cyan]\n")
-
-        # Display server options
-        table = Table(show_header=True, header_style="bold magenta")
-        table.add_column("#", style="dim", width=3)
-        table.add_column("Server Name")
-        table.add_column("URL")
-        table.add_column("Available Models")
-
-        for idx, server in enumerate(config.servers, 1):
-            models_str = ", ".join(server.models[:3])
-            if len(server.models) > 3:
-                models_str += f" (+{len(server.models) - 3} more)"
-            table.add_row(str(idx), server.name, server.url, models_str)
+        servers = get_config().servers
+        n_servers = len(servers)
 
-        console.print(table)
+        if n_servers == 1:
+            # Nothing to choose: skip the server table and prompt
+            selected_server = servers[0]
+            console.print(f"\n[bold cyan]🖥️  Server:[/bold cyan] {selected_server.name} ({selected_server.url})")
+        else:
+            selected_server = self._prompt_for_server(servers)
 
-        # Get server selection
-        while True:
-            try:
-                server_idx = IntPrompt.ask("\nSelect server number", default=1)
-                if 1 <= server_idx <= len(config.servers):
-                    selected_server = config.servers[server_idx - 1]
-                    break
-                console.print("[red]Invalid selection. Try again.[/red]")
-            except (ValueError, KeyboardInterrupt):
-                console.print("[red]Invalid input. Try again.[/red]")
+        models = selected_server.models
+        if len(models) == 1:
+            console.print(f"[bold cyan]🤖 Model:[/bold cyan] {models[0]}")
+            return selected_server, models[0]
 
         # Display model options
         console.print(f"\n[bold cyan]🤖 Select Model for {selected_server.name}[/bold cyan]\n")
@@ -78,17 +306,18 @@ class InteractiveCLI:
         model_table.add_column("#", style="dim", width=3)
         model_table.add_column("Model Name")
 
-        for idx, model in enumerate(selected_server.models, 1):
+        for idx, model in enumerate(models, 1):
             model_table.add_row(str(idx), model)
 
         console.print(model_table)
 
         # Get model selection
+        n_models = len(models)
         while True:
             try:
                 model_idx = IntPrompt.ask("\nSelect model number", default=1)
-                if 1 <= model_idx <= len(selected_server.models):
-                    selected_model = selected_server.models[model_idx - 1]
+                if 1 <= model_idx <= n_models:
+                    selected_model = models[model_idx - 1]
                     break
                 console.print("[red]Invalid selection. Try again.[/red]")
             except (ValueError, KeyboardInterrupt):
@@ -96,27 +325,48 @@ class InteractiveCLI:
 
         return selected_server, selected_model
 
-    def _select_expert_mode(self) -> ExpertMode:
-        """Interactive selection of expert mode."""
-        console.print("\n[bold cyan]🎯 Select Expert Mode[/bold cyan]\n")
+    def _prompt_for_server(self, servers: List[ServerConfig]) -> ServerConfig:
+        """Show the server table and ask which one to use."""
+        console.print("\n[bold cyan]🖥️  Select LLM Server[/bold cyan]\n")
 
+        # Display server options
         table = Table(show_header=True, header_style="bold magenta")
         table.add_column("#", style="dim", width=3)
-        table.add_column("Expert", style="bold")
-        table.add_column("Description")
+        table.add_column("Server Name")
+        table.add_column("URL")
+        table.add_column("Available Models")
 
-        expert_info = get_expert_display_info()
-        for idx, name, desc in expert_info:
-            table.add_row(str(idx), name, desc)
+        for idx, server in enumerate(servers, 1):
+            models_str = ", ".join(server.models[:3])
+            if len(server.models) > 3:
+                models_str += f" (+{len(server.models) - 3} more)"
+            table.add_row(str(idx), server.name, server.url, models_str)
 
         console.print(table)
 
+        # Get server selection
+        n_servers = len(servers)
+        while True:
+            try:
+                server_idx = IntPrompt.ask("\nSelect server number", default=1)
+                if 1 <= server_idx <= n_servers:
+                    return servers[server_idx - 1]
+                console.print("[red]Invalid selection. Try again.[/red]")
+            except (ValueError, KeyboardInterrupt):
+                console.print("[red]Invalid input. Try again.[/red]")
+
+    def _select_expert_mode(self) -> ExpertMode:
+        """Interactive selection of expert mode."""
+        console.print("\n[bold cyan]🎯 Select Expert Mode[/bold cyan]\n")
+
+        console.print(_expert_table())
+
+        # Display rows follow ExpertMode declaration order
+        modes = tuple(ExpertMode)
         while True:
             try:
                 choice = IntPrompt.ask("\nSelect expert mode", default=1)
-                if 1 <= choice <= len(expert_info):
-                    # Map choice to ExpertMode enum
-                    modes = list(ExpertMode)
+                if 1 <= choice <= len(modes):
                     return modes[choice - 1]
                 console.print("[red]Invalid selection. Try again.[/red]")
             except (ValueError, KeyboardInterrupt):
@@ -126,16 +376,7 @@ class InteractiveCLI:
         """Interactive selection of response mode."""
         console.print("\n[bold cyan]💬 Select Response Mode[/bold cyan]\n")
 
-        table = Table(show_header=True, header_style="bold magenta")
-        table.add_column("#", style="dim", width=3)
-        table.add_column("Mode", style="bold")
-        table.add_column("Description")
-
-        mode_info = get_response_mode_display_info()
-        for idx, name, desc in mode_info:
-            table.add_row(str(idx), name, desc)
-
-        console.print(table)
+        console.print(_response_table())
 
         while True:
             try:
@@ -185,27 +426,13 @@ class InteractiveCLI:
         # Show welcome panel
         console.print("\n")
         console.print(Panel.fit(
-            f"[bold cyan]🚀 FastAPI Agent CLI[/bold cyan]\n\n"
-            f"[bold]Configuration:[/bold]\n"
-            f"• Server: {server_url}\n"
-            f"• Model: {model_name}\n"
-            f"• Expert: {config_info['icon']} {config_info['expert_mode'].title()}\n"
-            f"• Response: {'⚡ Quick' if response_mode == ResponseMode.QUICK else '📖 Full'}\n\n"
-            f"[bold]Special Commands:[/bold]\n"
-            f"• !mode quick|full - Switch response mode\n"
-            f"• !expert linux|python|devops|database|general - Switch expert\n"
-            f"• !status - Show current configuration\n"
-            f"• !clear - Clear conversation history\n"
-            f"• !multiline - Enter multi-line input mode\n"
-            f"• !help - Show help\n"
-            f"• !quit, !exit, !q - Exit\n\n"
-            f"[bold]Input Features:[/bold]\n"
-            f"• Multi-line mode: !multiline (finish with Ctrl+D)\n"
-            f"• Quick multi-line: Use ''' or ``` or \"\"\"\n"
-            f"• File ingestion: @filename.txt\n"
-            f"• Shell commands: !ls, !pwd, !git status\n"
-            f"• Interrupt: Press Ctrl+C during response\n\n"
-            f"[dim]Note: Command suggestions only in Linux Expert mode[/dim]",
+            _WELCOME_TEMPLATE.format(
+                server_url=server_url,
+                model_name=model_name,
+                expert_icon=config_info['icon'],
+                expert_name=config_info['expert_mode'].title(),
+                response_label='⚡ Quick' if response_mode == ResponseMode.QUICK else '📖 Full',
+            ),
             title="✨ Welcome",
             border_style="cyan"
         ))
@@ -246,92 +473,138 @@ class InteractiveCLI:
                             logger.info("User requested exit via special command")
                             break  # Exit requested
 
-                    # Add user message to conversation
-                    self.llm_client.add_user_message(user_input)
+                    await self._run_turn(user_input)
 
-                    # Get LLM response
-                    console.print("\n[bold blue]Agent[/bold blue]: ", end="")
+                except KeyboardInterrupt:
+                    # Catch any other KeyboardInterrupt (safety net)
+                    # Specific cases (at prompt, during streaming) are handled above
+                    console.print("\n[yellow]Use !quit to exit[/yellow]")
+                    continue
 
-                    response_text = ""
-                    tool_calls = []
-                    was_cancelled = False
+        finally:
+            if self.llm_client:
+                await self.llm_client.close()
 
-                    # Reset cancellation flags before starting new request
-                    self.llm_client._cancel_flag = False
-                    self.llm_client.base_client._stream_cancelled = False
+    async def _run_turn(self, user_input: str):
+        """Send one user message and handle the streamed reply."""
+        # Add user message to conversation
+        self.llm_client.add_user_message(user_input)
 
-                    # Create a streaming task
-                    async def stream_response():
-                        nonlocal response_text, tool_calls, was_cancelled
-                        try:
-                            async for chunk in self.llm_client.chat_with_tools():
-                                if chunk["type"] == "text":
-                                    console.print(chunk["content"], end="")
-                                    response_text += chunk["content"]
-                                elif chunk["type"] == "tool_call":
-                                    tool_calls.append(chunk)
-                                elif chunk["type"] == "cancelled":
-                                    was_cancelled = True
-                                    break
-                        except asyncio.CancelledError:
-                            was_cancelled = True
-                            raise
-
-                    stream_task = asyncio.create_task(stream_response())
+        response_text, tool_calls, was_cancelled = await self._stream_turn()
 
-                    try:
-                        await stream_task
-                    except KeyboardInterrupt:
-                        # User pressed Ctrl+C during streaming
-                        logger.info("User interrupted response with Ctrl+C")
-                        self.llm_client.cancel_response()
-                        stream_task.cancel()
-                        try:
-                            await stream_task
-                        except asyncio.CancelledError:
-                            pass
-                        console.print("\n\n[yellow]⚠️  Response interrupted![/yellow]")
-                        was_cancelled = True
-                    except Exception as e:
-                        # Catch any other errors during streaming
-                        logger.error(f"Error during streaming: {e}", exc_info=True)
-                        console.print(f"\n[red]Error during streaming: {e}[/red]")
-                        was_cancelled = True
-
-                    console.print()  # Newline after response
-
-                    if was_cancelled:
-                        # Don't save incomplete response
-                        # Remove the user message we just added since there's no response
-                        if self.llm_client.conversation_history and \
-                           self.llm_client.conversation_history[-1]["role"] == "user":
-                            self.llm_client.conversation_history.pop()
-                        continue
+        if was_cancelled:
+            # Don't save incomplete response
+            # Remove the user message we just added since there's no response
+            self.llm_client.discard_last_user_message()
+            return
 
-                    # Save assistant response
-                    self.llm_client.add_assistant_message(response_text)
+        # Save assistant response
+        self.llm_client.add_assistant_message(response_text)
 
-                    # Parse commands from response - ONLY for Linux expert mode
-                    if self.llm_client.expert_mode == ExpertMode.LINUX:
-                        command_options = self.command_parser.parse(response_text)
+        # Parse commands from response - ONLY for Linux expert mode
+        if self.llm_client.expert_mode is ExpertMode.LINUX and response_text:
+            command_options = self.command_parser.parse(response_text)
 
-                        if command_options:
-                            # Show command menu
-                            await self._handle_command_suggestions(command_options)
+            if command_options:
+                # Show command menu
+                await self._handle_command_suggestions(command_options)
 
-                    # Execute any tool calls (from JSON blocks)
-                    if tool_calls:
-                        await self._handle_tool_calls(tool_calls)
+        # Execute any tool calls (from JSON blocks)
+        if tool_calls:
+            await self._handle_tool_calls(tool_calls)
 
-                except KeyboardInterrupt:
-                    # Catch any other KeyboardInterrupt (safety net)
-                    # Specific cases (at prompt, during streaming) are handled above
-                    console.print("\n[yellow]Use !quit to exit[/yellow]")
-                    continue
+    async def _stream_turn(self) -> Tuple[str, List[Dict[str, Any]], bool]:
+        """
+        Stream the agent's reply to the console.
+
+        Returns:
+            Tuple of (response text, tool calls, whether it was cancelled)
+        """
+        console.print("\n[bold blue]Agent[/bold blue]: ", end="")
+
+        # Interrupted or failed streams count as cancelled
+        result: Tuple[str, List[Dict[str, Any]], bool] = ("", [], True)
+
+        stream_task = asyncio.create_task(self._drain_stream())
+        interrupted = asyncio.Event()
 
+        def on_interrupt():
+            # Ctrl+C during streaming: record it and stop the stream task
+            interrupted.set()
+            self.llm_client.cancel_response()
+            stream_task.cancel()
+
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, on_interrupt)
+            handler_installed = True
+        except (NotImplementedError, RuntimeError):
+            # No loop signal handlers (e.g. Windows): Ctrl+C arrives as
+            # KeyboardInterrupt instead
+            handler_installed = False
+
+        try:
+            result = await stream_task
+        except asyncio.CancelledError:
+            if not interrupted.is_set():
+                raise
+        except KeyboardInterrupt:
+            on_interrupt()
+            try:
+                await stream_task
+            except asyncio.CancelledError:
+                pass
+        except Exception as e:
+            # Catch any other errors during streaming
+            logger.error(f"Error during streaming: {e}", exc_info=True)
+            console.print(f"\n[red]Error during streaming: {e}[/red]")
         finally:
-            if self.llm_client:
-                await self.llm_client.close()
+            if handler_installed:
+                loop.remove_signal_handler(signal.SIGINT)
+
+        if interrupted.is_set():
+            logger.info("User interrupted response with Ctrl+C")
+            console.print("\n\n[yellow]⚠️  Response interrupted![/yellow]")
+            result = ("", [], True)
+
+        console.print()  # Newline after response
+
+        return result
+
+    async def _drain_stream(self) -> Tuple[str, List[Dict[str, Any]], bool]:
+        """
+        Print streamed chunks and collect the reply.
+
+        Returns:
+            Tuple of (response text, tool calls, whether it was cancelled)
+        """
+        response_parts = []
+        tool_calls = []
+        was_cancelled = False
+
+        # Streamed text is plain, so it bypasses Rich's markup rendering;
+        # the terminal is flushed on newlines or every STREAM_FLUSH_INTERVAL
+        out = console.file
+        last_flush = time.monotonic()
+        try:
+            async for chunk in self.llm_client.chat_with_tools():
+                if chunk["type"] == "text":
+                    text = chunk["content"]
+                    out.write(text)
+                    response_parts.append(text)
+                    now = time.monotonic()
+                    if "\n" in text or now - last_flush >= STREAM_FLUSH_INTERVAL:
+                        out.flush()
+                        last_flush = now
+                elif chunk["type"] == "tool_call":
+                    tool_calls.append(chunk)
+                elif chunk["type"] == "cancelled":
+                    was_cancelled = True
+                    break
+        finally:
+            out.flush()
+
+        return "".join(response_parts), tool_calls, was_cancelled
 
     async def _handle_special_command(self, command: str) -> bool:
         """
@@ -340,206 +613,172 @@ class InteractiveCLI:
         Returns:
             True to continue loop, False to exit
         """
-        cmd_lower = command.lower().strip()
-
-        # Exit commands
-        if cmd_lower in ["!quit", "!exit", "!q"]:
-            logger.info("User quit command")
-            console.print("\n[yellow]👋 Goodbye![/yellow]")
-            return False
-
-        # Clear history
-        elif cmd_lower == "!clear":
-            logger.info("User cleared conversation history")
-            self.llm_client.clear_history()
-            console.print("[yellow]✓ Conversation history cleared[/yellow]")
-            return True
-
-        # Show status
-        elif cmd_lower == "!status":
-            config_info = self.llm_client.get_current_config()
-            console.print(Panel(
-                f"[bold]Current Configuration:[/bold]\n\n"
-                f"Expert Mode: {config_info['icon']} [cyan]{config_info['expert_mode'].title()}[/cyan]\n"
-                f"Response Mode: [cyan]{config_info['response_mode'].title()}[/cyan]\n"
-                f"Temperature: [cyan]{config_info['temperature']}[/cyan]\n"
-                f"Max Tokens: [cyan]{config_info['max_tokens']}[/cyan]\n"
-                f"Messages in history: [cyan]{self.llm_client.get_history_length()}[/cyan]",
-                title="Status",
-                border_style="blue"
-            ))
-            return True
-
-        # Change response mode
-        elif cmd_lower.startswith("!mode"):
-            parts = cmd_lower.split()
-            if len(parts) == 2:
-                mode = parts[1]
-                if mode == "quick":
-                    self.llm_client.set_response_mode(ResponseMode.QUICK)
-                    console.print("[green]✓ Response mode: ⚡ Quick (concise answers)[/green]")
-                elif mode == "full":
-                    self.llm_client.set_response_mode(ResponseMode.FULL)
-                    console.print("[green]✓ Response mode: 📖 Full (detailed explanations)[/green]")
-                else:
-                    console.print(f"[red]Unknown mode: {mode}. Use 'quick' or 'full'[/red]")
-            else:
-                config_info = self.llm_client.get_current_config()
-                console.print(f"Current mode: [cyan]{config_info['response_mode']}[/cyan]")
-                console.print("Usage: !mode quick|full")
-            return True
-
-        # Change expert mode
-        elif cmd_lower.startswith("!expert"):
-            parts = cmd_lower.split()
-            if len(parts) == 2:
-                expert = parts[1]
-                expert_map = {
-                    "linux": ExpertMode.LINUX,
-                    "python": ExpertMode.PYTHON,
-                    "devops": ExpertMode.DEVOPS,
-                    "database": ExpertMode.DATABASE,
-                    "general": ExpertMode.GENERAL
-                }
-                if expert in expert_map:
-                    self.llm_client.set_expert_mode(expert_map[expert])
-                    # Clear history when switching expert mode to avoid contamination
-                    self.llm_client.clear_history()
-                    config_info = self.llm_client.get_current_config()
-
-                    # Show system prompt preview when switching
-                    system_preview = self.llm_client.system_prompt[:150].replace('\n', ' ')
-                    console.print(f"[green]✓ Expert mode: {config_info['icon']} {expert.title()}[/green]")
-                    console.print(f"[dim]System: {system_preview}...[/dim]")
-                    console.print("[yellow]💡 Conversation history cleared[/yellow]")
-                else:
-                    console.print(f"[red]Unknown expert: {expert}[/red]")
-                    console.print("Available: linux, python, devops, database, general")
-            else:
-                config_info = self.llm_client.get_current_config()
-                console.print(f"Current expert: [cyan]{config_info['expert_mode']}[/cyan]")
-                console.print("Usage: !expert linux|python|devops|database|general")
-            return True
-
-        # Auto-approve
-        elif cmd_lower.startswith("!auto-approve"):
-            parts = cmd_lower.split()
-            if len(parts) > 1:
-                if parts[1] == "on":
-                    self.auto_approve = True
-                    console.print("[green]✓ Auto-approve enabled (commands execute automatically)[/green]")
-                elif parts[1] == "off":
-                    self.auto_approve = False
-                    console.print("[yellow]✓ Auto-approve disabled (manual approval required)[/yellow]")
-            else:
-                status = "enabled" if self.auto_approve else "disabled"
-                console.print(f"Auto-approve is currently: [bold]{status}[/bold]")
-                console.print("Usage: !auto-approve on|off")
-            return True
-
-        # Help
-        elif cmd_lower == "!help":
-            self._show_help()
-            return True
-
-        # Multi-line input mode
-        elif cmd_lower == "!multiline":
-            user_input = await self.input_handler.get_multiline_input()
-            if user_input:
-                # Add user message to conversation
-                self.llm_client.add_user_message(user_input)
-
-                # Get LLM response
-                console.print("\n[bold blue]Agent[/bold blue]: ", end="")
-
-                response_text = ""
-                tool_calls = []
-                was_cancelled = False
-
-                # Reset cancellation flags before starting new request
-                self.llm_client._cancel_flag = False
-                self.llm_client.base_client._stream_cancelled = False
-
-                # Create a streaming task
-                async def stream_response():
-                    nonlocal response_text, tool_calls, was_cancelled
-                    try:
-                        async for chunk in self.llm_client.chat_with_tools():
-                            if chunk["type"] == "text":
-                                console.print(chunk["content"], end="")
-                                response_text += chunk["content"]
-                            elif chunk["type"] == "tool_call":
-                                tool_calls.append(chunk)
-                            elif chunk["type"] == "cancelled":
-                                was_cancelled = True
-                                break
-                    except asyncio.CancelledError:
-                        was_cancelled = True
-                        raise
-
-                stream_task = asyncio.create_task(stream_response())
-
-                try:
-                    await stream_task
-                except KeyboardInterrupt:
-                    # User pressed Ctrl+C during streaming
-                    self.llm_client.cancel_response()
-                    stream_task.cancel()
-                    try:
-                        await stream_task
-                    except asyncio.CancelledError:
-                        pass
-                    console.print("\n\n[yellow]⚠️  Response interrupted![/yellow]")
-                    was_cancelled = True
-                except Exception as e:
-                    # Catch any other errors during streaming
-                    console.print(f"\n[red]Error during streaming: {e}[/red]")
-                    was_cancelled = True
-
-                if not was_cancelled:
-                    console.print()  # New line after response
+        head, args = _split_special_command(command)
 
-                    # Handle tool calls if any
-                    if tool_calls and not was_cancelled:
-                        await self._handle_tool_calls(tool_calls)
+        # Commands without arguments match exactly; "!clear foo" is a shell command
+        handler = None if args else self._commands.get(head)
+        if handler is None:
+            handler = self._arg_commands.get(head)
 
-            return True
+        if handler is not None:
+            return await handler(args)
 
         # Direct shell command execution (like !ls, !pwd, !cd, etc.)
+        return await self._run_shell_command(command)
+
+    async def _cmd_quit(self, args: List[str]) -> bool:
+        """Exit the CLI."""
+        logger.info("User quit command")
+        console.print("\n[yellow]👋 Goodbye![/yellow]")
+        return False
+
+    async def _cmd_clear(self, args: List[str]) -> bool:
+        """Clear conversation history."""
+        logger.info("User cleared conversation history")
+        self.llm_client.clear_history()
+        console.print("[yellow]✓ Conversation history cleared[/yellow]")
+        return True
+
+    async def _cmd_status(self, args: List[str]) -> bool:
+        """Show current configuration."""
+        config_info = self.llm_client.get_current_config()
+        console.print(Panel(
+            _STATUS_TEMPLATE.format(
+                expert_icon=config_info['icon'],
+                expert_name=config_info['expert_mode'].title(),
+                response_mode=config_info['response_mode'].title(),
+                temperature=config_info['temperature'],
+                max_tokens=config_info['max_tokens'],
+                history_len=self.llm_client.get_history_length(),
+            ),
+            title="Status",
+            border_style="blue"
+        ))
+        return True
+
+    async def _cmd_mode(self, args: List[str]) -> bool:
+        """Change response mode."""
+        if len(args) == 1:
+            mode = args[0]
+            if mode == "quick":
+                self.llm_client.set_response_mode(ResponseMode.QUICK)
+                console.print("[green]✓ Response mode: ⚡ Quick (concise answers)[/green]")
+            elif mode == "full":
+                self.llm_client.set_response_mode(ResponseMode.FULL)
+                console.print("[green]✓ Response mode: 📖 Full (detailed explanations)[/green]")
+            else:
+                console.print(f"[red]Unknown mode: {mode}. Use 'quick' or 'full'[/red]")
         else:
-            # Extract command after the !
-            shell_cmd = command[1:].strip()  # Remove the ! prefix
-            if shell_cmd:
-                logger.info(f"Executing direct shell command: {shell_cmd}")
-                console.print(f"[dim]$ {shell_cmd}[/dim]")
-                # Execute the command
-                import subprocess
+            config_info = self.llm_client.get_current_config()
+            console.print(f"Current mode: [cyan]{config_info['response_mode']}[/cyan]")
+            console.print("Usage: !mode quick|full")
+        return True
+
+    async def _cmd_expert(self, args: List[str]) -> bool:
+        """Change expert mode."""
+        if len(args) == 1:
+            expert = args[0]
+            if expert in _EXPERT_MAP:
+                self.llm_client.set_expert_mode(_EXPERT_MAP[expert])
+                # Clear history when switching expert mode to avoid contamination
+                self.llm_client.clear_history()
+                config_info = self.llm_client.get_current_config()
+
+                # Show system prompt preview when switching
+                system_preview = self.llm_client.system_prompt_preview
+                console.print(f"[green]✓ Expert mode: {config_info['icon']} {expert.title()}[/green]")
+                console.print(f"[dim]System: {system_preview}...[/dim]")
+                console.print("[yellow]💡 Conversation history cleared[/yellow]")
+            else:
+                console.print(f"[red]Unknown expert: {expert}[/red]")
+                console.print(f"Available: {_EXPERT_NAMES}")
+        else:
+            config_info = self.llm_client.get_current_config()
+            console.print(f"Current expert: [cyan]{config_info['expert_mode']}[/cyan]")
+            console.print("Usage: !expert linux|python|devops|database|general")
+        return True
+
+    async def _cmd_auto_approve(self, args: List[str]) -> bool:
+        """Toggle automatic command approval."""
+        if args:
+            if args[0] == "on":
+                self.auto_approve = True
+                console.print("[green]✓ Auto-approve enabled (commands execute automatically)[/green]")
+            elif args[0] == "off":
+                self.auto_approve = False
+                console.print("[yellow]✓ Auto-approve disabled (manual approval required)[/yellow]")
+        else:
+            status = "enabled" if self.auto_approve else "disabled"
+            console.print(f"Auto-approve is currently: [bold]{status}[/bold]")
+            console.print("Usage: !auto-approve on|off")
+        return True
+
+    async def _cmd_help(self, args: List[str]) -> bool:
+        """Show help."""
+        self._show_help()
+        return True
+
+    async def _cmd_multiline(self, args: List[str]) -> bool:
+        """Enter multi-line input mode."""
+        user_input = await self.input_handler.get_multiline_input()
+        if user_input:
+            await self._run_turn(user_input)
+        return True
+
+    async def _run_shell_command(self, command: str) -> bool:
+        """Run a !<command> directly in the shell."""
+        # Extract command after the !
+        shell_cmd = command[1:].strip()  # Remove the ! prefix
+        if shell_cmd:
+            logger.info(f"Executing direct shell command: {shell_cmd}")
+            console.print(f"[dim]$ {shell_cmd}[/dim]")
+            # Execute the command
+            # Run without blocking the event loop
+            try:
+                process = await asyncio.create_subprocess_shell(
+                    shell_cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    # Own process group, so a timeout also stops the shell's children
+                    start_new_session=hasattr(os, "killpg")
+                )
                 try:
-                    result = subprocess.run(
-                        shell_cmd,
-                        shell=True,
-                        capture_output=True,
-                        text=True,
-                        timeout=30
+                    stdout_bytes, stderr_bytes = await asyncio.wait_for(
+                        process.communicate(), timeout=SHELL_COMMAND_TIMEOUT
                     )
-                    success = result.returncode == 0
-                    output = result.stdout if success else result.stderr
-                    log_command_execution(logger, shell_cmd, output, success)
-
-                    if result.stdout:
-                        console.print(result.stdout.rstrip())
-                    if result.stderr:
-                        console.print(f"[red]{result.stderr.rstrip()}[/red]")
-                except subprocess.TimeoutExpired:
-                    logger.error(f"Command timed out: {shell_cmd}")
-                    console.print("[red]Command timed out (30s limit)[/red]")
-                except Exception as e:
-                    logger.error(f"Command execution error: {e}", exc_info=True)
-                    console.print(f"[red]Error: {e}[/red]")
-            else:
-                logger.warning("Empty shell command provided")
-                console.print("[red]Empty command[/red]")
-            return True
+                except BaseException:
+                    # Timeout or cancellation: the child is outside the
+                    # terminal's process group, so Ctrl+C does not reach it
+                    try:
+                        if hasattr(os, "killpg"):
+                            os.killpg(process.pid, signal.SIGKILL)
+                        else:
+                            process.kill()
+                    except ProcessLookupError:
+                        pass  # Finished just as the wait ended
+                    await process.wait()
+                    raise
+
+                stdout = stdout_bytes.decode(errors="replace")
+                stderr = stderr_bytes.decode(errors="replace")
+                success = process.returncode == 0
+                output = stdout if success else stderr
+                log_command_execution(logger, shell_cmd, output, success)
+
+                if stdout:
+                    console.print(stdout.rstrip())
+                if stderr:
+                    console.print(f"[red]{stderr.rstrip()}[/red]")
+            except asyncio.TimeoutError:
+                logger.error(f"Command timed out: {shell_cmd}")
+                console.print(f"[red]Command timed out ({SHELL_COMMAND_TIMEOUT}s limit)[/red]")
+            except Exception as e:
+                logger.error(f"Command execution error: {e}", exc_info=True)
+                console.print(f"[red]Error: {e}[/red]")
+        else:
+            logger.warning("Empty shell command provided")
+            console.print("[red]Empty command[/red]")
+        return True
 
     async def _handle_command_suggestions(self, command_options):
         """Handle suggested commands from LLM response."""
@@ -547,14 +786,14 @@ class InteractiveCLI:
         menu = format_command_menu(command_options)
         console.print(menu)
 
-        # Get user choice using simple input
-        print()  # Use plain print to avoid Rich conflicts
+        # Get user choice without blocking the event loop
+        console.print()
 
         try:
-            choice_input = input("Select command [0]: ").strip()
+            choice_input = await self.input_handler.get_choice("Select command [0]: ")
             choice = choice_input if choice_input else "0"
         except (EOFError, KeyboardInterrupt):
-            print()
+            console.print()
             console.print("[yellow]Skipped command execution[/yellow]")
             return
 
@@ -593,7 +832,7 @@ class InteractiveCLI:
             # Check if it's 'm' for modify
             if choice.lower() == 'm':
                 console.print("[yellow]Modify command:[/yellow]")
-                modified_cmd = Prompt.ask("Enter command")
+                modified_cmd = await self.input_handler.get_choice("Enter command: ")
                 if modified_cmd:
                     success, result = await self.command_executor.execute_with_approval(
                         tool_name="execute_shell_command",
@@ -606,171 +845,109 @@ class InteractiveCLI:
             else:
                 console.print("[red]Invalid input. Enter a number, 'm' to modify, or 0 to skip[/red]")
 
+    async def _run_tool_call(self, tool_call: Dict[str, Any], auto_approve: bool):
+        """Run one tool call through the executor's approval flow."""
+        return await self.command_executor.execute_with_approval(
+            tool_name=tool_call["name"],
+            arguments=tool_call["arguments"],
+            auto_approve=auto_approve
+        )
+
     async def _handle_tool_calls(self, tool_calls: list):
         """Handle tool call execution (from JSON blocks)."""
-        for tool_call in tool_calls:
-            tool_name = tool_call["name"]
-            arguments = tool_call["arguments"]
-            tool_id = tool_call["id"]
-
-            # Execute with approval
-            success, result = await self.command_executor.execute_with_approval(
-                tool_name=tool_name,
-                arguments=arguments,
-                auto_approve=self.auto_approve
-            )
+        # Identical calls in one reply (same tool, same arguments) run once;
+        # the repeats are answered with a pointer to the first call
+        keys = [_tool_call_key(tool_call) for tool_call in tool_calls]
+        unique: Dict[str, Dict[str, Any]] = {}
+        for key, tool_call in zip(keys, tool_calls):
+            unique.setdefault(key, tool_call)
+
+        if self.auto_approve:
+            # No prompts to serialize on, so runs of consecutive reads overlap;
+            # writes and shell commands run one by one in the emitted order
+            outcomes = []
+            for is_read, group in groupby(
+                unique.values(), key=lambda tool_call: tool_call["name"] == "read_file"
+            ):
+                if is_read:
+                    outcomes.extend(await asyncio.gather(
+                        *(self._run_tool_call(tool_call, auto_approve=True) for tool_call in group),
+                        return_exceptions=True
+                    ))
+                else:
+                    for tool_call in group:
+                        try:
+                            outcomes.append(await self._run_tool_call(tool_call, auto_approve=True))
+                        except Exception as e:
+                            outcomes.append(e)
+        else:
+            # Approval prompts are answered one at a time
+            outcomes = []
+            for tool_call in unique.values():
+                outcomes.append(await self._run_tool_call(tool_call, auto_approve=False))
+
+        outcome_by_key = dict(zip(unique, outcomes))
+
+        any_success = False
+        for key, tool_call in zip(keys, tool_calls):
+            first_call = unique[key]
+            if first_call is not tool_call:
+                console.print(f"[dim]Skipped duplicate of {first_call['id']}[/dim]")
+                self.llm_client.add_tool_result(
+                    tool_call["id"], tool_call["name"], f"Duplicate of {first_call['id']}, not run again"
+                )
+                continue
+
+            outcome = outcome_by_key[key]
+            if isinstance(outcome, Exception):
+                logger.error(f"Tool {tool_call['name']} failed: {outcome}", exc_info=outcome)
+                success, result = False, f"Error: {outcome}"
+            else:
+                success, result = outcome
+            any_success = any_success or success
 
             # Add tool result to conversation
             result_text = result if result else ("Success" if success else "Failed")
-            self.llm_client.add_tool_result(tool_id, tool_name, result_text)
+            self.llm_client.add_tool_result(tool_call["id"], tool_call["name"], result_text)
 
-            # Get follow-up response from LLM if successful
-            if success:
-                console.print("\n[bold blue]Agent[/bold blue]: ", end="")
+        # One follow-up response from the LLM covers all tool results
+        if any_success:
+            console.print("\n[bold blue]Agent[/bold blue]: ", end="")
 
-                response_text = ""
-                async for chunk in self.llm_client.chat_with_tools():
-                    if chunk["type"] == "text":
-                        console.print(chunk["content"], end="")
-                        response_text += chunk["content"]
+            response_parts = []
+            async for chunk in self.llm_client.chat_with_tools():
+                if chunk["type"] == "text":
+                    console.print(chunk["content"], end="")
+                    response_parts.append(chunk["content"])
 
-                console.print()
-                self.llm_client.add_assistant_message(response_text)
+            console.print()
+            self.llm_client.add_assistant_message("".join(response_parts))
 
     def _show_help(self):
         """Show help message."""
-        help_text = """
-# FastAPI Agent CLI Help
-
-## Special Commands
-
-All special commands start with `!`:
-
-- `!quit`, `!exit`, `!q` - Exit the CLI
-- `!clear` - Clear conversation history
-- `!status` - Show current configuration
-- `!mode quick|full` - Switch between quick/full response modes
-- `!expert linux|python|devops|database|general` - Switch expert mode
-- `!auto-approve on|off` - Toggle automatic command approval
-- `!multiline` - Enter dedicated multi-line input mode
-- `!help` - Show this help
-
-## Direct Shell Commands
-
-Execute shell commands directly with `!` prefix:
-
-- `!ls` - List files
-- `!pwd` - Print working directory
-- `!cat file.txt` - Read file
-- `!git status` - Git commands
-- Any shell command: `!<command>`
-
-## Input Features
-
-### Multi-line Input
-
-**Dedicated Mode (Recommended):**
-Type `!multiline` to enter a clean multi-line editor:
-```
-You > !multiline
-📝 Multi-line input mode
-Type or paste your text. Press Ctrl+D (Unix) or Ctrl+Z (Windows) on a new line to finish.
-... def hello():
-...     print("world")
-... [Ctrl+D]
-✓ Captured 2 lines (35 characters)
-```
-
-**Quick Mode:**
-Use triple quotes or backticks:
-```
-You > '''
-def hello():
-    print("world")
-'''
-```
-
-### File Ingestion
-Use @ to include file contents:
-```
-You > Review this code @main.py
-You > Compare @file1.py and @file2.py
-```
-
-Supports:
-- Relative paths: `@file.txt`, `@cli/file.py`
-- Absolute paths: `@/home/user/file.txt`
-- Home expansion: `@~/file.txt`
-
-## Command Suggestions
-
-**Available ONLY in Linux Expert mode** (`!expert linux`)
-
-When the agent suggests shell commands, you'll see a numbered menu:
-
-```
-1. ls *.py
-   → List Python files
-
-2. find . -name "*.py"
-   → Find Python files recursively
-
-0. Do nothing
-   → Skip execution
-
-Select command [0-2, or 'm' to modify]:
-```
-
-Options:
-- Enter a number (1, 2, etc.) to execute that command
-- Enter `0` to skip
-- Enter `m` to modify the command before executing
-
-## Expert Modes
-
-Each expert mode has specialized knowledge:
-
-- **Linux** 🐧 - Shell commands, system administration
-- **Python** 🐍 - Python coding, debugging
-- **DevOps** 🚀 - Docker, K8s, CI/CD
-- **Database** 🗄️ - SQL, query optimization
-- **General** 💬 - Mixed capabilities
-
-## Response Modes
-
-- **Quick** ⚡ - Concise, fast answers
-- **Full** 📖 - Detailed explanations
-
-## Keyboard Shortcuts
-
-- `Ctrl+C` during response - Interrupt LLM response
-- `Ctrl+C` at prompt - Show reminder to use !quit
-- `Ctrl+D` - Exit (alternative to !quit)
-
-## Tips
-
-1. **Start with expert mode** - Choose the right expert for your task
-2. **Use quick mode** for simple questions
-3. **Use full mode** when you need explanations
-4. **Interrupt bad responses** with Ctrl+C
-5. **Review commands** before executing (unless auto-approve is on)
-"""
-        console.print(Markdown(help_text))
+        console.print(_help_markdown())
 
 
 async def main():
     """Main entry point."""
-    import argparse
+    base_url = model = None
+
+    # Plain ./run_cli.sh passes no flags, so argparse is only loaded when needed
+    if len(sys.argv) > 1:
+        import argparse
 
-    parser = argparse.ArgumentParser(description="FastAPI Agent Interactive CLI")
-    parser.add_argument("--url", help="LLM base URL (optional)")
-    parser.add_argument("--model", help="Model name (optional)")
+        parser = argparse.ArgumentParser(description="FastAPI Agent Interactive CLI")
+        parser.add_argument("--url", help="LLM base URL (optional)")
+        parser.add_argument("--model", help="Model name (optional)")
 
-    args = parser.parse_args()
+        args = parser.parse_args()
+        base_url, model = args.url, args.model
 
-    cli = InteractiveCLI(base_url=args.url, model=args.model)
+    cli = InteractiveCLI(base_url=base_url, model=model)
     await cli.run()
 
 
 if __name__ == "__main__":
+    # Select the event loop before asyncio.run creates one (see AGENT_LOOP)
+    install_event_loop_policy()
     asyncio.run(main())
@@ -1,11 +1,13 @@
 """LLM client wrapper with tool calling support."""
 
 import json
+import re
 import asyncio
-from typing import AsyncGenerator, Dict, Any, List, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import AsyncGenerator, Dict, Any, List, Mapping, Optional, Sequence, Tuple
 
 from src.core.llm_client import LLMClient
-from src.core.config import config
 from src.core.logger import get_logger
 from src.cli.expert_modes import (
     ExpertMode,
@@ -16,6 +18,67 @@ from src.cli.expert_modes import (
 
 logger = get_logger(__name__)
 
+# Characters of the system prompt shown when switching expert mode
+PROMPT_PREVIEW_CHARS = 150
+
+# Prefill budget for the non-system history, estimated at ~4 characters/token
+MAX_HISTORY_TOKENS = 4096
+CHARS_PER_TOKEN = 4
+
+# Fenced ```json blocks that may carry a tool call. Only spaces/tabs may
+# follow the tag, so a match found in a partial reply never changes as more
+# text arrives (blank lines before the JSON stay in the block body)
+_TOOL_JSON_RE = re.compile(r'```json[^\S\n]*\n(.*?)\n```', re.DOTALL)
+_JSON_DECODE = json.JSONDecoder().decode
+
+
+def _parse_tool_call(block: str) -> Optional[Dict[str, Any]]:
+    """Decode a fenced JSON block, returning it if it looks like a tool call."""
+    try:
+        data = _JSON_DECODE(block)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(data, dict) and "tool" in data and "arguments" in data:
+        return data
+    return None
+
+
+def _split_tool_blocks(pending: str) -> Tuple[List[str], str]:
+    """
+    Take the complete ```json blocks out of partially streamed text.
+
+    Matches are the same as running _TOOL_JSON_RE over the whole reply.
+
+    Args:
+        pending: Unscanned tail of the reply so far
+
+    Returns:
+        Tuple of (block bodies, tail to keep for the next chunk)
+    """
+    blocks = []
+    while (match := _TOOL_JSON_RE.search(pending)) is not None:
+        blocks.append(match.group(1))
+        pending = pending[match.end():]
+
+    start = pending.find("```json")
+    if start >= 0:
+        return blocks, pending[start:]
+    # An opening fence may be split across chunks
+    tail = pending[-6:]
+    tick = tail.find("`")
+    return blocks, tail[tick:] if tick >= 0 else ""
+
+
+def _estimate_tokens(message: Dict[str, Any]) -> int:
+    """Cheap token estimate for a history message."""
+    return len(message.get("content") or "") // CHARS_PER_TOKEN
+
+
+@lru_cache(maxsize=16)
+def _prompt_preview(system_prompt: str) -> str:
+    """One-line preview of a system prompt (prompts are shared, so cache by value)."""
+    return system_prompt[:PROMPT_PREVIEW_CHARS].replace('\n', ' ')
+
 
 class LLMClientWithTools:
     """Extended LLM client with tool calling capabilities."""
@@ -26,7 +89,8 @@ class LLMClientWithTools:
         model: str,
         expert_mode: ExpertMode,
         response_mode: ResponseMode,
-        tools: List[Dict[str, Any]]
+        tools: Sequence[Dict[str, Any]],
+        max_history_tokens: int = MAX_HISTORY_TOKENS
     ):
         """
         Initialize the LLM client with tools.
@@ -36,24 +100,31 @@ class LLMClientWithTools:
             model: Model name
             expert_mode: Expert specialization mode
             response_mode: Response detail mode (quick/full)
-            tools: List of tool definitions
+            tools: Tool definitions
+            max_history_tokens: Estimated token budget for non-system messages
         """
         self.base_client = LLMClient(base_url=base_url, model=model, use_instruct=True)
         self.expert_mode = expert_mode
         self.response_mode = response_mode
         self.tools = tools
         self.conversation_history = []
-        self._cancel_flag = False
-
-        # Get configuration
-        self.config = get_expert_config(expert_mode, response_mode)
-
-        # Generate system prompt
-        self.system_prompt = get_system_prompt(expert_mode, response_mode)
+        self.max_history_tokens = max_history_tokens
+        self._history_tokens = 0
+        self._cancel_event: Optional[asyncio.Event] = None
+        self._apply_modes()
 
         logger.info(f"LLMClientWithTools initialized: expert_mode={expert_mode.value}, response_mode={response_mode.value}")
         logger.debug(f"System prompt: {self.system_prompt[:200]}...")
 
+    def _apply_modes(self):
+        """Load the config, system prompt and generation defaults for the current modes."""
+        self.config = get_expert_config(self.expert_mode, self.response_mode)
+        self.system_prompt = get_system_prompt(self.expert_mode, self.response_mode)
+        self.system_prompt_preview = _prompt_preview(self.system_prompt)
+        self._default_temperature = self.config["temperature"]
+        self._default_max_tokens = self.config["max_tokens"]
+        self._config_cache: Optional[Mapping[str, Any]] = None
+
     async def close(self):
         """Close the client."""
         logger.info("Closing LLMClientWithTools")
@@ -66,17 +137,17 @@ class LLMClientWithTools:
         Args:
             expert_mode: New expert mode
         """
+        if expert_mode is self.expert_mode:
+            logger.debug(f"Expert mode already {expert_mode.value}")
+            return
+
         logger.info(f"Changing expert mode from {self.expert_mode.value} to {expert_mode.value}")
         self.expert_mode = expert_mode
-        self.config = get_expert_config(expert_mode, self.response_mode)
-        self.system_prompt = get_system_prompt(expert_mode, self.response_mode)
+        self._apply_modes()
 
         logger.debug(f"New system prompt: {self.system_prompt[:200]}...")
 
-        # Update system message in history if it exists
-        if self.conversation_history and self.conversation_history[0]["role"] == "system":
-            self.conversation_history[0]["content"] = self.system_prompt
-            logger.debug("Updated system message in conversation history")
+        self._sync_system_message()
 
     def set_response_mode(self, response_mode: ResponseMode):
         """
@@ -85,24 +156,32 @@ class LLMClientWithTools:
         Args:
             response_mode: New response mode (quick/full)
         """
+        if response_mode is self.response_mode:
+            logger.debug(f"Response mode already {response_mode.value}")
+            return
+
         logger.info(f"Changing response mode from {self.response_mode.value} to {response_mode.value}")
         self.response_mode = response_mode
-        self.config = get_expert_config(self.expert_mode, response_mode)
-        self.system_prompt = get_system_prompt(self.expert_mode, response_mode)
+        self._apply_modes()
 
-        logger.debug(f"New config: temperature={self.config['temperature']}, max_tokens={self.config['max_tokens']}")
+        logger.debug(f"New config: temperature={self._default_temperature}, max_tokens={self._default_max_tokens}")
 
-        # Update system message in history if it exists
-        if self.conversation_history and self.conversation_history[0]["role"] == "system":
-            self.conversation_history[0]["content"] = self.system_prompt
-            logger.debug("Updated system message in conversation history")
+        self._sync_system_message()
 
     def cancel_response(self):
         """Cancel ongoing response by stopping the underlying stream."""
-        self._cancel_flag = True
+        if self._cancel_event is not None:
+            self._cancel_event.set()
         # Also cancel the stream in the base client
         self.base_client.cancel_stream()
 
+    def _sync_system_message(self):
+        """Update the system message in history, leaving it untouched if unchanged."""
+        history = self.conversation_history
+        if history and history[0]["role"] == "system" and history[0]["content"] != self.system_prompt:
+            history[0]["content"] = self.system_prompt
+            logger.debug("Updated system message in conversation history")
+
     def add_system_message(self):
         """Add system message to conversation if not present."""
         if not self.conversation_history or self.conversation_history[0]["role"] != "system":
@@ -111,13 +190,63 @@ class LLMClientWithTools:
                 "content": self.system_prompt
             })
 
+    def _append_message(self, message: Dict[str, Any]):
+        """Append a non-system message and count it against the budget."""
+        self.conversation_history.append(message)
+        self._history_tokens += _estimate_tokens(message)
+
+    def _trim_history(self):
+        """
+        Drop the oldest whole turns while the history is over budget.
+
+        The system message and the latest user turn are always kept, so the
+        static prompt prefix stays identical for the server's prompt cache.
+        """
+        if self._history_tokens <= self.max_history_tokens:
+            return
+
+        history = self.conversation_history
+        start = 1 if history and history[0]["role"] == "system" else 0
+        last_user = len(history) - 1
+        while last_user > start and history[last_user]["role"] != "user":
+            last_user -= 1
+
+        end = start
+        tokens = self._history_tokens
+        while tokens > self.max_history_tokens and end < last_user:
+            # A turn runs from one user message up to the next
+            tokens -= _estimate_tokens(history[end])
+            end += 1
+            while end < last_user and history[end]["role"] != "user":
+                tokens -= _estimate_tokens(history[end])
+                end += 1
+
+        if end > start:
+            logger.info(f"Trimming {end - start} old messages from conversation history")
+            del history[start:end]
+            self._history_tokens = tokens
+
     def add_user_message(self, content: str):
-        """Add a user message to the conversation."""
+        """Add a user message, trimming old turns if over the history budget."""
         logger.debug(f"Adding user message: {content[:200]}...")
-        self.conversation_history.append({
+        self._append_message({
             "role": "user",
             "content": content
         })
+        self._trim_history()
+
+    def discard_last_user_message(self) -> bool:
+        """
+        Remove the latest message if it is an unanswered user message.
+
+        Returns:
+            True if a message was removed
+        """
+        history = self.conversation_history
+        if not history or history[-1]["role"] != "user":
+            return False
+        self._history_tokens -= _estimate_tokens(history.pop())
+        return True
 
     def add_assistant_message(self, content: str, tool_calls: Optional[List[Dict[str, Any]]] = None):
         """Add an assistant message to the conversation."""
@@ -132,11 +261,11 @@ class LLMClientWithTools:
         if tool_calls:
             message["tool_calls"] = tool_calls
 
-        self.conversation_history.append(message)
+        self._append_message(message)
 
     def add_tool_result(self, tool_call_id: str, tool_name: str, result: str):
         """Add a tool execution result to the conversation."""
-        self.conversation_history.append({
+        self._append_message({
             "role": "tool",
             "tool_call_id": tool_call_id,
             "name": tool_name,
@@ -158,15 +287,17 @@ class LLMClientWithTools:
             - {"type": "cancelled"} if cancelled
         """
         self.add_system_message()
-        self._cancel_flag = False
+        cancelled = self._cancel_event = asyncio.Event()
 
         # Use config values if not overridden
         if temperature is None:
-            temperature = self.config["temperature"]
+            temperature = self._default_temperature
         if max_tokens is None:
-            max_tokens = self.config["max_tokens"]
+            max_tokens = self._default_max_tokens
 
-        response_text = ""
+        # Tool calls are yielded as soon as their JSON block closes
+        pending = ""
+        call_count = 0
         try:
             async for chunk in self.base_client.chat_stream(
                 messages=self.conversation_history,
@@ -174,58 +305,33 @@ class LLMClientWithTools:
                 max_tokens=max_tokens
             ):
                 # Check for cancellation
-                if self._cancel_flag:
+                if cancelled.is_set():
                     yield {"type": "cancelled"}
                     return
 
-                response_text += chunk
                 yield {"type": "text", "content": chunk}
 
+                if not pending and "`" not in chunk:
+                    continue
+                blocks, pending = _split_tool_blocks(pending + chunk)
+                for block in blocks:
+                    data = _parse_tool_call(block)
+                    if data is not None:
+                        yield {
+                            "type": "tool_call",
+                            "name": data["tool"],
+                            "arguments": data["arguments"],
+                            "id": f"call_{call_count}"
+                        }
+                        call_count += 1
+
         except asyncio.CancelledError:
             yield {"type": "cancelled"}
             return
 
-        # Try to parse tool calls from the response
-        tool_calls = self._extract_tool_calls(response_text)
-
-        if tool_calls:
-            for tool_call in tool_calls:
-                yield {
-                    "type": "tool_call",
-                    "name": tool_call["name"],
-                    "arguments": tool_call["arguments"],
-                    "id": tool_call.get("id", "call_0")
-                }
-
-    def _extract_tool_calls(self, text: str) -> List[Dict[str, Any]]:
-        """
-        Extract tool calls from LLM response.
-
-        This is a simple pattern-based extraction.
-        In production, you'd use the LLM's native function calling API.
-        """
-        tool_calls = []
-
-        # Look for JSON blocks that might be tool calls
-        # Pattern: ```json\n{...}\n```
-        import re
-        json_blocks = re.findall(r'```json\s*\n(.*?)\n```', text, re.DOTALL)
-
-        for block in json_blocks:
-            try:
-                data = json.loads(block)
-
-                # Check if it looks like a tool call
-                if isinstance(data, dict) and "tool" in data and "arguments" in data:
-                    tool_calls.append({
-                        "name": data["tool"],
-                        "arguments": data["arguments"],
-                        "id": f"call_{len(tool_calls)}"
-                    })
-            except json.JSONDecodeError:
-                continue
-
-        return tool_calls
+        # The base stream ends quietly when cancelled mid-read
+        if cancelled.is_set():
+            yield {"type": "cancelled"}
 
     async def chat_simple(
         self,
@@ -237,9 +343,9 @@ class LLMClientWithTools:
 
         # Use config values if not overridden
         if temperature is None:
-            temperature = self.config["temperature"]
+            temperature = self._default_temperature
         if max_tokens is None:
-            max_tokens = self.config["max_tokens"]
+            max_tokens = self._default_max_tokens
 
         response = await self.base_client.chat(
             messages=self.conversation_history,
@@ -253,18 +359,25 @@ class LLMClientWithTools:
         """Clear conversation history."""
         logger.info(f"Clearing conversation history (had {len(self.conversation_history)} messages)")
         self.conversation_history = []
+        self._history_tokens = 0
 
     def get_history_length(self) -> int:
         """Get the number of messages in history."""
         return len(self.conversation_history)
 
-    def get_current_config(self) -> Dict[str, Any]:
-        """Get current configuration info."""
-        return {
-            "expert_mode": self.expert_mode.value,
-            "response_mode": self.response_mode.value,
-            "temperature": self.config["temperature"],
-            "max_tokens": self.config["max_tokens"],
-            "name": self.config["name"],
-            "icon": self.config["icon"]
-        }
+    def get_current_config(self) -> Mapping[str, Any]:
+        """
+        Get current configuration info.
+
+        The result is cached until the expert or response mode changes.
+        """
+        if self._config_cache is None:
+            self._config_cache = MappingProxyType({
+                "expert_mode": self.expert_mode.value,
+                "response_mode": self.response_mode.value,
+                "temperature": self._default_temperature,
+                "max_tokens": self._default_max_tokens,
+                "name": self.config["name"],
+                "icon": self.config["icon"]
+            })
+        return self._config_cache
@@ -1,13 +1,19 @@
 """Configuration for the agent."""
 
 import yaml
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+# libyaml's C parser when available, the pure-Python one otherwise
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 
 class ServerConfig(BaseModel):
     """Configuration for a single server."""
+    model_config = ConfigDict(frozen=True)
+
     name: str
     url: str
     models: List[str]
@@ -15,18 +21,24 @@ class ServerConfig(BaseModel):
 
 class GenerationConfig(BaseModel):
     """Generation parameters."""
+    model_config = ConfigDict(frozen=True)
+
     temperature: float = 0.7
     max_tokens: int = 2000
 
 
 class ApiConfig(BaseModel):
     """API server configuration."""
+    model_config = ConfigDict(frozen=True)
+
     host: str = "0.0.0.0"
     port: int = 8000
 
 
 class Config(BaseModel):
     """Main configuration."""
+    model_config = ConfigDict(frozen=True)
+
     servers: List[ServerConfig]
     generation: GenerationConfig
     api: ApiConfig
@@ -50,11 +62,20 @@ def load_config(config_path: str = "config.yaml") -> Config:
             api=ApiConfig()
         )
 
-    with open(path, "r") as f:
-        data = yaml.safe_load(f)
+    # Bytes let the C loader skip a Python-level text decode
+    data = yaml.load(path.read_bytes(), Loader=_YAML_LOADER)
 
     return Config(**data)
 
 
-# Load global config
-config = load_config()
+@lru_cache(maxsize=None)
+def get_config() -> Config:
+    """Load config.yaml on first use and return the same Config afterwards."""
+    return load_config()
+
+
+def __getattr__(name: str) -> Any:
+    """Resolve the legacy module-level ``config`` lazily (PEP 562)."""
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
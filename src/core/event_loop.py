@@ -0,0 +1,58 @@
+"""Event loop policy selection for the agent."""
+
+import asyncio
+import os
+from typing import Optional
+
+from src.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Loop implementations to try, in order of preference, when AGENT_LOOP is unset
+LOOP_BACKENDS = ("uvloop", "asyncio")
+
+
+def _load_policy(backend: str) -> Optional[asyncio.AbstractEventLoopPolicy]:
+    """Return an event loop policy for the backend, or None if unavailable."""
+    try:
+        if backend == "uvloop":
+            import uvloop
+            return uvloop.EventLoopPolicy()
+    except ImportError:
+        logger.debug(f"Event loop backend not installed: {backend}")
+    return None
+
+
+def install_event_loop_policy(backend: Optional[str] = None) -> str:
+    """
+    Install the fastest available event loop policy.
+
+    The backend is taken from the argument, then from the AGENT_LOOP
+    environment variable (auto|uvloop|asyncio). When neither is set, or for
+    auto, uvloop is used if installed, otherwise stock asyncio.
+
+    Args:
+        backend: Explicit backend name (overrides AGENT_LOOP)
+
+    Returns:
+        Name of the backend that was installed
+    """
+    backend = (backend or os.environ.get("AGENT_LOOP", "")).strip().lower()
+    if backend == "auto":
+        # Same meaning as uvicorn's --loop auto (see run_api.sh)
+        backend = ""
+    candidates = (backend,) if backend else LOOP_BACKENDS
+
+    for candidate in candidates:
+        if candidate == "asyncio":
+            break
+        policy = _load_policy(candidate)
+        if policy is not None:
+            asyncio.set_event_loop_policy(policy)
+            logger.info(f"Using {candidate} event loop policy")
+            return candidate
+
+    if backend and backend != "asyncio":
+        logger.warning(f"Event loop backend '{backend}' unavailable, using asyncio")
+    logger.info("Using default asyncio event loop policy")
+    return "asyncio"
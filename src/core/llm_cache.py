@@ -0,0 +1,82 @@
+"""In-memory cache for deterministic LLM responses."""
+
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from src.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Defaults for a client's response cache
+CACHE_MAX_ENTRIES = 256
+CACHE_TTL = 3600.0
+
+
+class ResponseCache:
+    """Bounded LRU cache of response texts with a time-to-live."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of responses kept
+            ttl: Seconds a response stays valid
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (expiry time, response), oldest use first
+        self._entries: Dict[str, Tuple[float, str]] = {}
+
+    @staticmethod
+    def make_key(url: str, payload: Dict[str, Any]) -> str:
+        """
+        Build a cache key for a request.
+
+        Args:
+            url: Request URL
+            payload: JSON request body
+
+        Returns:
+            SHA-256 hex digest of the canonical request
+        """
+        canonical = json.dumps([url, payload], sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached response for a key, or None if missing or expired.
+
+        Args:
+            key: Key from make_key()
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            return None
+        # Re-insert to mark as most recently used
+        self._entries[key] = entry
+        return entry[1]
+
+    def set(self, key: str, response: str):
+        """
+        Store a response, evicting the least recently used one when full.
+
+        Args:
+            key: Key from make_key()
+            response: Response text
+        """
+        self._entries.pop(key, None)
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+
+    def clear(self):
+        """Drop all cached responses."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
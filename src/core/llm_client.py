@@ -1,45 +1,342 @@
 """LLM client for communicating with Ollama or LM Studio."""
 
+import asyncio
 import httpx
 import json
-from typing import AsyncGenerator, Optional
-from src.core.config import config
+import re
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Optional
+
+try:
+    import h2  # noqa: F401 - optional, lets httpx negotiate HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    # orjson parses bytes directly; its JSONDecodeError subclasses json's
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+from src.core.config import get_config
+from src.core.llm_cache import ResponseCache
 from src.core.logger import get_logger, log_llm_request, log_llm_response
 
 logger = get_logger(__name__)
 
+# Keep-alive pool shared by all clients in the process, so consecutive calls to
+# the same LLM server reuse connections instead of reconnecting every time
+REQUEST_TIMEOUT = 300.0
+CONNECT_TIMEOUT = 5.0
+CONNECTION_LIMITS = httpx.Limits(
+    max_keepalive_connections=64,
+    max_connections=128,
+    keepalive_expiry=30.0,
+)
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Shared fallback for SSE frames without a delta (never mutated)
+_EMPTY_DELTA: Dict[str, Any] = {}
+
+# Ollama token lines without escapes: {"model":...,"response":"Hi","done":false}
+_OLLAMA_TOKEN_RE = re.compile(rb'"response":"([^"\\]*)"')
+
+# OpenAI delta frames carrying only text: ..."choices":[{...,"delta":{"content":"Hi"},...
+_OPENAI_DELTA_RE = re.compile(rb'"delta":\{"content":"([^"\\]*)"\}')
+
+_shared_client: Optional[httpx.AsyncClient] = None
+_shared_client_users = 0
+
+
+def _acquire_shared_client() -> httpx.AsyncClient:
+    """Return the process-wide HTTP client, creating it on first use."""
+    global _shared_client, _shared_client_users
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=CONNECTION_LIMITS,
+        )
+        _shared_client_users = 0
+    _shared_client_users += 1
+    return _shared_client
+
+
+def _release_shared_client(client: httpx.AsyncClient) -> bool:
+    """
+    Drop one user of the shared HTTP client.
+
+    Args:
+        client: The client the caller was using
+
+    Returns:
+        True if the caller should close the client (it is the last user,
+        or the client was never the shared one)
+    """
+    global _shared_client, _shared_client_users
+    _shared_client_users = max(_shared_client_users - 1, 0)
+    if client is not _shared_client:
+        return True
+    if _shared_client_users > 0:
+        return False
+    _shared_client = None
+    return True
+
+
+def _request_body(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keyword arguments that send the payload as the JSON request body.
+
+    With orjson installed the body is serialized once in C; otherwise httpx
+    encodes it with the standard library.
+    """
+    if orjson is None:
+        return {"json": payload}
+    return {"content": orjson.dumps(payload), "headers": _JSON_HEADERS}
+
+
+# Instruct prompt fragments, filled with %-substitution
+_SYSTEM_HEADER = "<<SYS>>\n%s\n<</SYS>>"
+_TURN_CLOSED = "[INST] %s [/INST] %s"
+_TURN_OPEN = "[INST] %s [/INST]"
+
+
+def _build_instruct_prompt(messages: list[dict[str, str]]) -> str:
+    """
+    Format a conversation as an instruct prompt for /api/generate.
+
+    Format: <<SYS>>system<</SYS>> [INST] user1 [/INST] assistant1 [INST] user2 [/INST]
+    The prompt depends only on the messages, so a growing history keeps a
+    byte-identical prefix that the server's prompt cache can reuse.
+
+    Args:
+        messages: Chat messages; the first system message becomes the header
+
+    Returns:
+        The formatted prompt
+    """
+    system_prompt = None
+    conversation_parts = []
+    roles = [msg["role"] for msg in messages]
+    contents = [msg["content"] for msg in messages]
+    last = len(messages) - 1
+
+    for i, role in enumerate(roles):
+        if role == "user":
+            # Check if there's an assistant response after this
+            if i < last and roles[i + 1] == "assistant":
+                # User message + assistant response (closed conversation turn)
+                conversation_parts.append(_TURN_CLOSED % (contents[i], contents[i + 1]))
+            else:
+                # User message without response yet (open conversation turn)
+                conversation_parts.append(_TURN_OPEN % contents[i])
+        elif role == "system" and system_prompt is None:
+            system_prompt = _SYSTEM_HEADER % contents[i]
+
+    prompt_parts = []
+    if system_prompt:
+        prompt_parts.append(system_prompt)
+    # Join conversation parts with space (not double newline)
+    if conversation_parts:
+        prompt_parts.append(" ".join(conversation_parts))
+
+    return "\n\n".join(prompt_parts)
+
+
+def _ollama_token(line: bytes) -> Optional[str]:
+    """
+    Pull the token out of a plain Ollama stream line without parsing it.
+
+    Lines with escapes, or that are not an unfinished token line, return None
+    so the caller falls back to a full JSON parse.
+    """
+    if b"\\" in line or b'"done":false' not in line:
+        return None
+    match = _OLLAMA_TOKEN_RE.search(line)
+    if match is None:
+        return None
+    try:
+        return match.group(1).decode()
+    except UnicodeDecodeError:
+        return None
+
+
+def _openai_delta(data: bytes) -> Optional[str]:
+    """
+    Pull the delta text out of a plain OpenAI SSE payload without parsing it.
+
+    Payloads with escapes, or whose delta holds anything besides content,
+    return None so the caller falls back to a full JSON parse.
+    """
+    if b"\\" in data:
+        return None
+    # Without escapes, the first "delta" key belongs to choices[0]
+    start = data.find(b'"delta":')
+    match = _OPENAI_DELTA_RE.match(data, start) if start >= 0 else None
+    if match is None:
+        return None
+    try:
+        return match.group(1).decode()
+    except UnicodeDecodeError:
+        return None
+
+
+async def _until_set(lines: AsyncIterator[bytes], cancelled: asyncio.Event) -> AsyncGenerator[bytes, None]:
+    """
+    Yield lines until the stream ends or the event is set.
+
+    The event is checked between lines; a read that is still waiting on the
+    server is interrupted by LLMClient.cancel_stream closing the response.
+
+    Args:
+        lines: Response body lines
+        cancelled: Event that stops the stream when set
+    """
+    async for line in lines:
+        if cancelled.is_set():
+            return
+        yield line
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncGenerator[bytes, None]:
+    """
+    Split a byte stream into newline-delimited lines without decoding it.
+
+    Args:
+        chunks: Raw response body chunks
+
+    Yields:
+        Each line as bytes, without the trailing newline
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        # Only the new chunk can contain a newline the buffer has not seen
+        end = chunk.find(b"\n")
+        if end < 0:
+            buffer += chunk
+            continue
+        end += len(buffer)
+        buffer += chunk
+        start = 0
+        # Slice through a view so each line is copied once, not twice
+        with memoryview(buffer) as view:
+            while end >= 0:
+                yield bytes(view[start:end])
+                start = end + 1
+                end = buffer.find(b"\n", start)
+        # Drop the consumed lines in one move, keeping the partial tail
+        del buffer[:start]
+    if buffer:
+        yield bytes(buffer)
+
+
+async def _iter_sse_data(lines: AsyncIterator[bytes]) -> AsyncGenerator[bytes, None]:
+    """
+    Yield the data payload of each server-sent event.
+
+    Comments, event names and ids are skipped; an event with several data
+    lines is joined with newlines, as in the SSE spec.
+
+    Args:
+        lines: Response body lines
+
+    Yields:
+        Each event's data as bytes
+    """
+    data = []
+    async for line in lines:
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        if not line:
+            # A blank line ends the event
+            if data:
+                yield data[0] if len(data) == 1 else b"\n".join(data)
+                data = []
+        elif line.startswith(b"data:"):
+            value = line[5:]
+            data.append(value[1:] if value.startswith(b" ") else value)
+    if data:
+        yield data[0] if len(data) == 1 else b"\n".join(data)
+
 
 class LLMClient:
     """Client for interacting with Ollama/LM Studio API."""
 
-    def __init__(self, base_url: str, model: str, use_instruct: bool = True):
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        use_instruct: bool = True,
+        response_cache: Optional[ResponseCache] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
         """Initialize the LLM client.
 
         Args:
             base_url: The base URL of the LLM server
             model: The model name to use
             use_instruct: If True, use Ollama's /api/generate with instruct format
+            response_cache: Cache for temperature-0 chat() replies (a private
+                in-memory cache by default)
+            client: HTTP client to use instead of the shared pooled one; it is
+                closed by close()
         """
         self.base_url = base_url
         self.model = model
         self.use_instruct = use_instruct
-        self.client = httpx.AsyncClient(timeout=300.0)
+        self._uses_shared_client = client is None
+        self.client = _acquire_shared_client() if client is None else client
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+        self._closed = False
         self._current_response = None
-        self._stream_cancelled = False
+        self._close_task: Optional[asyncio.Task] = None
+        # Created per stream: an Event made outside the running loop cannot
+        # be awaited on Python 3.9
+        self._cancel_event: Optional[asyncio.Event] = None
 
         logger.info(f"LLMClient initialized: base_url={base_url}, model={model}, use_instruct={use_instruct}")
 
     async def close(self):
-        """Close the HTTP client."""
+        """Release the HTTP client, closing it once no other client uses it."""
+        if self._closed:
+            return
+        self._closed = True
         logger.info("Closing LLM client")
-        await self.client.aclose()
+        if not self._uses_shared_client or _release_shared_client(self.client):
+            await self.client.aclose()
+
+    async def health_check(self, timeout: float = 5.0) -> bool:
+        """Send a cheap request to the LLM server to open a pooled connection.
+
+        Args:
+            timeout: Maximum time to wait for the server
+
+        Returns:
+            True if the server answered, False otherwise
+        """
+        try:
+            response = await self.client.head(self.base_url, timeout=timeout)
+            logger.info(f"LLM server reachable at {self.base_url} (status {response.status_code})")
+            return True
+        except Exception as e:
+            # Best effort: a bad URL (httpx.InvalidURL is not an HTTPError)
+            # must not stop the API from starting
+            logger.warning(f"LLM server not reachable at {self.base_url}: {type(e).__name__}")
+            return False
 
     def cancel_stream(self):
-        """Cancel the current streaming response."""
+        """Cancel the current streaming response, interrupting a pending read."""
         logger.info("Stream cancellation requested")
-        self._stream_cancelled = True
-        # Note: We just set the flag. The stream will check it on next iteration
-        # and break out of the loop, which will trigger the context manager cleanup
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+
+        # Closing the response makes a read blocked on the server fail at
+        # once (the error is ignored because the stream was cancelled)
+        response = self._current_response
+        if response is not None and not response.is_closed:
+            self._close_task = asyncio.get_running_loop().create_task(response.aclose())
 
     async def chat(
         self,
@@ -48,49 +345,14 @@ class LLMClient:
         max_tokens: Optional[int] = None,
     ) -> str:
         """Send a chat request to the LLM."""
-        logger.debug(f"chat() called with {len(messages)} messages")
+        logger.debug("chat() called with %d messages", len(messages))
         log_llm_request(logger, self.model, messages, temperature=temperature, max_tokens=max_tokens)
 
         if self.use_instruct:
             # Use Ollama's native /api/generate endpoint
             url = f"{self.base_url}/api/generate"
 
-            # Convert messages to instruct format with system prompt
-            # Format: <<SYS>>system<</SYS>> [INST] user1 [/INST] assistant1 [INST] user2 [/INST]
-            prompt_parts = []
-            system_prompt = None
-
-            # Extract system prompt first
-            for msg in messages:
-                if msg["role"] == "system":
-                    system_prompt = f"<<SYS>>\n{msg['content']}\n<</SYS>>"
-                    break
-
-            # Build conversation
-            conversation_parts = []
-            for i, msg in enumerate(messages):
-                if msg["role"] == "user":
-                    # Check if there's an assistant response after this
-                    next_msg = messages[i + 1] if i + 1 < len(messages) else None
-                    if next_msg and next_msg["role"] == "assistant":
-                        # User message + assistant response (closed conversation turn)
-                        conversation_parts.append(f"[INST] {msg['content']} [/INST] {next_msg['content']}")
-                    else:
-                        # User message without response yet (open conversation turn)
-                        conversation_parts.append(f"[INST] {msg['content']} [/INST]")
-                elif msg["role"] == "assistant":
-                    # Skip - already handled with user message
-                    continue
-
-            # Combine system prompt and conversation
-            if system_prompt:
-                prompt_parts.append(system_prompt)
-
-            # Join conversation parts with space (not double newline)
-            if conversation_parts:
-                prompt_parts.append(" ".join(conversation_parts))
-
-            prompt = "\n\n".join(prompt_parts) if prompt_parts else ""
+            prompt = _build_instruct_prompt(messages)
 
             payload = {
                 "model": self.model,
@@ -104,39 +366,49 @@ class LLMClient:
             if max_tokens is not None:
                 payload["num_predict"] = max_tokens
 
-            logger.debug(f"Using instruct mode with prompt: {prompt[:200]}...")
+            logger.debug("Using instruct mode with prompt: %.200s...", prompt)
         else:
             # Use OpenAI-compatible endpoint
             url = f"{self.base_url}/v1/chat/completions"
+            generation = get_config().generation
 
             payload = {
                 "model": self.model,
                 "messages": messages,
-                "temperature": temperature or config.generation.temperature,
-                "max_tokens": max_tokens or config.generation.max_tokens,
+                "temperature": generation.temperature if temperature is None else temperature,
+                "max_tokens": generation.max_tokens if max_tokens is None else max_tokens,
             }
 
-            logger.debug(f"Using OpenAI-compatible mode")
+            logger.debug("Using OpenAI-compatible mode")
 
-        logger.debug(f"Request URL: {url}")
-        logger.debug(f"Request payload keys: {list(payload.keys())}")
+        logger.debug("Request URL: %s", url)
+        logger.debug("Request payload keys: %s", list(payload))
+
+        # Only deterministic requests can be answered from the cache
+        cache_key = None
+        if payload.get("temperature") == 0:
+            cache_key = ResponseCache.make_key(url, payload)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Returning cached response")
+                return cached
 
         try:
             logger.info(f"Sending request to {url}")
-            response = await self.client.post(url, json=payload)
+            response = await self.client.post(url, **_request_body(payload))
             response.raise_for_status()
-            data = response.json()
+            data = _json_loads(response.content)
 
             if self.use_instruct:
                 # Ollama native response format
                 response_text = data.get("response", "")
-                log_llm_response(logger, response_text, success=True)
-                return response_text
             else:
                 # OpenAI format
                 response_text = data["choices"][0]["message"]["content"]
-                log_llm_response(logger, response_text, success=True)
-                return response_text
+            log_llm_response(logger, response_text, success=True)
+            if cache_key is not None:
+                self.response_cache.set(cache_key, response_text)
+            return response_text
         except httpx.ConnectError as e:
             error_msg = f"Error: Cannot connect to LLM server at {self.base_url}. Is the server running?"
             logger.error(f"Connection error: {e}")
@@ -172,7 +444,7 @@ class LLMClient:
         max_tokens: Optional[int] = None,
     ) -> AsyncGenerator[str, None]:
         """Send a streaming chat request to the LLM."""
-        logger.debug(f"chat_stream() called with {len(messages)} messages")
+        logger.debug("chat_stream() called with %d messages", len(messages))
         log_llm_request(logger, self.model, messages, temperature=temperature, max_tokens=max_tokens, stream=True)
 
         if self.use_instruct:
@@ -195,42 +467,7 @@ class LLMClient:
         """Stream using Ollama's /api/generate endpoint with instruct format."""
         url = f"{self.base_url}/api/generate"
 
-        # Convert messages to instruct format
-        # Format: <<SYS>>system<</SYS>> [INST] user1 [/INST] assistant1 [INST] user2 [/INST]
-        prompt_parts = []
-        system_prompt = None
-
-        # Extract system prompt first
-        for msg in messages:
-            if msg["role"] == "system":
-                system_prompt = f"<<SYS>>\n{msg['content']}\n<</SYS>>"
-                break
-
-        # Build conversation
-        conversation_parts = []
-        for i, msg in enumerate(messages):
-            if msg["role"] == "user":
-                # Check if there's an assistant response after this
-                next_msg = messages[i + 1] if i + 1 < len(messages) else None
-                if next_msg and next_msg["role"] == "assistant":
-                    # User message + assistant response (closed conversation turn)
-                    conversation_parts.append(f"[INST] {msg['content']} [/INST] {next_msg['content']}")
-                else:
-                    # User message without response yet (open conversation turn)
-                    conversation_parts.append(f"[INST] {msg['content']} [/INST]")
-            elif msg["role"] == "assistant":
-                # Skip - already handled with user message
-                continue
-
-        # Combine system prompt and conversation
-        if system_prompt:
-            prompt_parts.append(system_prompt)
-
-        # Join conversation parts with space (not double newline)
-        if conversation_parts:
-            prompt_parts.append(" ".join(conversation_parts))
-
-        prompt = "\n\n".join(prompt_parts) if prompt_parts else ""
+        prompt = _build_instruct_prompt(messages)
 
         payload = {
             "model": self.model,
@@ -244,42 +481,51 @@ class LLMClient:
         if max_tokens is not None:
             payload["max_tokens"] = max_tokens
 
-        logger.debug(f"Stream generate prompt: {prompt[:300]}...")
-        logger.debug(f"Payload: {payload}")
+        logger.debug("Stream generate prompt: %.300s...", prompt)
+        logger.debug("Payload: %s", payload)
 
-        self._stream_cancelled = False
+        cancelled = self._cancel_event = asyncio.Event()
+        lines = None
         try:
             logger.info(f"Starting stream request to {self.base_url}/api/generate")
-            async with self.client.stream("POST", url, json=payload) as response:
+            async with self.client.stream("POST", url, **_request_body(payload)) as response:
                 self._current_response = response
                 response.raise_for_status()
-                async for line in response.aiter_lines():
-                    # Check for cancellation
-                    if self._stream_cancelled:
-                        logger.info("Stream cancelled by user")
-                        break
+                lines = _until_set(_iter_lines(response.aiter_bytes()), cancelled)
+                async for line in lines:
+                    # Common case: a plain token line, no dict needed
+                    token = _ollama_token(line)
+                    if token is not None:
+                        yield token
+                        continue
 
                     if line.strip():
                         try:
-                            data = json.loads(line)
+                            data = _json_loads(line)
                             if "response" in data:
                                 chunk = data["response"]
-                                logger.debug(f"Received chunk: {chunk[:50]}...")
+                                logger.debug("Received chunk: %.50s...", chunk)
                                 yield chunk
                             if data.get("done", False):
                                 logger.info("Stream completed successfully")
                                 break
                         except json.JSONDecodeError as e:
-                            logger.warning(f"Failed to decode JSON line: {line[:100]}")
+                            logger.warning(f"Failed to decode JSON line: {line[:100].decode(errors='replace')}")
                             continue
         except httpx.HTTPError as e:
-            if not self._stream_cancelled:
+            if not cancelled.is_set():
                 error_msg = f"\nError communicating with LLM: {str(e)}"
                 logger.error(f"Stream error: {e}")
                 yield error_msg
         finally:
+            if lines is not None:
+                # Finalize the line iterators even when the loop broke early
+                await lines.aclose()
+            if cancelled.is_set():
+                logger.info("Stream cancelled by user")
             self._current_response = None
-            self._stream_cancelled = False
+            if self._cancel_event is cancelled:
+                self._cancel_event = None
             logger.debug("Stream cleanup completed")
 
     async def _stream_chat(
@@ -290,51 +536,60 @@ class LLMClient:
     ) -> AsyncGenerator[str, None]:
         """Stream using OpenAI-compatible /v1/chat/completions endpoint."""
         url = f"{self.base_url}/v1/chat/completions"
+        generation = get_config().generation
 
         payload = {
             "model": self.model,
             "messages": messages,
-            "temperature": temperature or config.generation.temperature,
-            "max_tokens": max_tokens or config.generation.max_tokens,
+            "temperature": generation.temperature if temperature is None else temperature,
+            "max_tokens": generation.max_tokens if max_tokens is None else max_tokens,
             "stream": True,
         }
 
-        logger.debug(f"OpenAI stream payload: {payload}")
+        logger.debug("OpenAI stream payload: %s", payload)
 
-        self._stream_cancelled = False
+        cancelled = self._cancel_event = asyncio.Event()
+        lines = None
         try:
             logger.info(f"Starting OpenAI stream request to {url}")
-            async with self.client.stream("POST", url, json=payload) as response:
+            async with self.client.stream("POST", url, **_request_body(payload)) as response:
                 self._current_response = response
                 response.raise_for_status()
-                async for line in response.aiter_lines():
-                    # Check for cancellation
-                    if self._stream_cancelled:
-                        logger.info("OpenAI stream cancelled by user")
+                lines = _until_set(_iter_sse_data(_iter_lines(response.aiter_bytes())), cancelled)
+                async for data_str in lines:
+                    # Some servers pad the sentinel ("data: [DONE] ")
+                    if data_str.strip() == b"[DONE]":
+                        logger.info("OpenAI stream completed successfully")
                         break
-
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        if data_str.strip() == "[DONE]":
-                            logger.info("OpenAI stream completed successfully")
-                            break
-                        try:
-                            data = json.loads(data_str)
-                            if "choices" in data and len(data["choices"]) > 0:
-                                delta = data["choices"][0].get("delta", {})
-                                content = delta.get("content", "")
-                                if content:
-                                    logger.debug(f"Received OpenAI chunk: {content[:50]}...")
-                                    yield content
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Failed to decode OpenAI JSON: {data_str[:100]}")
-                            continue
+                    # Common case: a plain text delta, no dict needed
+                    content = _openai_delta(data_str)
+                    if content is not None:
+                        if content:
+                            yield content
+                        continue
+
+                    try:
+                        choices = _json_loads(data_str).get("choices")
+                        if choices:
+                            content = choices[0].get("delta", _EMPTY_DELTA).get("content")
+                            if content:
+                                logger.debug("Received OpenAI chunk: %.50s...", content)
+                                yield content
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Failed to decode OpenAI JSON: {data_str[:100].decode(errors='replace')}")
+                        continue
         except httpx.HTTPError as e:
-            if not self._stream_cancelled:
+            if not cancelled.is_set():
                 error_msg = f"\nError communicating with LLM: {str(e)}"
                 logger.error(f"OpenAI stream error: {e}")
                 yield error_msg
         finally:
+            if lines is not None:
+                # Finalize the line iterators even when the loop broke early
+                await lines.aclose()
+            if cancelled.is_set():
+                logger.info("OpenAI stream cancelled by user")
             self._current_response = None
-            self._stream_cancelled = False
+            if self._cancel_event is cancelled:
+                self._cancel_event = None
             logger.debug("OpenAI stream cleanup completed")
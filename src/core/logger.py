@@ -1,10 +1,20 @@
 """Centralized logging configuration for the FastAPI Agent."""
 
+import atexit
 import logging
+import queue
 import sys
+from functools import lru_cache
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
-from typing import Optional
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+# Characters of message content shown in DEBUG previews
+LOG_PREVIEW_CHARS = 500
+
+# Handlers shared by loggers with the same configuration: a queue handler
+# feeding the file handler on a background listener, and the console handler
+_HANDLERS: Dict[Tuple, Tuple[QueueHandler, logging.Handler]] = {}
 
 
 def setup_logger(
@@ -18,6 +28,12 @@ def setup_logger(
     """
     Setup and configure a logger with file and console handlers.
 
+    The file handler runs on a background QueueListener thread, so a log call
+    from async code only enqueues the record instead of blocking on file
+    writes and rotation. The console handler stays synchronous, so warnings
+    interleave with other terminal output. Loggers with the same settings
+    share the handlers and the listener.
+
     Args:
         name: Logger name (usually __name__)
         log_file: Path to log file. If None, uses default 'logs/fastapi-agent.log'
@@ -36,6 +52,24 @@ def setup_logger(
         return logger
 
     logger.setLevel(level)
+    for handler in _shared_handlers(log_file, level, console_level, max_bytes, backup_count):
+        logger.addHandler(handler)
+
+    return logger
+
+
+def _shared_handlers(
+    log_file: Optional[str],
+    level: int,
+    console_level: int,
+    max_bytes: int,
+    backup_count: int,
+) -> Tuple[QueueHandler, logging.Handler]:
+    """Return the (queue, console) handlers for these settings, starting the listener once."""
+    key = (log_file, level, console_level, max_bytes, backup_count)
+    handlers = _HANDLERS.get(key)
+    if handlers is not None:
+        return handlers
 
     # Create logs directory if it doesn't exist
     if log_file is None:
@@ -66,21 +100,32 @@ def setup_logger(
     )
     file_handler.setLevel(level)
     file_handler.setFormatter(detailed_formatter)
-    logger.addHandler(file_handler)
 
     # Console handler - less verbose
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(console_level)
     console_handler.setFormatter(simple_formatter)
-    logger.addHandler(console_handler)
 
-    return logger
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    # Flush queued records before the interpreter exits
+    atexit.register(listener.stop)
 
+    handler = QueueHandler(log_queue)
+    handler.listener = listener
+    handlers = _HANDLERS[key] = (handler, console_handler)
+    return handlers
 
+
+@lru_cache(maxsize=None)
 def get_logger(name: str) -> logging.Logger:
     """
     Get or create a logger with the standard configuration.
 
+    Loggers are process-wide singletons, so the configured instance is cached
+    per name; set_log_level() still changes it in place.
+
     Args:
         name: Logger name (usually __name__)
 
@@ -96,6 +141,13 @@ def get_logger(name: str) -> logging.Logger:
     return logger
 
 
+def _preview(text: str) -> str:
+    """Truncate long content for logging."""
+    if len(text) > LOG_PREVIEW_CHARS:
+        return text[:LOG_PREVIEW_CHARS] + "... [truncated]"
+    return text
+
+
 def log_llm_request(logger: logging.Logger, model: str, messages: list, **kwargs):
     """
     Log an LLM request with formatted details.
@@ -106,20 +158,19 @@ def log_llm_request(logger: logging.Logger, model: str, messages: list, **kwargs
         messages: List of message dicts
         **kwargs: Additional parameters (temperature, max_tokens, etc.)
     """
-    logger.info(f"LLM Request to model: {model}")
-    logger.debug(f"Request parameters: {kwargs}")
+    logger.info("LLM Request to model: %s", model)
+
+    # Skip the per-message previews entirely unless they will be written
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+
+    logger.debug("Request parameters: %s", kwargs)
 
     for i, msg in enumerate(messages):
         role = msg.get("role", "unknown")
         content = msg.get("content", "")
 
-        # Truncate long content for logging
-        if len(content) > 500:
-            content_preview = content[:500] + "... [truncated]"
-        else:
-            content_preview = content
-
-        logger.debug(f"Message {i} [{role}]: {content_preview}")
+        logger.debug("Message %d [%s]: %s", i, role, _preview(content))
 
 
 def log_llm_response(logger: logging.Logger, response: str, success: bool = True):
@@ -133,16 +184,12 @@ def log_llm_response(logger: logging.Logger, response: str, success: bool = True
     """
     if success:
         logger.info("LLM Response received successfully")
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
 
-        # Truncate long responses for logging
-        if len(response) > 500:
-            response_preview = response[:500] + "... [truncated]"
-        else:
-            response_preview = response
-
-        logger.debug(f"Response content: {response_preview}")
+        logger.debug("Response content: %s", _preview(response))
     else:
-        logger.error(f"LLM Request failed: {response}")
+        logger.error("LLM Request failed: %s", response)
 
 
 def log_llm_stream_chunk(logger: logging.Logger, chunk: str):
@@ -153,7 +200,7 @@ def log_llm_stream_chunk(logger: logging.Logger, chunk: str):
         logger: Logger instance
         chunk: Response chunk
     """
-    logger.debug(f"Stream chunk: {chunk[:100]}")
+    logger.debug("Stream chunk: %.100s", chunk)
 
 
 def log_command_execution(logger: logging.Logger, command: str, result: str, success: bool):
@@ -167,11 +214,11 @@ def log_command_execution(logger: logging.Logger, command: str, result: str, suc
         success: Whether command succeeded
     """
     if success:
-        logger.info(f"Command executed successfully: {command}")
-        logger.debug(f"Command output: {result[:500]}")
+        logger.info("Command executed successfully: %s", command)
+        logger.debug("Command output: %.500s", result)
     else:
-        logger.error(f"Command failed: {command}")
-        logger.error(f"Error output: {result}")
+        logger.error("Command failed: %s", command)
+        logger.error("Error output: %s", result)
 
 
 def set_log_level(logger_name: Optional[str] = None, level: int = logging.DEBUG):
@@ -189,7 +236,9 @@ def set_log_level(logger_name: Optional[str] = None, level: int = logging.DEBUG)
 
     logger.setLevel(level)
 
-    # Also update handlers
+    # Also update handlers. The file handlers behind setup_logger's queue
+    # are shared with other loggers, so they are left alone: the logger's
+    # own level already filters its records
     for handler in logger.handlers:
         if isinstance(handler, logging.FileHandler):
             handler.setLevel(level)
@@ -1,10 +1,11 @@
 """Tool definitions for LLM function calling."""
 
-from typing import List, Dict, Any
+from typing import Dict, Any
 
 
-# Tool definitions in OpenAI function calling format
-TOOLS = [
+# Tool definitions in OpenAI function calling format (a tuple, so the shared
+# definitions cannot be appended to or reordered at runtime)
+TOOLS = (
     {
         "type": "function",
         "function": {
@@ -76,41 +77,72 @@ TOOLS = [
             }
         }
     }
-]
+)
+
+# Names of the tools above, for membership checks
+TOOL_NAMES = frozenset(tool["function"]["name"] for tool in TOOLS)
 
 # Note: SYSTEM_PROMPT moved to expert_modes.py
 # Each expert mode has its own specialized system prompt
 
 
+# Rich markup templates for displaying each tool call
+_TEMPLATES = {
+    "execute_shell_command": (
+        "[bold cyan]Command:[/bold cyan] {command}\n"
+        "[bold yellow]Explanation:[/bold yellow] {explanation}{wd}"
+    ),
+    "read_file": (
+        "[bold cyan]Read File:[/bold cyan] {filepath}\n"
+        "[bold yellow]Reason:[/bold yellow] {reason}"
+    ),
+    "write_file": (
+        "[bold cyan]Write File:[/bold cyan] {filepath}\n"
+        "[bold yellow]Explanation:[/bold yellow] {explanation}\n"
+        "[bold]Content Preview:[/bold]\n{preview}"
+    ),
+}
+
+# Characters of file content shown in write_file previews
+CONTENT_PREVIEW_CHARS = 200
+
+
+class _Fields(dict):
+    """Template fields that render missing arguments as empty strings."""
+
+    def __missing__(self, key: str) -> str:
+        return ""
+
+
+def _shell_fields(fields: _Fields) -> None:
+    """Add the optional working directory line."""
+    wd = fields.get("working_directory")
+    fields["wd"] = f"\n[bold]Working Directory:[/bold] {wd}" if wd else ""
+
+
+def _write_fields(fields: _Fields) -> None:
+    """Add a preview of the content to write."""
+    content = fields.get("content", "")
+    if len(content) > CONTENT_PREVIEW_CHARS:
+        content = content[:CONTENT_PREVIEW_CHARS] + "..."
+    fields["preview"] = content
+
+
+# Derived template fields, keyed by tool name
+_FIELD_BUILDERS = {
+    "execute_shell_command": _shell_fields,
+    "write_file": _write_fields,
+}
+
+
 def format_tool_call_for_display(tool_name: str, arguments: Dict[str, Any]) -> str:
     """Format a tool call for display to the user."""
-    if tool_name == "execute_shell_command":
-        cmd = arguments.get("command", "")
-        explanation = arguments.get("explanation", "")
-        wd = arguments.get("working_directory")
-
-        result = f"[bold cyan]Command:[/bold cyan] {cmd}\n"
-        result += f"[bold yellow]Explanation:[/bold yellow] {explanation}"
-        if wd:
-            result += f"\n[bold]Working Directory:[/bold] {wd}"
-        return result
-
-    elif tool_name == "read_file":
-        filepath = arguments.get("filepath", "")
-        reason = arguments.get("reason", "")
-        return f"[bold cyan]Read File:[/bold cyan] {filepath}\n[bold yellow]Reason:[/bold yellow] {reason}"
-
-    elif tool_name == "write_file":
-        filepath = arguments.get("filepath", "")
-        content = arguments.get("content", "")
-        explanation = arguments.get("explanation", "")
-
-        # Show preview of content (first 200 chars)
-        preview = content[:200] + "..." if len(content) > 200 else content
-
-        result = f"[bold cyan]Write File:[/bold cyan] {filepath}\n"
-        result += f"[bold yellow]Explanation:[/bold yellow] {explanation}\n"
-        result += f"[bold]Content Preview:[/bold]\n{preview}"
-        return result
-
-    return f"Unknown tool: {tool_name}"
+    template = _TEMPLATES.get(tool_name)
+    if template is None:
+        return f"Unknown tool: {tool_name}"
+
+    fields = _Fields(arguments)
+    build_fields = _FIELD_BUILDERS.get(tool_name)
+    if build_fields is not None:
+        build_fields(fields)
+    return template.format_map(fields)
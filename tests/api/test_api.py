@@ -117,3 +117,17 @@ class TestLifespan:
 
             # Verify close was called
             mock_close.assert_called_once()
+
+    def test_lifespan_survives_invalid_url(self):
+        """Test that a malformed LLM URL does not abort startup."""
+        with patch.object(llm_client, 'base_url', "http://localhost:abc"), \
+             patch.object(llm_client, 'close', new_callable=AsyncMock):
+            with TestClient(app) as client:
+                assert client.get("/").status_code == 200
+
+    def test_lifespan_prewarms_client(self):
+        """Test that the lifespan startup pre-warms the LLM connection."""
+        with patch.object(llm_client, 'health_check', new_callable=AsyncMock) as mock_check, \
+             patch.object(llm_client, 'close', new_callable=AsyncMock):
+            with TestClient(app):
+                mock_check.assert_called_once()
@@ -0,0 +1,176 @@
+"""Tests for command executor."""
+
+import pytest
+from unittest.mock import patch
+from rich.console import Console
+from src.cli import command_executor
+from src.cli.command_executor import CommandExecutor, _lexer_for
+
+
+@pytest.fixture
+def executor(tmp_path):
+    """Create a command executor working in a temporary directory."""
+    return CommandExecutor(working_directory=str(tmp_path))
+
+
+class TestShellCommand:
+    """Tests for shell command execution."""
+
+    @pytest.mark.asyncio
+    async def test_execute_success(self, executor):
+        """Test running a successful command."""
+        success, result = await executor.execute_with_approval(
+            "execute_shell_command",
+            {"command": "echo hello", "explanation": "Say hello"},
+            auto_approve=True
+        )
+
+        assert success is True
+        assert result.startswith("Exit code: 0\nStdout:\nhello\n")
+        assert executor.execution_history[-1].exit_code == 0
+
+    @pytest.mark.asyncio
+    async def test_execute_failure(self, executor):
+        """Test running a failing command."""
+        success, result = await executor._execute_shell_command(
+            {"command": "echo oops >&2; exit 3"}
+        )
+
+        assert success is False
+        assert "Exit code: 3" in result
+        assert "oops" in result
+
+    @pytest.mark.asyncio
+    async def test_execute_invalid_utf8(self, executor):
+        """Test that undecodable output does not raise."""
+        success, result = await executor._execute_shell_command(
+            {"command": "printf '\\377'"}
+        )
+
+        assert success is True
+        assert "�" in result
+
+    @pytest.mark.asyncio
+    async def test_execute_keeps_bounded_tail(self, executor, monkeypatch):
+        """Test that only the tail of long output is kept in the result."""
+        monkeypatch.setattr(command_executor, "READ_CHUNK_SIZE", 4)
+        monkeypatch.setattr(command_executor, "OUTPUT_TAIL_CHUNKS", 2)
+
+        success, result = await executor._execute_shell_command(
+            {"command": "printf 'aaaabbbbccccdddd'"}
+        )
+
+        assert success is True
+        assert "ccccdddd" in result
+        assert "aaaa" not in result
+        assert "earlier output chunks omitted" in result
+
+
+class TestFileTools:
+    """Tests for file read/write tools."""
+
+    @pytest.mark.asyncio
+    async def test_read_file(self, executor, tmp_path):
+        """Test reading an existing file."""
+        path = tmp_path / "notes.txt"
+        path.write_text("some notes")
+
+        success, result = await executor._execute_tool("read_file", {"filepath": str(path)})
+
+        assert success is True
+        assert result == "some notes"
+
+    @pytest.mark.asyncio
+    async def test_read_file_with_markup_like_text(self, executor, tmp_path):
+        """Test that text resembling rich markup is shown verbatim."""
+        path = tmp_path / "notes.unknownext"
+        path.write_text("closing tag [/x] and [bold]")
+
+        success, result = await executor._execute_tool("read_file", {"filepath": str(path)})
+
+        assert success is True
+        assert result == "closing tag [/x] and [bold]"
+
+    @pytest.mark.asyncio
+    async def test_read_file_keeps_leading_blank_lines(self, executor, tmp_path, monkeypatch):
+        """Test that highlighted files keep leading blank lines and line numbers."""
+        console = Console(record=True, width=80, color_system=None)
+        monkeypatch.setattr(command_executor, "_console", lambda: console)
+        path = tmp_path / "script.py"
+        path.write_text("\n\nx = 1\n")
+
+        success, _ = await executor._execute_tool("read_file", {"filepath": str(path)})
+
+        assert success is True
+        numbered = [line.strip() for line in console.export_text().splitlines() if line.strip()[:1].isdigit()]
+        assert numbered[:3] == ["1", "2", "3 x = 1"]
+
+    def test_lexer_for_suffix(self):
+        """Test lexer lookup by file suffix."""
+        assert _lexer_for("py").name == "Python"
+        assert _lexer_for("py") is _lexer_for("py")
+        assert _lexer_for("notalanguage") is None
+        assert _lexer_for("") is None
+
+    @pytest.mark.asyncio
+    async def test_read_missing_file(self, executor, tmp_path):
+        """Test reading a file that does not exist."""
+        success, result = await executor._execute_tool(
+            "read_file", {"filepath": str(tmp_path / "missing.txt")}
+        )
+
+        assert success is False
+        assert "File not found" in result
+
+    @pytest.mark.asyncio
+    async def test_write_new_file(self, executor, tmp_path):
+        """Test creating a new file in a new directory."""
+        path = tmp_path / "sub" / "out.txt"
+
+        success, result = await executor._execute_tool(
+            "write_file", {"filepath": str(path), "content": "data"}
+        )
+
+        assert success is True
+        assert result == f"Created {path}"
+        assert path.read_text() == "data"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("confirm, expected", [(True, "new"), (False, "old")])
+    async def test_write_existing_file(self, executor, tmp_path, confirm, expected):
+        """Test that overwriting an existing file asks for confirmation."""
+        path = tmp_path / "out.txt"
+        path.write_text("old")
+
+        with patch("rich.prompt.Confirm.ask", return_value=confirm):
+            success, _ = await executor._execute_tool(
+                "write_file", {"filepath": str(path), "content": "new"}
+            )
+
+        assert success is confirm
+        assert path.read_text() == expected
+
+    @pytest.mark.asyncio
+    async def test_write_failure_removes_new_file(self, executor, tmp_path, monkeypatch):
+        """Test that a failed write does not leave an empty file behind."""
+        def failing_open(*args, **kwargs):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(command_executor, "open", failing_open, raising=False)
+        path = tmp_path / "out.txt"
+
+        success, result = await executor._execute_tool(
+            "write_file", {"filepath": str(path), "content": "data"}
+        )
+
+        assert success is False
+        assert result == "disk full"
+        assert not path.exists()
+
+    @pytest.mark.asyncio
+    async def test_unknown_tool(self, executor):
+        """Test dispatching an unknown tool."""
+        success, result = await executor._execute_tool("nope", {})
+
+        assert success is False
+        assert "Unknown tool" in result
@@ -0,0 +1,136 @@
+"""Tests for command parser."""
+
+import pytest
+from unittest.mock import patch
+from src.cli.command_parser import CommandParser, CommandOption, format_command_menu
+
+
+@pytest.fixture
+def parser():
+    """Create a command parser."""
+    return CommandParser()
+
+
+class TestCommandParser:
+    """Tests for CommandParser class."""
+
+    def test_parse_bash_code_block(self, parser):
+        """Test extracting a single command from a bash code block."""
+        text = "List the files:\n```bash\nls -la\n```\n"
+        commands = parser.parse(text)
+
+        assert len(commands) == 1
+        assert commands[0].command == "ls -la"
+        assert commands[0].source == "code_block"
+        assert commands[0].confidence == 0.9
+
+    def test_parse_strips_prompts_and_output(self, parser):
+        """Test that shell prompts and command output are filtered out."""
+        text = """```bash
+$ ls -la
+total 8
+drwxr-xr-x  2 user user 4096 Jan 1 00:00 .
+/home/user
+```"""
+        commands = parser.parse(text)
+
+        assert [cmd.command for cmd in commands] == ["ls -la"]
+
+    def test_parse_skips_explanation_lines(self, parser):
+        """Test that English sentences in code blocks are skipped."""
+        text = "```bash\nThis is the command you can use\ngit status\n```"
+        commands = parser.parse(text)
+
+        assert [cmd.command for cmd in commands] == ["git status"]
+
+    def test_parse_multiline_block(self, parser):
+        """Test that short multi-line blocks are kept together."""
+        text = "```sh\nmkdir build\ncd build\n```"
+        commands = parser.parse(text)
+
+        assert len(commands) == 1
+        assert commands[0].command == "mkdir build\ncd build"
+        assert commands[0].confidence == 0.85
+
+    def test_parse_backticks(self, parser):
+        """Test extracting inline backtick commands."""
+        commands = parser.parse("You can run `git status` to check.")
+
+        assert len(commands) == 1
+        assert commands[0].command == "git status"
+        assert commands[0].source == "backticks"
+
+    def test_parse_ignores_inline_code(self, parser):
+        """Test that inline code that is not a command is ignored."""
+        assert parser.parse("Set the `timeout` variable.") == []
+
+    def test_is_inside_code_block(self, parser):
+        """Test detection of positions inside fenced code blocks."""
+        text = "before ```bash\nls\n``` after"
+        fences = [text.index("```") + 3, text.rindex("```") + 3]
+
+        assert not parser._is_inside_code_block(fences, text.index("before"))
+        assert parser._is_inside_code_block(fences, text.index("ls"))
+        assert not parser._is_inside_code_block(fences, text.index("after"))
+
+    def test_parse_deduplicates_keeping_highest_confidence(self, parser):
+        """Test that duplicates keep the highest confidence source."""
+        text = "```bash\ngit status\n```\nOr run `git status`."
+        commands = parser.parse(text)
+
+        assert len(commands) == 1
+        assert commands[0].source == "code_block"
+
+    def test_parse_respects_max_options(self, parser):
+        """Test that results are limited to max_options."""
+        text = "Try `ls`, `pwd`, `df -h` or `du -sh`."
+        commands = parser.parse(text, max_options=2)
+
+        assert len(commands) == 2
+
+    def test_parse_skips_lower_passes_when_enough(self, parser):
+        """Test that backtick/pattern passes are skipped when not needed."""
+        text = "```bash\nls\n```\n```bash\npwd\n```\nAlso `git status`."
+
+        with patch.object(parser, "_extract_from_backticks") as backticks:
+            commands = parser.parse(text, max_options=2)
+
+        backticks.assert_not_called()
+        assert [cmd.command for cmd in commands] == ["ls", "pwd"]
+
+    def test_looks_like_command(self, parser):
+        """Test command detection heuristics."""
+        assert parser._looks_like_command("git status")
+        assert parser._looks_like_command("sudo apt update")
+        assert parser._looks_like_command("foo | bar")
+        assert not parser._looks_like_command("variable")
+        assert not parser._looks_like_command("")
+
+    def test_parse_reuses_cached_result(self, parser):
+        """Test that parsing the same reply twice skips the extraction passes."""
+        text = "```bash\nls -la\n```"
+        first = parser.parse(text)
+
+        with patch.object(parser, "_parse_uncached") as uncached:
+            second = parser.parse(text)
+
+        uncached.assert_not_called()
+        assert second == first
+        assert second is not first
+
+
+def test_format_command_menu():
+    """Test formatting command options as a menu."""
+    menu = format_command_menu([
+        CommandOption(command="ls", explanation="List files", confidence=0.9, source="code_block")
+    ])
+
+    assert "1." in menu
+    assert "ls" in menu
+    assert "List files" in menu
+    assert "Do nothing" in menu
+
+
+def test_format_command_menu_empty():
+    """Test formatting an empty menu."""
+    assert format_command_menu([]) == ""
@@ -0,0 +1,44 @@
+"""Tests for expert modes."""
+
+import pytest
+from src.cli.expert_modes import (
+    ExpertMode,
+    ResponseMode,
+    get_system_prompt,
+    get_expert_config
+)
+
+
+class TestSystemPrompt:
+    """Tests for system prompt generation."""
+
+    @pytest.mark.parametrize("expert_mode", list(ExpertMode))
+    def test_prompt_contains_style(self, expert_mode):
+        """Test that prompts include the response style instruction."""
+        assert "Quick and concise" in get_system_prompt(expert_mode, ResponseMode.QUICK)
+        assert "Detailed with examples" in get_system_prompt(expert_mode, ResponseMode.FULL)
+
+    def test_prompt_is_cached(self):
+        """Test that identical modes return the same cached prompt."""
+        first = get_system_prompt(ExpertMode.LINUX, ResponseMode.QUICK)
+        assert get_system_prompt(ExpertMode.LINUX, ResponseMode.QUICK) is first
+        assert "LINUX MODE" in first
+
+
+class TestExpertConfig:
+    """Tests for expert configuration lookup."""
+
+    def test_max_tokens_by_response_mode(self):
+        """Test that max_tokens depends on the response mode."""
+        quick = get_expert_config(ExpertMode.PYTHON, ResponseMode.QUICK)
+        full = get_expert_config(ExpertMode.PYTHON, ResponseMode.FULL)
+
+        assert quick["max_tokens"] == 500
+        assert full["max_tokens"] == 2000
+        assert quick["temperature"] == full["temperature"] == 0.5
+
+    def test_config_is_read_only(self):
+        """Test that the shared cached config cannot be mutated."""
+        config = get_expert_config(ExpertMode.LINUX, ResponseMode.QUICK)
+        with pytest.raises(TypeError):
+            config["temperature"] = 1.0
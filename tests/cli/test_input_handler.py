@@ -1,7 +1,10 @@
 """Tests for input handler."""
 
+import os
 import pytest
-from src.cli.input_handler import InputHandler
+from pathlib import Path
+from unittest.mock import AsyncMock
+from src.cli.input_handler import InputHandler, _read_text_file, _scan_file_references
 
 
 class TestInputHandler:
@@ -13,6 +16,22 @@ class TestInputHandler:
         assert handler is not None
         assert handler.multiline_delimiters == ['"""', "'''", "```"]
 
+    def test_session_created_lazily(self):
+        """Test that the prompt session is only built when first used."""
+        handler = InputHandler()
+        assert handler._session is None
+
+        session = handler.session
+        assert handler.session is session
+
+    def test_no_instance_dict(self):
+        """Test that InputHandler instances use slots only."""
+        handler = InputHandler()
+
+        assert not hasattr(handler, "__dict__")
+        with pytest.raises(AttributeError):
+            handler.unexpected = True
+
     def test_parse_command_from_input_with_bash_block(self):
         """Test parsing bash command from markdown code block."""
         handler = InputHandler()
@@ -60,5 +79,242 @@ echo "World"
         assert "echo" in result
         assert "Hello" in result
 
+    def test_parse_command_from_input_skips_other_fences(self):
+        """Test that non-shell code blocks are skipped."""
+        handler = InputHandler()
+
+        text = "```python\nprint(1)\n```\nthen\n```shell  \ndf -h\n```"
+        assert handler.parse_command_from_input(text) == "df -h"
+        assert handler.parse_command_from_input("```bash ls\n```") is None
+
+
+class TestMultilineInput:
+    """Tests for the dedicated multi-line editor."""
+
+    @pytest.mark.asyncio
+    async def test_paste_is_read_in_one_prompt(self):
+        """Test that a paste is captured from a single prompt call."""
+        handler = InputHandler()
+        handler._multiline_session.prompt_async = AsyncMock(return_value="line 1\nline 2\n")
+
+        result = await handler.get_multiline_input()
+
+        assert result == "line 1\nline 2"
+        handler._multiline_session.prompt_async.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_cancel_returns_none(self):
+        """Test that Ctrl+C cancels multi-line input."""
+        handler = InputHandler()
+        handler._multiline_session.prompt_async = AsyncMock(side_effect=KeyboardInterrupt)
+
+        assert await handler.get_multiline_input() is None
+
+    @pytest.mark.asyncio
+    async def test_get_input_detects_delimiter(self):
+        """Test that an indented opening delimiter starts multi-line mode."""
+        handler = InputHandler()
+        handler.session.prompt_async = AsyncMock(side_effect=["  ```", "code", "```"])
+
+        assert await handler.get_input() == "code\n"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("first_line,expected", [
+        ('"""', "body\nend"),
+        ('"""start', "start\nbody\nend"),
+    ])
+    async def test_delimited_input(self, first_line, expected):
+        """Test that opening and closing delimiters are stripped."""
+        handler = InputHandler()
+        handler.session.prompt_async = AsyncMock(side_effect=["body", 'end"""'])
+
+        assert await handler._handle_multiline(first_line, '"""') == expected
+
+
+class TestFileReferences:
+    """Tests for @filename ingestion."""
+
+    @pytest.fixture(autouse=True)
+    def in_tmp_path(self, tmp_path, monkeypatch):
+        """Run each test from an empty temporary directory."""
+        monkeypatch.chdir(tmp_path)
+
+    @pytest.mark.asyncio
+    async def test_no_reference(self):
+        """Test that text without references is returned unchanged."""
+        handler = InputHandler()
+
+        result = await handler._process_file_references("Just a question")
+        assert result == "Just a question"
+
+    @pytest.mark.asyncio
+    async def test_single_reference(self, tmp_path):
+        """Test that a referenced file is appended as a file block."""
+        (tmp_path / "main.py").write_text("print('hi')")
+        handler = InputHandler()
+
+        result = await handler._process_file_references("Review @main.py please")
+
+        assert result == (
+            "Review  please\n"
+            "\n\n--- File: main.py ---\nprint('hi')\n--- End of main.py ---\n"
+        )
+
+    @pytest.mark.asyncio
+    async def test_multiple_references_keep_order(self, tmp_path):
+        """Test that several files are appended in reference order."""
+        (tmp_path / "a.txt").write_text("A")
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "b.txt").write_text("B")
+        handler = InputHandler()
+
+        result = await handler._process_file_references("Compare @a.txt and @sub/b.txt")
+
+        assert result.startswith("Compare  and\n")
+        assert result.index("--- File: a.txt ---\nA") < result.index("--- File: sub/b.txt ---\nB")
+
+    @pytest.mark.asyncio
+    async def test_missing_reference_is_removed(self):
+        """Test that unresolved references are stripped from the text."""
+        handler = InputHandler()
+
+        result = await handler._process_file_references("Look at @missing.txt now")
+        assert result == "Look at  now"
+
+    @pytest.mark.asyncio
+    async def test_modified_file_is_reread(self, tmp_path):
+        """Test that cached contents are dropped once the file changes."""
+        target = tmp_path / "notes.txt"
+        target.write_text("v1")
+        handler = InputHandler()
+
+        first = await handler._process_file_references("@notes.txt")
+        assert "v1" in first
+        assert len(handler._content_cache) == 1
+
+        # Expire the lookup cache and change the file size
+        handler._resolve_cache.clear()
+        target.write_text("version 2")
+
+        second = await handler._process_file_references("@notes.txt")
+        assert "version 2" in second
+
+    @pytest.mark.asyncio
+    async def test_file_changed_within_lookup_ttl_is_reread(self, tmp_path):
+        """Test that the content cache does not trust the cached lookup stat."""
+        target = tmp_path / "notes.txt"
+        target.write_text("v1")
+        handler = InputHandler()
+
+        assert "v1" in await handler._process_file_references("@notes.txt")
+        target.write_text("version 2")
+
+        assert "version 2" in await handler._process_file_references("@notes.txt")
+
+    @pytest.mark.asyncio
+    async def test_same_name_in_other_directory(self, tmp_path, monkeypatch):
+        """Test that cached contents are keyed by the real path."""
+        for name in ("a", "b"):
+            (tmp_path / name).mkdir()
+            target = tmp_path / name / "notes.txt"
+            target.write_text(name.upper() * 4)
+            os.utime(target, ns=(10**18, 10**18))
+        handler = InputHandler()
+
+        monkeypatch.chdir(tmp_path / "a")
+        assert "AAAA" in await handler._process_file_references("@notes.txt")
+        monkeypatch.chdir(tmp_path / "b")
+        assert "BBBB" in await handler._process_file_references("@notes.txt")
+
+    def test_lookup_caches_missing_files(self, tmp_path):
+        """Test that a negative lookup is reused within the TTL."""
+        handler = InputHandler()
+
+        assert handler._resolve_file_path("late.py") is None
+        (tmp_path / "late.py").write_text("")
+        assert handler._resolve_file_path("late.py") is None
+
+        handler._resolve_cache.clear()
+        assert handler._resolve_file_path("late.py") == Path("late.py")
+
+    @pytest.mark.parametrize("text,expected", [
+        ("see @file", ["file"]),
+        ("see @file.py now", ["file.py"]),
+        ("@~/a/b.txt", ["~/a/b.txt"]),
+        ("@./a.py, @src/b-c.py", ["./a.py", "src/b-c.py"]),
+        ("mail me@host.com", ["host.com"]),
+        ("@@x.py @ @", ["x.py"]),
+        ("@données.txt", ["données.txt"]),
+    ])
+    def test_reference_scanner(self, text, expected):
+        """Test which text the @filename scanner captures."""
+        spans = _scan_file_references(text)
+        assert [text[start + 1:end] for start, end in spans] == expected
+
+    def test_read_text_file(self, tmp_path):
+        """Test the single-read helper against Path.read_text()."""
+        target = tmp_path / "crlf.txt"
+        target.write_bytes("a\r\nb\rc é\n".encode("utf-8"))
+
+        assert _read_text_file(target) == target.read_text(encoding="utf-8")
+        assert _read_text_file(target) == "a\nb\nc é\n"
+
+    def test_read_text_file_short_reads(self, tmp_path, monkeypatch):
+        """Test that short reads are continued until EOF."""
+        target = tmp_path / "big.txt"
+        target.write_text("0123456789" * 100)
+        real_read = os.read
+        monkeypatch.setattr(os, "read", lambda fd, n: real_read(fd, min(n, 7)))
+
+        assert _read_text_file(target) == "0123456789" * 100
+
+    @pytest.mark.asyncio
+    async def test_unreadable_file_is_skipped(self, tmp_path):
+        """Test that a read error drops only that file's block."""
+        (tmp_path / "ok.txt").write_text("fine")
+        (tmp_path / "bad.bin").write_bytes(b"\xff\xfe")
+        handler = InputHandler()
+
+        result = await handler._process_file_references("@bad.bin @ok.txt")
+
+        assert "--- File: ok.txt ---\nfine" in result
+        assert "bad.bin" not in result
+
+    def test_resolve_file_path(self, tmp_path):
+        """Test resolving relative, absolute and directory references."""
+        (tmp_path / "a.txt").write_text("A")
+        (tmp_path / "dir").mkdir()
+        handler = InputHandler()
+
+        assert handler._resolve_file_path("a.txt") == Path("a.txt")
+        assert handler._resolve_file_path(str(tmp_path / "a.txt")) == tmp_path / "a.txt"
+        assert handler._resolve_file_path("dir") is None
+        assert handler._resolve_file_path("missing.txt") is None
+
+    def test_suggest_file_paths(self, tmp_path):
+        """Test suggestions for a file found one level deep."""
+        (tmp_path / "src").mkdir()
+        (tmp_path / "src" / "main.py").write_text("")
+        handler = InputHandler()
+
+        assert handler._suggest_file_paths("main.py") == ["src/main.py"]
+
+    def test_suggest_skips_explicit_paths(self, tmp_path):
+        """Test that no suggestions are made for a reference with a directory."""
+        (tmp_path / "src").mkdir()
+        (tmp_path / "src" / "main.py").write_text("")
+        handler = InputHandler()
+
+        assert handler._suggest_file_paths("lib/main.py") == []
+
+    def test_suggest_respects_directory_budget(self, tmp_path, monkeypatch):
+        """Test that the scan stops once the directory budget is spent."""
+        monkeypatch.setattr("src.cli.input_handler.SUGGEST_DIR_BUDGET", 2)
+        for name in ("a", "b", "c"):
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "main.py").write_text("")
+        handler = InputHandler()
 
-# Add more tests for file ingestion when we can mock file system
+        # One visit for the current directory, one for a single subdirectory
+        assert len(handler._suggest_file_paths("main.py")) == 1
+        assert handler._suggest_file_paths("main.py") == []
@@ -0,0 +1,351 @@
+"""Tests for the interactive terminal."""
+
+import asyncio
+import os
+import signal
+import sys
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.cli.expert_modes import ExpertMode
+from src.core.config import ServerConfig, get_config
+from src.cli.interactive_terminal import (
+    InteractiveCLI,
+    _expert_table,
+    _response_table,
+    _split_special_command
+)
+
+
+def make_llm_client(chunks, expert_mode=ExpertMode.PYTHON):
+    """Build a stand-in LLM client that streams the given chunks."""
+    client = MagicMock()
+    client.expert_mode = expert_mode
+    client.conversation_history = []
+    client.add_user_message.side_effect = lambda content: client.conversation_history.append(
+        {"role": "user", "content": content}
+    )
+    client.discard_last_user_message.side_effect = lambda: bool(client.conversation_history.pop())
+
+    async def chat_with_tools():
+        for chunk in chunks:
+            yield chunk
+
+    client.chat_with_tools = chat_with_tools
+    return client
+
+
+def _live_group_members(pgid):
+    """PIDs in a process group that are still running (zombies excluded)."""
+    members = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == pgid and fields[0] != "Z":
+            members.append(int(entry))
+    return members
+
+
+@pytest.fixture
+def cli():
+    """CLI instance without a configured LLM client."""
+    return InteractiveCLI(base_url="http://localhost:11434", model="test-model")
+
+
+class TestTurns:
+    """Tests for a single conversation turn."""
+
+    @pytest.mark.asyncio
+    async def test_response_is_saved(self, cli):
+        """Test that a completed reply is added to the history."""
+        cli.llm_client = make_llm_client([
+            {"type": "text", "content": "Hello "},
+            {"type": "text", "content": "there"},
+        ])
+
+        await cli._run_turn("hi")
+
+        cli.llm_client.add_assistant_message.assert_called_once_with("Hello there")
+
+    @pytest.mark.asyncio
+    async def test_streamed_text_is_not_markup(self, cli, capsys):
+        """Test that streamed text is written verbatim, brackets included."""
+        cli.llm_client = make_llm_client([{"type": "text", "content": "use [bold] or [0]"}])
+
+        await cli._run_turn("hi")
+
+        assert "use [bold] or [0]" in capsys.readouterr().out
+
+    @pytest.mark.asyncio
+    async def test_cancelled_turn_drops_user_message(self, cli):
+        """Test that a cancelled reply removes the pending user message."""
+        cli.llm_client = make_llm_client([
+            {"type": "text", "content": "partial"},
+            {"type": "cancelled"},
+        ])
+
+        await cli._run_turn("hi")
+
+        assert cli.llm_client.conversation_history == []
+        cli.llm_client.add_assistant_message.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_tool_calls_are_dispatched(self, cli):
+        """Test that tool calls from the stream are handed to the executor."""
+        call = {"type": "tool_call", "name": "read_file", "arguments": {}, "id": "call_0"}
+        cli.llm_client = make_llm_client([{"type": "text", "content": "ok"}, call])
+        cli._handle_tool_calls = AsyncMock()
+
+        await cli._run_turn("read it")
+
+        cli._handle_tool_calls.assert_awaited_once_with([call])
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(sys.platform == "win32", reason="needs loop signal handlers")
+    async def test_sigint_cancels_stream(self, cli):
+        """Test that Ctrl+C mid-stream cancels the turn without raising."""
+        cli.llm_client = make_llm_client([])
+
+        async def chat_with_tools():
+            yield {"type": "text", "content": "partial"}
+            os.kill(os.getpid(), signal.SIGINT)
+            await asyncio.sleep(5)
+            yield {"type": "text", "content": "never sent"}
+
+        cli.llm_client.chat_with_tools = chat_with_tools
+
+        await asyncio.wait_for(cli._run_turn("hi"), timeout=2)
+
+        cli.llm_client.cancel_response.assert_called_once()
+        cli.llm_client.add_assistant_message.assert_not_called()
+        assert cli.llm_client.conversation_history == []
+
+
+class TestSpecialCommands:
+    """Tests for !command dispatch."""
+
+    @pytest.mark.parametrize("command,expected", [
+        ("!Mode  FULL", ("mode", ["full"])),
+        ("!quit", ("quit", [])),
+        ("! ls", ("", ["ls"])),
+        ("!", ("", [])),
+    ])
+    def test_split_special_command(self, command, expected):
+        """Test that commands are case-folded and split once."""
+        assert _split_special_command(command) == expected
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("command", ["!quit", "!EXIT", "!q  "])
+    async def test_quit_commands(self, cli, command):
+        """Test that the exit commands stop the loop."""
+        assert await cli._handle_special_command(command) is False
+
+    @pytest.mark.asyncio
+    async def test_mode_switch(self, cli):
+        """Test that !mode passes its lowercased argument through."""
+        cli.llm_client = make_llm_client([])
+
+        assert await cli._handle_special_command("!mode FULL") is True
+        cli.llm_client.set_response_mode.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_unknown_command_runs_in_shell(self, cli):
+        """Test that anything else, including !clear with arguments, goes to the shell."""
+        cli._run_shell_command = AsyncMock(return_value=True)
+
+        await cli._handle_special_command("!ls -la")
+        await cli._handle_special_command("!clear screen")
+
+        assert [c.args[0] for c in cli._run_shell_command.await_args_list] == ["!ls -la", "!clear screen"]
+
+    @pytest.mark.asyncio
+    async def test_shell_command_output(self, cli, capsys):
+        """Test that !<command> output is printed."""
+        assert await cli._handle_special_command("!echo hello") is True
+        assert "hello" in capsys.readouterr().out
+
+    @pytest.mark.asyncio
+    async def test_shell_command_timeout(self, cli, capsys, monkeypatch):
+        """Test that a slow shell command is killed at the time limit."""
+        monkeypatch.setattr("src.cli.interactive_terminal.SHELL_COMMAND_TIMEOUT", 0.1)
+
+        assert await cli._handle_special_command("!sleep 5") is True
+        assert "timed out" in capsys.readouterr().out
+
+    @pytest.mark.skipif(not os.path.isdir("/proc/self"), reason="needs /proc")
+    @pytest.mark.asyncio
+    async def test_cancelled_shell_command_is_killed(self, cli, monkeypatch):
+        """Test that cancelling a !<command> also stops the shell's children."""
+        processes = []
+        create = asyncio.create_subprocess_shell
+
+        async def recording_create(*args, **kwargs):
+            processes.append(await create(*args, **kwargs))
+            return processes[-1]
+
+        monkeypatch.setattr(asyncio, "create_subprocess_shell", recording_create)
+        task = asyncio.create_task(cli._handle_special_command("!sleep 37; true"))
+        while not processes:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        assert _live_group_members(processes[0].pid)
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert processes[0].returncode is not None
+        assert _live_group_members(processes[0].pid) == []
+
+class TestToolCalls:
+    """Tests for tool call handling."""
+
+    @pytest.mark.asyncio
+    async def test_results_recorded_with_single_follow_up(self, cli):
+        """Test that every result is recorded and the LLM is asked once."""
+        cli.auto_approve = True
+        cli.llm_client = make_llm_client([{"type": "text", "content": "done"}])
+        cli.command_executor.execute_with_approval = AsyncMock(
+            side_effect=[(True, "a"), RuntimeError("boom")]
+        )
+        calls = [
+            {"name": "read_file", "arguments": {"path": "a"}, "id": "call_0"},
+            {"name": "read_file", "arguments": {"path": "b"}, "id": "call_1"},
+        ]
+
+        await cli._handle_tool_calls(calls)
+
+        results = [c.args for c in cli.llm_client.add_tool_result.call_args_list]
+        assert results == [
+            ("call_0", "read_file", "a"),
+            ("call_1", "read_file", "Error: boom"),
+        ]
+        cli.llm_client.add_assistant_message.assert_called_once_with("done")
+
+    @pytest.mark.asyncio
+    async def test_write_then_command_keeps_order(self, cli, tmp_path):
+        """Test that a command sees the file written by the call before it."""
+        cli.auto_approve = True
+        cli.llm_client = make_llm_client([])
+        path = tmp_path / "out.txt"
+        calls = [
+            {"name": "write_file", "arguments": {"filepath": str(path), "content": "hello"}, "id": "call_0"},
+            {"name": "execute_shell_command", "arguments": {"command": f"cat {path}"}, "id": "call_1"},
+        ]
+
+        await cli._handle_tool_calls(calls)
+
+        results = [c.args for c in cli.llm_client.add_tool_result.call_args_list]
+        assert results[1][0] == "call_1"
+        assert "hello" in results[1][2]
+
+    @pytest.mark.asyncio
+    async def test_identical_calls_run_once(self, cli):
+        """Test that repeated identical tool calls share one execution."""
+        cli.auto_approve = True
+        cli.llm_client = make_llm_client([])
+        cli.command_executor.execute_with_approval = AsyncMock(return_value=(True, "files"))
+        args = {"command": "ls", "explanation": "list"}
+        calls = [
+            {"name": "execute_shell_command", "arguments": dict(args), "id": "call_0"},
+            {"name": "execute_shell_command", "arguments": dict(reversed(list(args.items()))), "id": "call_1"},
+        ]
+
+        await cli._handle_tool_calls(calls)
+
+        cli.command_executor.execute_with_approval.assert_awaited_once()
+        results = [c.args for c in cli.llm_client.add_tool_result.call_args_list]
+        assert results == [
+            ("call_0", "execute_shell_command", "files"),
+            ("call_1", "execute_shell_command", "Duplicate of call_0, not run again"),
+        ]
+
+
+class TestSelectionTables:
+    """Tests for the startup selection menus."""
+
+    def test_tables_are_built_once(self):
+        """Test that the menus are cached and list every option."""
+        assert _expert_table() is _expert_table()
+        assert _expert_table().row_count == len(ExpertMode)
+        assert _response_table().row_count == 2
+
+
+class TestCommandSuggestions:
+    """Tests for the suggested-command menu."""
+
+    @pytest.mark.asyncio
+    async def test_choice_is_read_asynchronously(self, cli):
+        """Test that the menu choice comes from the async prompt."""
+        cli.llm_client = make_llm_client([])
+        cli.input_handler = MagicMock(get_choice=AsyncMock(return_value="1"))
+        cli.command_executor.execute_with_approval = AsyncMock(return_value=(True, "out"))
+        option = MagicMock(command="ls", explanation="List files")
+
+        await cli._handle_command_suggestions([option])
+
+        cli.command_executor.execute_with_approval.assert_awaited_once()
+        cli.llm_client.add_tool_result.assert_called_once_with("cmd_1", "execute_shell_command", "out")
+
+    @pytest.mark.asyncio
+    async def test_ctrl_c_skips(self, cli):
+        """Test that Ctrl+C at the menu skips execution."""
+        cli.input_handler = MagicMock(get_choice=AsyncMock(side_effect=KeyboardInterrupt))
+        cli.command_executor.execute_with_approval = AsyncMock()
+
+        await cli._handle_command_suggestions([MagicMock(command="ls", explanation="")])
+
+        cli.command_executor.execute_with_approval.assert_not_awaited()
+
+
+class TestStatus:
+    """Tests for !status."""
+
+    @pytest.mark.asyncio
+    async def test_status_panel(self, cli, capsys):
+        """Test that !status shows the current configuration."""
+        cli.llm_client = make_llm_client([])
+        cli.llm_client.get_current_config.return_value = {
+            "icon": "🐧", "expert_mode": "linux", "response_mode": "quick",
+            "temperature": 0.4, "max_tokens": 500,
+        }
+        cli.llm_client.get_history_length.return_value = 3
+
+        assert await cli._handle_special_command("!status") is True
+
+        out = capsys.readouterr().out
+        assert "Expert Mode: 🐧 Linux" in out
+        assert "Max Tokens: 500" in out
+        assert "Messages in history: 3" in out
+
+
+class TestServerSelection:
+    """Tests for startup server/model selection."""
+
+    def test_single_server_skips_server_prompt(self, cli, monkeypatch):
+        """Test that only the model is asked for when one server is configured."""
+        server = ServerConfig(name="Only", url="http://only:11434", models=["a", "b"])
+        servers_config = get_config().model_copy(update={"servers": [server]})
+        monkeypatch.setattr("src.cli.interactive_terminal.get_config", lambda: servers_config)
+        asked = []
+        monkeypatch.setattr(
+            "src.cli.interactive_terminal.IntPrompt.ask",
+            lambda prompt, default=1: asked.append(prompt) or 2
+        )
+
+        assert cli._select_server_and_model() == (server, "b")
+        assert asked == ["\nSelect model number"]
+
+    def test_single_model_needs_no_prompt(self, cli, monkeypatch):
+        """Test that a lone server with one model is picked without asking."""
+        server = ServerConfig(name="Only", url="http://only:11434", models=["solo"])
+        servers_config = get_config().model_copy(update={"servers": [server]})
+        monkeypatch.setattr("src.cli.interactive_terminal.get_config", lambda: servers_config)
+
+        assert cli._select_server_and_model() == (server, "solo")
@@ -0,0 +1,158 @@
+"""Tests for the LLM client wrapper."""
+
+import pytest
+
+from src.cli.expert_modes import ExpertMode, ResponseMode
+from src.cli.llm_client_wrapper import LLMClientWithTools, _parse_tool_call, _split_tool_blocks
+
+
+@pytest.fixture
+def client():
+    """Wrapper around a client that is never connected."""
+    return LLMClientWithTools(
+        base_url="http://localhost:11434",
+        model="test-model",
+        expert_mode=ExpertMode.LINUX,
+        response_mode=ResponseMode.QUICK,
+        tools=[]
+    )
+
+
+class TestCurrentConfig:
+    """Tests for get_current_config."""
+
+    def test_config_is_cached(self, client):
+        """Test that repeated calls reuse the same mapping."""
+        first = client.get_current_config()
+
+        assert first["expert_mode"] == "linux"
+        assert client.get_current_config() is first
+
+    def test_mode_change_invalidates_cache(self, client):
+        """Test that switching modes rebuilds the config."""
+        client.get_current_config()
+
+        client.set_expert_mode(ExpertMode.PYTHON)
+        assert client.get_current_config()["expert_mode"] == "python"
+
+        client.set_response_mode(ResponseMode.FULL)
+        assert client.get_current_config()["response_mode"] == "full"
+
+    def test_same_mode_keeps_config(self, client):
+        """Test that re-selecting the current modes is a no-op."""
+        first = client.get_current_config()
+        prompt = client.system_prompt
+
+        client.set_expert_mode(ExpertMode.LINUX)
+        client.set_response_mode(ResponseMode.QUICK)
+
+        assert client.get_current_config() is first
+        assert client.system_prompt is prompt
+
+    def test_prompt_preview_follows_expert(self, client):
+        """Test that the system prompt preview is kept in sync."""
+        client.set_expert_mode(ExpertMode.DATABASE)
+
+        assert client.system_prompt_preview == client.system_prompt[:150].replace("\n", " ")
+
+
+class TestToolBlocks:
+    """Tests for tool call extraction from streamed replies."""
+
+    @staticmethod
+    def _stream_blocks(chunks):
+        """Feed chunks through _split_tool_blocks as chat_with_tools does."""
+        blocks, pending = [], ""
+        for chunk in chunks:
+            found, pending = _split_tool_blocks(pending + chunk)
+            blocks.extend(found)
+        return blocks
+
+    def test_plain_text_has_no_blocks(self):
+        """Test that replies without a JSON block yield nothing and keep no tail."""
+        assert _split_tool_blocks("Use `ls -la` to list files.") == ([], "")
+
+    def test_tool_calls_are_parsed_in_order(self):
+        """Test that only tool-shaped blocks are parsed, in order."""
+        text = (
+            "First:\n```json\n{\"tool\": \"read_file\", \"arguments\": {\"path\": \"a\"}}\n```\n"
+            "Skip:\n```json\n{\"other\": 1}\n```\n"
+            "Broken:\n```json\n{not json}\n```\n"
+            "Then:\n```json\n{\"tool\": \"list_dir\", \"arguments\": {}}\n```"
+        )
+
+        blocks, pending = _split_tool_blocks(text)
+        calls = [call for call in map(_parse_tool_call, blocks) if call is not None]
+
+        assert pending == ""
+        assert calls == [
+            {"tool": "read_file", "arguments": {"path": "a"}},
+            {"tool": "list_dir", "arguments": {}},
+        ]
+
+    def test_fences_split_across_chunks(self):
+        """Test that opening and closing fences may arrive in pieces."""
+        chunks = ["Reading:\n``", "`json\n{\"tool\": \"read_file\", ", "\"arguments\": {}}\n`", "``", " done"]
+
+        assert self._stream_blocks(chunks) == ['{"tool": "read_file", "arguments": {}}']
+
+    def test_incomplete_block_is_kept_pending(self):
+        """Test that an unclosed block is carried over, not parsed."""
+        blocks, pending = _split_tool_blocks("Now:\n```json\n{\"tool\": ")
+
+        assert blocks == []
+        assert pending == "```json\n{\"tool\": "
+
+
+class TestStreamingToolCalls:
+    """Tests for tool calls detected while the reply streams."""
+
+    @pytest.mark.asyncio
+    async def test_tool_call_yielded_when_block_closes(self, client):
+        """Test that a tool call arrives before the rest of the reply."""
+        chunks = ["Reading:\n``", "`json\n{\"tool\": \"read_file\", ", "\"arguments\": {}}\n`", "``", " then more"]
+
+        async def chat_stream(**kwargs):
+            for chunk in chunks:
+                yield chunk
+
+        client.base_client.chat_stream = chat_stream
+
+        events = [event async for event in client.chat_with_tools()]
+
+        assert [event["type"] for event in events] == ["text"] * 4 + ["tool_call", "text"]
+        assert events[4] == {"type": "tool_call", "name": "read_file", "arguments": {}, "id": "call_0"}
+
+
+class TestHistoryBudget:
+    """Tests for trimming old turns from the conversation history."""
+
+    def test_oldest_turns_are_dropped(self, client):
+        """Test that whole turns go first and the system message stays."""
+        client.max_history_tokens = 10
+        client.add_system_message()
+        client.add_user_message("a" * 16)
+        client.add_assistant_message("b" * 16)
+        client.add_tool_result("call_0", "read_file", "c" * 4)
+        client.add_user_message("d" * 16)
+
+        assert [m["role"] for m in client.conversation_history] == ["system", "user"]
+        assert client.conversation_history[1]["content"] == "d" * 16
+        assert client._history_tokens == 4
+
+    def test_latest_user_message_is_kept(self, client):
+        """Test that a single oversized message is never dropped."""
+        client.max_history_tokens = 1
+        client.add_user_message("x" * 100)
+
+        assert client.get_history_length() == 1
+
+    def test_discard_last_user_message(self, client):
+        """Test that an unanswered user message can be withdrawn."""
+        client.add_user_message("question")
+        assert client.discard_last_user_message() is True
+        assert client._history_tokens == 0
+
+        client.add_user_message("question")
+        client.add_assistant_message("answer")
+        assert client.discard_last_user_message() is False
@@ -1,7 +1,7 @@
 """Tests for tools module."""
 
 import pytest
-from src.core.tools import TOOLS, format_tool_call_for_display
+from src.core.tools import TOOL_NAMES, TOOLS, format_tool_call_for_display
 
 
 class TestTools:
@@ -9,7 +9,7 @@ class TestTools:
 
     def test_tools_structure(self):
         """Test that tools have correct structure."""
-        assert isinstance(TOOLS, list)
+        assert isinstance(TOOLS, tuple)
         assert len(TOOLS) > 0
 
         for tool in TOOLS:
@@ -20,20 +20,20 @@ class TestTools:
             assert "description" in tool["function"]
             assert "parameters" in tool["function"]
 
+        # Names are unique, so the set covers every tool
+        assert len(TOOL_NAMES) == len(TOOLS)
+
     def test_execute_shell_command_tool_exists(self):
         """Test that execute_shell_command tool is defined."""
-        tool_names = [t["function"]["name"] for t in TOOLS]
-        assert "execute_shell_command" in tool_names
+        assert "execute_shell_command" in TOOL_NAMES
 
     def test_read_file_tool_exists(self):
         """Test that read_file tool is defined."""
-        tool_names = [t["function"]["name"] for t in TOOLS]
-        assert "read_file" in tool_names
+        assert "read_file" in TOOL_NAMES
 
     def test_write_file_tool_exists(self):
         """Test that write_file tool is defined."""
-        tool_names = [t["function"]["name"] for t in TOOLS]
-        assert "write_file" in tool_names
+        assert "write_file" in TOOL_NAMES
 
     def test_format_shell_command(self):
         """Test formatting shell command for display."""
@@ -73,6 +73,22 @@ class TestTools:
         assert "Hello World" in result
         assert "Create greeting file" in result
 
+    def test_format_shell_command_working_directory(self):
+        """Test that the working directory line is only shown when set."""
+        args = {"command": "make", "explanation": "Build {target}"}
+        assert "Working Directory" not in format_tool_call_for_display("execute_shell_command", args)
+
+        args["working_directory"] = "/srv/app"
+        result = format_tool_call_for_display("execute_shell_command", args)
+        assert result.endswith("\n[bold]Working Directory:[/bold] /srv/app")
+        assert "Build {target}" in result
+
+    def test_format_missing_arguments_and_unknown_tool(self):
+        """Test that missing arguments render empty and unknown tools are reported."""
+        result = format_tool_call_for_display("write_file", {"filepath": "a.txt"})
+        assert result.endswith("[bold]Content Preview:[/bold]\n")
+        assert format_tool_call_for_display("delete_file", {}) == "Unknown tool: delete_file"
+
     def test_format_tool_call_for_display_function_exists(self):
         """Test that format_tool_call_for_display function exists."""
         assert callable(format_tool_call_for_display)
@@ -0,0 +1,53 @@
+"""Tests for configuration loading."""
+
+import pytest
+from pydantic import ValidationError
+
+from src.core.config import load_config
+
+
+class TestLoadConfig:
+    """Tests for load_config."""
+
+    def test_missing_file_uses_defaults(self, tmp_path):
+        """Test that a missing file yields the built-in configuration."""
+        config = load_config(str(tmp_path / "missing.yaml"))
+
+        assert config.servers[0].url == "http://localhost:11434"
+        assert config.generation.max_tokens == 2000
+
+    def test_load_yaml(self, tmp_path):
+        """Test loading servers and generation settings from YAML."""
+        path = tmp_path / "config.yaml"
+        path.write_text(
+            "servers:\n"
+            "  - name: Test\n"
+            "    url: http://test:1234\n"
+            "    models: [a, b]\n"
+            "generation:\n"
+            "  temperature: 0.0\n"
+            "  max_tokens: 10\n"
+            "api:\n"
+            "  port: 9000\n"
+        )
+
+        config = load_config(str(path))
+
+        assert config.servers[0].models == ["a", "b"]
+        assert config.generation.temperature == 0.0
+        assert config.api.port == 9000
+
+    def test_config_is_frozen(self, tmp_path):
+        """Test that the loaded configuration cannot be modified."""
+        config = load_config(str(tmp_path / "missing.yaml"))
+
+        with pytest.raises(ValidationError):
+            config.generation.temperature = 1.0
+
+    def test_module_config_is_loaded_once(self):
+        """Test that the module-level config resolves to the cached instance."""
+        import src.core.config as config_module
+
+        assert config_module.config is config_module.get_config()
+        with pytest.raises(AttributeError):
+            config_module.missing_setting
@@ -0,0 +1,41 @@
+"""Tests for event loop policy selection."""
+
+import asyncio
+import sys
+import types
+import pytest
+from src.core.event_loop import install_event_loop_policy
+
+
+@pytest.fixture
+def restore_policy():
+    """Restore the original event loop policy after the test."""
+    policy = asyncio.get_event_loop_policy()
+    yield
+    asyncio.set_event_loop_policy(policy)
+
+
+class TestInstallEventLoopPolicy:
+    """Tests for install_event_loop_policy."""
+
+    def test_explicit_asyncio(self, restore_policy):
+        """Test that asyncio backend leaves the default policy."""
+        assert install_event_loop_policy("asyncio") == "asyncio"
+
+    def test_env_var_asyncio(self, restore_policy, monkeypatch):
+        """Test that AGENT_LOOP selects the backend."""
+        monkeypatch.setenv("AGENT_LOOP", "asyncio")
+        assert install_event_loop_policy() == "asyncio"
+
+    def test_env_var_auto_prefers_uvloop(self, restore_policy, monkeypatch):
+        """Test that AGENT_LOOP=auto picks uvloop when it is installed."""
+        monkeypatch.setenv("AGENT_LOOP", "auto")
+        fake_uvloop = types.SimpleNamespace(EventLoopPolicy=asyncio.DefaultEventLoopPolicy)
+        monkeypatch.setitem(sys.modules, "uvloop", fake_uvloop)
+
+        assert install_event_loop_policy() == "uvloop"
+
+    def test_unavailable_backend_falls_back(self, restore_policy, monkeypatch):
+        """Test fallback to asyncio when the backend is not installed."""
+        monkeypatch.setitem(sys.modules, "uvloop", None)
+        assert install_event_loop_policy("uvloop") == "asyncio"
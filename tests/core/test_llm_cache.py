@@ -0,0 +1,40 @@
+"""Tests for the LLM response cache."""
+
+from src.core.llm_cache import ResponseCache
+
+
+class TestResponseCache:
+    """Tests for ResponseCache."""
+
+    def test_key_ignores_dict_order(self):
+        """Test that equal payloads produce the same key."""
+        first = ResponseCache.make_key("http://x/api", {"model": "m", "temperature": 0})
+        second = ResponseCache.make_key("http://x/api", {"temperature": 0, "model": "m"})
+
+        assert first == second
+        assert first != ResponseCache.make_key("http://y/api", {"model": "m", "temperature": 0})
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that a hit protects an entry from eviction."""
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        assert cache.get("a") == "A"
+
+        cache.set("c", "C")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "A"
+        assert len(cache) == 2
+
+    def test_expired_entries_are_dropped(self, monkeypatch):
+        """Test that entries past their TTL are not returned."""
+        now = [100.0]
+        monkeypatch.setattr("src.core.llm_cache.time.monotonic", lambda: now[0])
+        cache = ResponseCache(ttl=10)
+        cache.set("a", "A")
+
+        now[0] = 111.0
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
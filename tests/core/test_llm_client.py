@@ -1,16 +1,86 @@
 """Tests for LLM client."""
 
+import asyncio
 import pytest
 import httpx
 import json
-from unittest.mock import AsyncMock, Mock, patch
-from src.core.llm_client import LLMClient
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+import src.core.llm_client as llm_client_module
+from src.core.llm_client import LLMClient, _build_instruct_prompt, _iter_sse_data
 
 
-@pytest.fixture
+class _Resp:
+    """A finished httpx response with a pre-encoded JSON body."""
+
+    __slots__ = ("content",)
+
+    def __init__(self, data):
+        self.content = json.dumps(data).encode()
+
+    def raise_for_status(self):
+        pass
+
+
+_GENERATE_HELLO = _Resp({"response": "Hello! How can I help you?"})
+_GENERATE_OK = _Resp({"response": "Response"})
+_CHAT_HELLO = _Resp({"choices": [{"message": {"content": "Hello from OpenAI!"}}]})
+_CHAT_MALFORMED = _Resp({"invalid": "structure"})
+
+
+def _status_error(status_code):
+    """Build the error httpx raises for a non-2xx reply."""
+    response = SimpleNamespace(status_code=status_code, text="Internal server error")
+    return httpx.HTTPStatusError("Server error", request=SimpleNamespace(), response=response)
+
+
+# Streamed bodies, one chunk per line or event
+_GENERATE_STREAM = tuple(
+    (json.dumps({"response": token, "done": done}) + "\n").encode()
+    for token, done in (("Hello", False), (" there", False), ("!", True))
+)
+_CHAT_STREAM = (
+    ("data: " + json.dumps({"choices": [{"delta": {"content": "Hello"}}]}) + "\n\n").encode(),
+    b": keep-alive\n\n",
+    ("data: " + json.dumps({"choices": [{"delta": {"content": " world"}}]}) + "\n\n").encode(),
+    b"data: [DONE]\n\n",
+)
+
+
+def _aiter(chunks):
+    """Return an aiter_bytes() replacement that yields the given chunks."""
+    async def aiter_bytes():
+        for chunk in chunks:
+            yield chunk
+    return aiter_bytes
+
+
+class _StubHTTPX:
+    """The parts of httpx.AsyncClient that LLMClient uses, as plain mocks."""
+
+    def __init__(self):
+        self.post = AsyncMock()
+        self.head = AsyncMock()
+        self.aclose = AsyncMock()
+        # Not a coroutine: used as "async with client.stream(...) as response"
+        self.stream = MagicMock()
+
+    def reset_mock(self, **kwargs):
+        """Reset every stubbed method."""
+        for method in (self.post, self.head, self.aclose, self.stream):
+            method.reset_mock(**kwargs)
+
+
+@pytest.fixture(scope="module")
 def mock_httpx_client():
-    """Create a mock httpx AsyncClient."""
-    return AsyncMock(spec=httpx.AsyncClient)
+    """Create a stub httpx AsyncClient, shared by the tests in this module."""
+    return _StubHTTPX()
+
+
+@pytest.fixture(autouse=True)
+def reset_httpx_client(mock_httpx_client):
+    """Reset the shared mock so no calls or responses leak between tests."""
+    mock_httpx_client.reset_mock(return_value=True, side_effect=True)
 
 
 @pytest.fixture
@@ -19,9 +89,9 @@ def llm_client_instruct(mock_httpx_client):
     client = LLMClient(
         base_url="http://localhost:11434",
         model="mistral",
-        use_instruct=True
+        use_instruct=True,
+        client=mock_httpx_client,
     )
-    client.client = mock_httpx_client
     return client
 
 
@@ -31,38 +101,28 @@ def llm_client_openai(mock_httpx_client):
     client = LLMClient(
         base_url="http://localhost:1234",
         model="gpt-3.5-turbo",
-        use_instruct=False
+        use_instruct=False,
+        client=mock_httpx_client,
     )
-    client.client = mock_httpx_client
     return client
 
 
 class TestLLMClientInitialization:
     """Tests for LLM client initialization."""
 
-    def test_init_instruct_mode(self):
-        """Test initialization in instruct mode."""
-        client = LLMClient(
-            base_url="http://localhost:11434",
-            model="mistral",
-            use_instruct=True
-        )
-        assert client.base_url == "http://localhost:11434"
-        assert client.model == "mistral"
-        assert client.use_instruct is True
+    @pytest.mark.parametrize("base_url,model,use_instruct", [
+        ("http://localhost:11434", "mistral", True),
+        ("http://localhost:1234", "gpt-3.5-turbo", False),
+    ], ids=["instruct", "openai"])
+    def test_init(self, base_url, model, use_instruct):
+        """Test initialization in instruct and OpenAI-compatible modes."""
+        client = LLMClient(base_url=base_url, model=model, use_instruct=use_instruct)
+
+        assert client.base_url == base_url
+        assert client.model == model
+        assert client.use_instruct is use_instruct
         assert isinstance(client.client, httpx.AsyncClient)
 
-    def test_init_openai_mode(self):
-        """Test initialization in OpenAI mode."""
-        client = LLMClient(
-            base_url="http://localhost:1234",
-            model="gpt-3.5-turbo",
-            use_instruct=False
-        )
-        assert client.base_url == "http://localhost:1234"
-        assert client.model == "gpt-3.5-turbo"
-        assert client.use_instruct is False
-
 
 class TestLLMClientChat:
     """Tests for chat functionality."""
@@ -70,11 +130,7 @@ class TestLLMClientChat:
     @pytest.mark.asyncio
     async def test_chat_instruct_mode_success(self, llm_client_instruct, mock_httpx_client):
         """Test successful chat in instruct mode."""
-        # Mock response
-        mock_response = Mock()
-        mock_response.json.return_value = {"response": "Hello! How can I help you?"}
-        mock_response.raise_for_status = Mock()
-        mock_httpx_client.post.return_value = mock_response
+        mock_httpx_client.post.return_value = _GENERATE_HELLO
 
         messages = [{"role": "user", "content": "Hello"}]
         response = await llm_client_instruct.chat(messages)
@@ -91,13 +147,7 @@ class TestLLMClientChat:
     @pytest.mark.asyncio
     async def test_chat_openai_mode_success(self, llm_client_openai, mock_httpx_client):
         """Test successful chat in OpenAI mode."""
-        # Mock response
-        mock_response = Mock()
-        mock_response.json.return_value = {
-            "choices": [{"message": {"content": "Hello from OpenAI!"}}]
-        }
-        mock_response.raise_for_status = Mock()
-        mock_httpx_client.post.return_value = mock_response
+        mock_httpx_client.post.return_value = _CHAT_HELLO
 
         messages = [{"role": "user", "content": "Hello"}]
         response = await llm_client_openai.chat(messages)
@@ -110,13 +160,49 @@ class TestLLMClientChat:
         assert call_args[1]["json"]["model"] == "gpt-3.5-turbo"
         assert call_args[1]["json"]["messages"] == messages
 
+    @pytest.mark.asyncio
+    async def test_chat_openai_mode_keeps_zero_temperature(self, llm_client_openai, mock_httpx_client):
+        """Test that an explicit 0.0 temperature is not replaced by the default."""
+        mock_httpx_client.post.return_value = _Resp({"choices": [{"message": {"content": "ok"}}]})
+
+        await llm_client_openai.chat([{"role": "user", "content": "Hi"}], temperature=0.0)
+
+        assert mock_httpx_client.post.call_args[1]["json"]["temperature"] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_chat_sends_preencoded_body_with_orjson(self, llm_client_instruct, mock_httpx_client, monkeypatch):
+        """Test that the body is serialized up front when orjson is available."""
+        monkeypatch.setattr(
+            "src.core.llm_client.orjson",
+            SimpleNamespace(dumps=lambda payload: json.dumps(payload).encode())
+        )
+        mock_httpx_client.post.return_value = _Resp({"response": "ok"})
+
+        await llm_client_instruct.chat([{"role": "user", "content": "Hi"}])
+
+        kwargs = mock_httpx_client.post.call_args.kwargs
+        assert "json" not in kwargs
+        assert json.loads(kwargs["content"])["model"] == "mistral"
+        assert kwargs["headers"] == {"Content-Type": "application/json"}
+
+    @pytest.mark.asyncio
+    async def test_deterministic_chat_is_cached(self, llm_client_instruct, mock_httpx_client):
+        """Test that a repeated temperature-0 request is answered from the cache."""
+        mock_httpx_client.post.return_value = _Resp({"response": "Cached"})
+        messages = [{"role": "user", "content": "Hi"}]
+
+        assert await llm_client_instruct.chat(messages, temperature=0) == "Cached"
+        assert await llm_client_instruct.chat(messages, temperature=0) == "Cached"
+        assert mock_httpx_client.post.call_count == 1
+
+        await llm_client_instruct.chat(messages, temperature=0.7)
+        await llm_client_instruct.chat(messages, temperature=0.7)
+        assert mock_httpx_client.post.call_count == 3
+
     @pytest.mark.asyncio
     async def test_chat_with_temperature(self, llm_client_instruct, mock_httpx_client):
         """Test chat with custom temperature."""
-        mock_response = Mock()
-        mock_response.json.return_value = {"response": "Response"}
-        mock_response.raise_for_status = Mock()
-        mock_httpx_client.post.return_value = mock_response
+        mock_httpx_client.post.return_value = _GENERATE_OK
 
         messages = [{"role": "user", "content": "Test"}]
         await llm_client_instruct.chat(messages, temperature=0.8)
@@ -127,10 +213,7 @@ class TestLLMClientChat:
     @pytest.mark.asyncio
     async def test_chat_with_max_tokens(self, llm_client_instruct, mock_httpx_client):
         """Test chat with custom max_tokens."""
-        mock_response = Mock()
-        mock_response.json.return_value = {"response": "Response"}
-        mock_response.raise_for_status = Mock()
-        mock_httpx_client.post.return_value = mock_response
+        mock_httpx_client.post.return_value = _GENERATE_OK
 
         messages = [{"role": "user", "content": "Test"}]
         await llm_client_instruct.chat(messages, max_tokens=500)
@@ -139,67 +222,163 @@ class TestLLMClientChat:
         assert call_args[1]["json"]["num_predict"] == 500
 
     @pytest.mark.asyncio
-    async def test_chat_connection_error(self, llm_client_instruct, mock_httpx_client):
-        """Test chat with connection error."""
-        mock_httpx_client.post.side_effect = httpx.ConnectError("Connection failed")
+    @pytest.mark.parametrize("outcome,expected", [
+        (httpx.ConnectError("Connection failed"), "Cannot connect to LLM server at http://localhost:1234"),
+        (httpx.TimeoutException("Timeout"), "Request to LLM server timed out"),
+        (_status_error(500), "status 500"),
+        (_CHAT_MALFORMED, "Error parsing LLM response"),
+    ], ids=["connect", "timeout", "status", "malformed"])
+    async def test_chat_error(self, llm_client_openai, mock_httpx_client, outcome, expected):
+        """Test that transport and parsing failures are returned as error text."""
+        if isinstance(outcome, Exception):
+            mock_httpx_client.post.side_effect = outcome
+        else:
+            mock_httpx_client.post.return_value = outcome
 
-        messages = [{"role": "user", "content": "Test"}]
-        response = await llm_client_instruct.chat(messages)
+        response = await llm_client_openai.chat([{"role": "user", "content": "Test"}])
 
-        assert "Cannot connect to LLM server" in response
-        assert "http://localhost:11434" in response
+        assert expected in response
+
+
+class TestLLMClientClose:
+    """Tests for client cleanup."""
 
     @pytest.mark.asyncio
-    async def test_chat_timeout_error(self, llm_client_instruct, mock_httpx_client):
-        """Test chat with timeout error."""
-        mock_httpx_client.post.side_effect = httpx.TimeoutException("Timeout")
+    async def test_close(self, llm_client_instruct, mock_httpx_client):
+        """Test closing the client."""
+        await llm_client_instruct.close()
+        mock_httpx_client.aclose.assert_called_once()
 
-        messages = [{"role": "user", "content": "Test"}]
-        response = await llm_client_instruct.chat(messages)
+    def test_shared_client_configuration(self, monkeypatch):
+        """Test that the shared client gets the pool limits and HTTP/2 when h2 is installed."""
+        factory = Mock()
+        monkeypatch.setattr("src.core.llm_client._shared_client", None)
+        monkeypatch.setattr("src.core.llm_client._shared_client_users", 0)
+        monkeypatch.setattr("src.core.llm_client.httpx.AsyncClient", factory)
 
-        assert "Request to LLM server timed out" in response
+        client = LLMClient(base_url="http://localhost:11434", model="mistral")
+
+        assert client.client is factory.return_value
+        kwargs = factory.call_args.kwargs
+        assert kwargs["http2"] is llm_client_module.HTTP2_AVAILABLE
+        assert kwargs["limits"] is llm_client_module.CONNECTION_LIMITS
 
     @pytest.mark.asyncio
-    async def test_chat_http_status_error(self, llm_client_instruct, mock_httpx_client):
-        """Test chat with HTTP status error."""
-        mock_response = Mock()
-        mock_response.status_code = 500
-        mock_response.text = "Internal server error"
+    async def test_injected_client_skips_shared_pool(self, monkeypatch, mock_httpx_client):
+        """Test that an injected HTTP client neither opens nor releases the shared one."""
+        monkeypatch.setattr("src.core.llm_client._shared_client", None)
+        monkeypatch.setattr("src.core.llm_client._shared_client_users", 0)
+        client = LLMClient(base_url="http://localhost:11434", model="mistral", client=mock_httpx_client)
 
-        error = httpx.HTTPStatusError(
-            "Server error",
-            request=Mock(),
-            response=mock_response
-        )
-        mock_httpx_client.post.side_effect = error
+        await client.close()
 
-        messages = [{"role": "user", "content": "Test"}]
-        response = await llm_client_instruct.chat(messages)
+        assert llm_client_module._shared_client is None
+        assert llm_client_module._shared_client_users == 0
+        mock_httpx_client.aclose.assert_awaited_once()
 
-        assert "status 500" in response
+    @pytest.mark.asyncio
+    async def test_clients_share_connection_pool(self, monkeypatch):
+        """Test that the shared HTTP client is closed by its last user only."""
+        monkeypatch.setattr("src.core.llm_client._shared_client", None)
+        first = LLMClient(base_url="http://localhost:11434", model="mistral")
+        second = LLMClient(base_url="http://localhost:1234", model="mistral")
+        assert first.client is second.client
+
+        await first.close()
+        await first.close()
+        assert not second.client.is_closed
+
+        await second.close()
+        assert second.client.is_closed
+
+
+class TestLLMClientTransport:
+    """Tests that run sent through a real httpx client and mock transport."""
+
+    @pytest.fixture
+    def sent(self):
+        """Requests received by the transport."""
+        return []
+
+    @pytest.fixture
+    async def make_client(self, sent):
+        """Factory for LLM clients whose HTTP client answers every request with reply."""
+        clients = []
+
+        def make(reply, use_instruct=True):
+            def handler(request):
+                sent.append(request)
+                return reply
+
+            client = LLMClient(
+                base_url="http://llm.test",
+                model="mistral",
+                use_instruct=use_instruct,
+                client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            )
+            clients.append(client)
+            return client
+
+        yield make
+        # Closed here so a failing assertion does not leak the client
+        for client in clients:
+            await client.close()
 
     @pytest.mark.asyncio
-    async def test_chat_parsing_error(self, llm_client_openai, mock_httpx_client):
-        """Test chat with malformed response."""
-        mock_response = Mock()
-        mock_response.json.return_value = {"invalid": "structure"}
-        mock_response.raise_for_status = Mock()
-        mock_httpx_client.post.return_value = mock_response
+    async def test_chat_request_and_reply(self, sent, make_client):
+        """Test the encoded request body and the decoded reply."""
+        client = make_client(httpx.Response(200, json={"response": "Hi there"}))
 
-        messages = [{"role": "user", "content": "Test"}]
-        response = await llm_client_openai.chat(messages)
+        assert await client.chat([{"role": "user", "content": "Hi"}], max_tokens=8) == "Hi there"
 
-        assert "Error parsing LLM response" in response
+        request = sent[0]
+        assert request.url == "http://llm.test/api/generate"
+        assert request.headers["content-type"] == "application/json"
+        assert json.loads(request.content) == {
+            "model": "mistral", "prompt": "[INST] Hi [/INST]", "stream": False, "num_predict": 8,
+        }
 
+    @pytest.mark.asyncio
+    async def test_chat_status_error(self, sent, make_client):
+        """Test that a real non-2xx reply is reported with its status code."""
+        client = make_client(httpx.Response(503, text="busy"))
 
-class TestLLMClientClose:
-    """Tests for client cleanup."""
+        response = await client.chat([{"role": "user", "content": "Hi"}])
+
+        assert response == "Error: LLM server returned status 503: busy"
 
     @pytest.mark.asyncio
-    async def test_close(self, llm_client_instruct, mock_httpx_client):
-        """Test closing the client."""
-        await llm_client_instruct.close()
-        mock_httpx_client.aclose.assert_called_once()
+    async def test_stream_openai_body(self, sent, make_client):
+        """Test that a buffered SSE body is framed into deltas."""
+        body = b"".join(
+            b"data: " + json.dumps({"choices": [{"delta": {"content": token}}]}).encode() + b"\n\n"
+            for token in ("Hel", "lo")
+        ) + b"data: [DONE]\n\n"
+        client = make_client(httpx.Response(200, content=body), use_instruct=False)
+
+        chunks = [chunk async for chunk in client.chat_stream([{"role": "user", "content": "Hi"}])]
+
+        assert chunks == ["Hel", "lo"]
+        assert json.loads(sent[0].content)["stream"] is True
+
+
+class TestLLMClientHealthCheck:
+    """Tests for connection pre-warming."""
+
+    @pytest.mark.asyncio
+    async def test_health_check_success(self, llm_client_instruct, mock_httpx_client):
+        """Test health check against a reachable server."""
+        mock_httpx_client.head.return_value = Mock(status_code=200)
+
+        assert await llm_client_instruct.health_check() is True
+        assert mock_httpx_client.head.call_args[0][0] == "http://localhost:11434"
+
+    @pytest.mark.asyncio
+    async def test_health_check_unreachable(self, llm_client_instruct, mock_httpx_client):
+        """Test health check does not raise when the server is down."""
+        mock_httpx_client.head.side_effect = httpx.ConnectError("Connection failed")
+
+        assert await llm_client_instruct.health_check() is False
 
 
 class TestLLMClientStreaming:
@@ -209,16 +388,10 @@ class TestLLMClientStreaming:
     async def test_stream_instruct_mode(self, llm_client_instruct, mock_httpx_client):
         """Test streaming in instruct mode."""
         # Mock streaming response
-        mock_response = AsyncMock()
+        mock_response = Mock()
         mock_response.raise_for_status = Mock()
 
-        # Simulate streaming lines
-        async def mock_aiter_lines():
-            yield json.dumps({"response": "Hello", "done": False})
-            yield json.dumps({"response": " there", "done": False})
-            yield json.dumps({"response": "!", "done": True})
-
-        mock_response.aiter_lines = mock_aiter_lines
+        mock_response.aiter_bytes = _aiter(_GENERATE_STREAM)
         mock_httpx_client.stream.return_value.__aenter__.return_value = mock_response
 
         messages = [{"role": "user", "content": "Hi"}]
@@ -231,16 +404,10 @@ class TestLLMClientStreaming:
     @pytest.mark.asyncio
     async def test_stream_openai_mode(self, llm_client_openai, mock_httpx_client):
         """Test streaming in OpenAI mode."""
-        mock_response = AsyncMock()
+        mock_response = Mock()
         mock_response.raise_for_status = Mock()
 
-        # Simulate SSE format
-        async def mock_aiter_lines():
-            yield "data: " + json.dumps({"choices": [{"delta": {"content": "Hello"}}]})
-            yield "data: " + json.dumps({"choices": [{"delta": {"content": " world"}}]})
-            yield "data: [DONE]"
-
-        mock_response.aiter_lines = mock_aiter_lines
+        mock_response.aiter_bytes = _aiter(_CHAT_STREAM)
         mock_httpx_client.stream.return_value.__aenter__.return_value = mock_response
 
         messages = [{"role": "user", "content": "Hi"}]
@@ -250,6 +417,128 @@ class TestLLMClientStreaming:
 
         assert chunks == ["Hello", " world"]
 
+    @pytest.mark.asyncio
+    async def test_stream_lines_split_across_chunks(self, llm_client_openai, mock_httpx_client):
+        """Test that SSE lines are reassembled across chunk boundaries."""
+        mock_response = Mock()
+        mock_response.raise_for_status = Mock()
+
+        async def mock_aiter_bytes():
+            yield b'data: {"choices": [{"delta": {"con'
+            yield b'tent": "Hel"}}]}\r\n\r\ndata:{"choices": [{"delta": {"content": "lo"}}]}\r\n\r'
+            yield b"\ndata: [DONE]"
+
+        mock_response.aiter_bytes = mock_aiter_bytes
+        mock_httpx_client.stream.return_value.__aenter__.return_value = mock_response
+
+        chunks = []
+        async for chunk in llm_client_openai.chat_stream([{"role": "user", "content": "Hi"}]):
+            chunks.append(chunk)
+
+        assert chunks == ["Hel", "lo"]
+
+    @pytest.mark.asyncio
+    async def test_stream_padded_done_sentinel(self, llm_client_openai, mock_httpx_client):
+        """Test that a [DONE] sentinel with surrounding spaces ends the stream."""
+        mock_response = Mock()
+        mock_response.raise_for_status = Mock()
+
+        async def mock_aiter_bytes():
+            yield b'data: {"choices": [{"delta": {"content": "Hi"}}]}\n\n'
+            yield b"data:  [DONE] \r\n\r\n"
+            yield b'data: {"choices": [{"delta": {"content": "late"}}]}'
+
+        mock_response.aiter_bytes = mock_aiter_bytes
+        mock_httpx_client.stream.return_value.__aenter__.return_value = mock_response
+
+        chunks = []
+        async for chunk in llm_client_openai.chat_stream([{"role": "user", "content": "Hi"}]):
+            chunks.append(chunk)
+
+        assert chunks == ["Hi"]
+
+    @pytest.mark.asyncio
+    async def test_stream_compact_ollama_lines(self, llm_client_instruct, mock_httpx_client):
+        """Test plain and escaped token lines in Ollama's compact format."""
+        mock_response = Mock()
+        mock_response.raise_for_status = Mock()
+
+        async def mock_aiter_bytes():
+            for token, done in (("Hi", False), (" \"there\"\n", False), ("é", False), ("", True)):
+                payload = {"model": "mistral", "response": token, "done": done}
+                yield (json.dumps(payload, separators=(",", ":"), ensure_ascii=False) + "\n").encode()
+
+        mock_response.aiter_bytes = mock_aiter_bytes
+        mock_httpx_client.stream.return_value.__aenter__.return_value = mock_response
+
+        chunks = []
+        async for chunk in llm_client_instruct.chat_stream([{"role": "user", "content": "Hi"}]):
+            chunks.append(chunk)
+
+        assert chunks == ["Hi", " \"there\"\n", "é", ""]
+
+    @pytest.mark.asyncio
+    async def test_stream_compact_openai_frames(self, llm_client_openai, mock_httpx_client):
+        """Test plain, escaped and non-text deltas in compact SSE frames."""
+        mock_response = Mock()
+        mock_response.raise_for_status = Mock()
+        deltas = ({"role": "assistant", "content": ""}, {"content": "Hi"}, {"content": " \"there\""},
+                  {"content": "é"}, {})
+
+        async def mock_aiter_bytes():
+            for delta in deltas:
+                frame = {"id": "c1", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                yield b"data: " + json.dumps(frame, separators=(",", ":"), ensure_ascii=False).encode() + b"\n\n"
+            yield b"data: [DONE]\n\n"
+
+        mock_response.aiter_bytes = mock_aiter_bytes
+        mock_httpx_client.stream.return_value.__aenter__.return_value = mock_response
+
+        chunks = []
+        async for chunk in llm_client_openai.chat_stream([{"role": "user", "content": "Hi"}]):
+            chunks.append(chunk)
+
+        assert chunks == ["Hi", " \"there\"", "é"]
+
+    @pytest.mark.asyncio
+    async def test_sse_framing(self):
+        """Test that only data fields are yielded, one payload per event."""
+        async def lines():
+            for line in (b"event: message", b"id: 1", b"data: {", b"data:  \"a\": 1}", b"",
+                         b": comment", b"", b"data: [DONE]"):
+                yield line
+
+        assert [data async for data in _iter_sse_data(lines())] == [b'{\n \"a\": 1}', b"[DONE]"]
+
+    @pytest.mark.asyncio
+    async def test_cancel_interrupts_pending_read(self, llm_client_instruct, mock_httpx_client):
+        """Test that cancel_stream() ends a stream that is waiting on the server."""
+        closed = asyncio.Event()
+        mock_response = Mock()
+        mock_response.raise_for_status = Mock()
+        mock_response.is_closed = False
+        mock_response.aclose = AsyncMock(side_effect=closed.set)
+
+        async def mock_aiter_bytes():
+            yield (json.dumps({"response": "Hello", "done": False}) + "\n").encode()
+            # Server goes quiet until the response is closed
+            await closed.wait()
+            raise httpx.ReadError("Connection closed")
+
+        mock_response.aiter_bytes = mock_aiter_bytes
+        mock_httpx_client.stream.return_value.__aenter__.return_value = mock_response
+
+        async def consume():
+            chunks = []
+            async for chunk in llm_client_instruct.chat_stream([{"role": "user", "content": "Hi"}]):
+                chunks.append(chunk)
+                llm_client_instruct.cancel_stream()
+            return chunks
+
+        assert await asyncio.wait_for(consume(), timeout=1) == ["Hello"]
+        assert llm_client_instruct._cancel_event is None
+        mock_response.aclose.assert_awaited_once()
+
     @pytest.mark.asyncio
     async def test_stream_with_error(self, llm_client_instruct, mock_httpx_client):
         """Test streaming with HTTP error."""
@@ -267,136 +556,60 @@ class TestLLMClientStreaming:
 class TestSystemPromptFormatting:
     """Tests for system prompt formatting in instruct mode."""
 
-    def test_system_prompt_included_in_instruct_format(self):
-        """Test that system prompt is properly included in instruct format."""
-        messages = [
-            {"role": "system", "content": "You are a helpful Linux expert."},
-            {"role": "user", "content": "Ciao, sono Edoardo"}
-        ]
-
-        # Format messages using new format
-        prompt_parts = []
-        system_prompt = None
-
-        # Extract system prompt
-        for msg in messages:
-            if msg["role"] == "system":
-                system_prompt = f"<<SYS>>\n{msg['content']}\n<</SYS>>"
-                break
-
-        # Build conversation
-        conversation_parts = []
-        for i, msg in enumerate(messages):
-            if msg["role"] == "user":
-                next_msg = messages[i + 1] if i + 1 < len(messages) else None
-                if next_msg and next_msg["role"] == "assistant":
-                    conversation_parts.append(f"[INST] {msg['content']} [/INST] {next_msg['content']}")
-                else:
-                    conversation_parts.append(f"[INST] {msg['content']} [/INST]")
-
-        if system_prompt:
-            prompt_parts.append(system_prompt)
-        if conversation_parts:
-            prompt_parts.append(" ".join(conversation_parts))
-
-        prompt = "\n\n".join(prompt_parts)
-
-        # Verify system prompt is included
-        assert "<<SYS>>" in prompt
-        assert "You are a helpful Linux expert." in prompt
-        assert "<</SYS>>" in prompt
-        assert "[INST] Ciao, sono Edoardo [/INST]" in prompt
-
-    def test_system_prompt_with_conversation_history(self):
-        """Test that system prompt is preserved with conversation history."""
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": "First question"},
-            {"role": "assistant", "content": "First answer"},
-            {"role": "user", "content": "Second question"}
-        ]
-
-        # Format messages using new format
-        prompt_parts = []
-        system_prompt = None
-
-        # Extract system prompt
-        for msg in messages:
-            if msg["role"] == "system":
-                system_prompt = f"<<SYS>>\n{msg['content']}\n<</SYS>>"
-                break
-
-        # Build conversation
-        conversation_parts = []
-        for i, msg in enumerate(messages):
-            if msg["role"] == "user":
-                next_msg = messages[i + 1] if i + 1 < len(messages) else None
-                if next_msg and next_msg["role"] == "assistant":
-                    conversation_parts.append(f"[INST] {msg['content']} [/INST] {next_msg['content']}")
-                else:
-                    conversation_parts.append(f"[INST] {msg['content']} [/INST]")
-
-        if system_prompt:
-            prompt_parts.append(system_prompt)
-        if conversation_parts:
-            prompt_parts.append(" ".join(conversation_parts))
-
-        prompt = "\n\n".join(prompt_parts)
-
-        # Verify all parts are present
-        assert "<<SYS>>" in prompt
-        assert "You are a helpful assistant." in prompt
-        # Check that conversation is properly formatted
-        assert "[INST] First question [/INST] First answer" in prompt
-        assert "[INST] Second question [/INST]" in prompt
-
-    def test_only_user_message_without_system(self):
-        """Test formatting when only user message is present."""
+    def test_build_instruct_prompt(self):
+        """Test the shared instruct prompt builder on a multi-turn history."""
         messages = [
-            {"role": "user", "content": "Hello"}
+            {"role": "system", "content": "Be brief."},
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello"},
+            {"role": "tool", "content": "ignored"},
+            {"role": "user", "content": "Bye"},
         ]
 
-        prompt_parts = []
-        system_prompt = None
-
-        # Extract system prompt
-        for msg in messages:
-            if msg["role"] == "system":
-                system_prompt = f"<<SYS>>\n{msg['content']}\n<</SYS>>"
-                break
-
-        # Build conversation
-        conversation_parts = []
-        for i, msg in enumerate(messages):
-            if msg["role"] == "user":
-                next_msg = messages[i + 1] if i + 1 < len(messages) else None
-                if next_msg and next_msg["role"] == "assistant":
-                    conversation_parts.append(f"[INST] {msg['content']} [/INST] {next_msg['content']}")
-                else:
-                    conversation_parts.append(f"[INST] {msg['content']} [/INST]")
-
-        if system_prompt:
-            prompt_parts.append(system_prompt)
-        if conversation_parts:
-            prompt_parts.append(" ".join(conversation_parts))
-
-        prompt = "\n\n".join(prompt_parts) if prompt_parts else " ".join(conversation_parts)
-
-        # Should only contain user message
-        assert prompt == "[INST] Hello [/INST]"
-        assert "<<SYS>>" not in prompt
+        assert _build_instruct_prompt(messages) == (
+            "<<SYS>>\nBe brief.\n<</SYS>>\n\n[INST] Hi [/INST] Hello [INST] Bye [/INST]"
+        )
+        assert _build_instruct_prompt([{"role": "user", "content": "Hello"}]) == "[INST] Hello [/INST]"
+        assert _build_instruct_prompt([]) == ""
+
+    @pytest.mark.parametrize("messages,expected,forbidden", [
+        (
+            [
+                {"role": "system", "content": "You are a helpful Linux expert."},
+                {"role": "user", "content": "Ciao, sono Edoardo"},
+            ],
+            ["<<SYS>>", "You are a helpful Linux expert.", "<</SYS>>", "[INST] Ciao, sono Edoardo [/INST]"],
+            [],
+        ),
+        (
+            [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": "First question"},
+                {"role": "assistant", "content": "First answer"},
+                {"role": "user", "content": "Second question"},
+            ],
+            ["<<SYS>>", "You are a helpful assistant.", "[INST] First question [/INST] First answer",
+             "[INST] Second question [/INST]"],
+            [],
+        ),
+        ([{"role": "user", "content": "Hello"}], ["[INST] Hello [/INST]"], ["<<SYS>>"]),
+    ], ids=["system", "history", "user-only"])
+    def test_instruct_format(self, messages, expected, forbidden):
+        """Test the system header and turn layout for common histories."""
+        prompt = _build_instruct_prompt(messages)
+
+        for part in expected:
+            assert part in prompt
+        for part in forbidden:
+            assert part not in prompt
 
     @pytest.mark.asyncio
     async def test_stream_generate_includes_system_prompt(self, llm_client_instruct, mock_httpx_client):
         """Test that _stream_generate includes system prompt in the request."""
-        mock_response = AsyncMock()
+        mock_response = Mock()
         mock_response.raise_for_status = Mock()
 
-        async def mock_aiter_lines():
-            yield json.dumps({"response": "I am a Linux expert.", "done": False})
-            yield json.dumps({"response": "", "done": True})
-
-        mock_response.aiter_lines = mock_aiter_lines
+        mock_response.aiter_bytes = _aiter(_GENERATE_STREAM)
         mock_httpx_client.stream.return_value.__aenter__.return_value = mock_response
 
         messages = [
@@ -0,0 +1,98 @@
+"""Tests for logging helpers."""
+
+import logging
+from logging.handlers import QueueHandler, RotatingFileHandler
+from unittest.mock import Mock
+
+from src.core.logger import get_logger, log_llm_request, log_llm_response, set_log_level, setup_logger
+
+
+class TestLogHelpers:
+    """Tests for the LLM logging helpers."""
+
+    def test_request_previews_skipped_without_debug(self):
+        """Test that message previews are not built when DEBUG is off."""
+        logger = Mock(spec=logging.Logger)
+        logger.isEnabledFor.return_value = False
+
+        log_llm_request(logger, "mistral", [{"role": "user", "content": "x" * 1000}])
+
+        logger.info.assert_called_once_with("LLM Request to model: %s", "mistral")
+        logger.debug.assert_not_called()
+
+    def test_request_previews_truncated_with_debug(self):
+        """Test that long messages are truncated in DEBUG previews."""
+        logger = Mock(spec=logging.Logger)
+        logger.isEnabledFor.return_value = True
+
+        log_llm_request(logger, "mistral", [{"role": "user", "content": "x" * 1000}])
+
+        preview = logger.debug.call_args.args[-1]
+        assert preview == "x" * 500 + "... [truncated]"
+
+    def test_failed_response_logged_as_error(self):
+        """Test that failures go to the error log."""
+        logger = Mock(spec=logging.Logger)
+
+        log_llm_response(logger, "boom", success=False)
+
+        logger.error.assert_called_once_with("LLM Request failed: %s", "boom")
+
+
+class TestGetLogger:
+    """Tests for get_logger."""
+
+    def test_logger_is_configured_once(self):
+        """Test that repeated lookups return the same configured logger."""
+        logger = get_logger("tests.core.cached")
+
+        assert get_logger("tests.core.cached") is logger
+        assert len(logger.handlers) == 2
+
+
+class TestSetupLogger:
+    """Tests for setup_logger."""
+
+    def test_records_written_by_listener(self, tmp_path):
+        """Test that records reach the file through the shared queue listener."""
+        log_file = str(tmp_path / "agent.log")
+        first = setup_logger("tests.core.queued.a", log_file=log_file)
+        second = setup_logger("tests.core.queued.b", log_file=log_file)
+
+        handler = first.handlers[0]
+        assert isinstance(handler, QueueHandler)
+        assert second.handlers == first.handlers
+
+        first.info("hello %s", "queue")
+        handler.listener.stop()
+        handler.listener.start()
+
+        assert "tests.core.queued.a | INFO" in (tmp_path / "agent.log").read_text()
+        assert "hello queue" in (tmp_path / "agent.log").read_text()
+
+    def test_console_handler_is_synchronous(self, tmp_path):
+        """Test that only the file handler sits behind the queue listener."""
+        logger = setup_logger("tests.core.queued.console", log_file=str(tmp_path / "console.log"))
+
+        queue_handler, console_handler = logger.handlers
+        assert type(console_handler) is logging.StreamHandler
+        assert console_handler.level == logging.WARNING
+        assert [type(h) for h in queue_handler.listener.handlers] == [RotatingFileHandler]
+
+    def test_set_log_level_leaves_other_loggers_alone(self, tmp_path):
+        """Test that changing one logger's level does not change a logger sharing its file."""
+        log_file = str(tmp_path / "level.log")
+        quiet = setup_logger("tests.core.queued.quiet", log_file=log_file)
+        other = setup_logger("tests.core.queued.other", log_file=log_file)
+
+        set_log_level("tests.core.queued.quiet", logging.ERROR)
+        quiet.info("hidden record")
+        other.info("visible record")
+        listener = other.handlers[0].listener
+        listener.stop()
+        listener.start()
+
+        text = (tmp_path / "level.log").read_text()
+        assert quiet.level == logging.ERROR
+        assert "visible record" in text
+        assert "hidden record" not in text